@@ -17,6 +17,22 @@ app.conf.beat_schedule = {
         'task': 'apps.notifications.tasks.send_acknowledgment_reminders',
         'schedule': crontab(hour=9, minute=0),
     },
+    'ensure-audit-partitions-monthly': {
+        'task': 'ensure_audit_partitions',
+        'schedule': crontab(day_of_month=20, hour=3, minute=0),
+    },
+    'update-audit-rollups': {
+        'task': 'update_audit_rollups',
+        'schedule': crontab(minute='*/5'),
+    },
+    'archive-audit-logs-monthly': {
+        'task': 'archive_audit_logs',
+        'schedule': crontab(day_of_month=1, hour=3, minute=30),
+    },
+    'accrue-leave-balances-daily': {
+        'task': 'accrue_leave_balances',
+        'schedule': crontab(hour=2, minute=15),
+    },
 }
 
 @app.task(bind=True, ignore_result=True)
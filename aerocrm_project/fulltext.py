@@ -0,0 +1,121 @@
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+
+# Full-text index over some text columns of one table.
+#   PostgreSQL: GIN index on a to_tsvector() expression, maintained by PostgreSQL itself.
+#   SQLite: external-content FTS5 table kept in sync by triggers (bulk_create included);
+#   the update trigger fires only when an indexed column changes.
+# Other backends fall back to icontains.
+
+
+def _fts5_query(query):
+    # Quote every term so user input can't inject FTS5 syntax; each term is a prefix match
+    # and all terms must be present.
+    terms = re.findall(r'\w+', query, flags=re.UNICODE)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+class FullTextIndex:
+    def __init__(self, model, columns, config='simple', weights=None, ordering=('-id',)):
+        # weights: bm25() weight per column on SQLite; ordering: tiebreaker after the rank
+        self.table = model._meta.db_table
+        self.fts_table = f'{self.table}_fts'
+        self.pg_index = f'{self.table}_fts_idx'
+        self.columns = list(columns)
+        self.config = config
+        self.weights = weights
+        self.ordering = list(ordering)
+        self.pg_vector = f"to_tsvector('{config}', " + " || ' ' || ".join(
+            f"COALESCE(\"{self.table}\".\"{column}\", '')" for column in self.columns
+        ) + ")"
+
+    def install(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'CREATE INDEX IF NOT EXISTS "{self.pg_index}" ON "{self.table}" USING GIN ({self.pg_vector})')
+            return True
+        if connection.vendor == 'sqlite':
+            fts, table = self.fts_table, self.table
+            columns = ', '.join(self.columns)
+            new_values = ', '.join(f'new.{column}' for column in self.columns)
+            old_values = ', '.join(f'old.{column}' for column in self.columns)
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [fts])
+                exists = cursor.fetchone() is not None
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"{columns}, content='{table}', content_rowid='id')"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                    f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                    f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+                    f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+                    f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+                )
+                if not exists:
+                    # Index rows written before the FTS table existed.
+                    cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+            return True
+        return False
+
+    def condition(self, query):
+        if connection.vendor == 'postgresql':
+            return Q(pk__in=RawSQL(
+                f"SELECT id FROM \"{self.table}\" WHERE {self.pg_vector} @@ websearch_to_tsquery('{self.config}', %s)",
+                [query]
+            ))
+        if connection.vendor == 'sqlite':
+            fts_query = _fts5_query(query)
+            if not fts_query:
+                return Q(pk__in=[])
+            return Q(pk__in=RawSQL(f"SELECT rowid FROM {self.fts_table} WHERE {self.fts_table} MATCH %s", [fts_query]))
+        condition = Q()
+        for column in self.columns:
+            condition |= Q(**{f'{column}__icontains': query})
+        return condition
+
+    def rank(self, query):
+        if connection.vendor == 'postgresql':
+            return RawSQL(
+                f"ts_rank({self.pg_vector}, websearch_to_tsquery('{self.config}', %s))", [query], output_field=FloatField()
+            )
+        if connection.vendor == 'sqlite':
+            # bm25() is lower-is-better; negate so both backends sort by rank descending.
+            args = ''.join(f', {weight}' for weight in self.weights or ())
+            return RawSQL(
+                f"(SELECT -bm25({self.fts_table}{args}) FROM {self.fts_table} "
+                f"WHERE {self.fts_table} MATCH %s AND rowid = \"{self.table}\".\"id\")",
+                [_fts5_query(query)], output_field=FloatField()
+            )
+        return None
+
+    def search(self, queryset, query, ranked=True):
+        queryset = queryset.filter(self.condition(query))
+        rank = self.rank(query) if ranked else None
+        if rank is None:
+            return queryset
+        return queryset.annotate(search_rank=rank).order_by(F('search_rank').desc(nulls_last=True), *self.ordering)
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    # ?q= ranked full-text mode over `index`. Place it after OrderingFilter so relevance
+    # wins unless ?ordering= is given.
+    search_param = 'q'
+    index = None
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return self.index.search(queryset, query, ranked='ordering' not in request.query_params)
@@ -0,0 +1,220 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import F, Q, Value
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.functions import Coalesce
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination on (<ordering field>, id).
+
+    Pages are selected with a WHERE on the last seen key instead of OFFSET, and no
+    COUNT(*) is issued, so with a matching composite index page 1000 costs the same as
+    page 1. The ordering field comes from OrderingFilter (?ordering=) when the view uses
+    it, otherwise from `view.ordering`/`self.ordering`; `id` is always the tie-breaker.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-timestamp'
+    invalid_cursor_message = _('Неверный курсор.')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        field, descending = self.get_ordering(request, queryset, view)
+        self.field = field
+        self.descending = descending
+
+        queryset, sort_key = self._sort_expression(queryset, field)
+        self.sort_key = sort_key
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+        # Walking backwards flips both the ordering and the comparison.
+        desc = descending != reverse
+
+        after = None
+        if cursor is not None:
+            after = (self._to_python(queryset.model, field, cursor['v']), cursor['id'])
+
+        results = self.fetch(queryset, sort_key, desc, after, self.page_size + 1)
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        if reverse:
+            self.has_next = cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+        return results
+
+    def fetch(self, queryset, sort_key, desc, after, limit):
+        # Up to `limit` rows following the key `after` ((value, id) or None)
+        if after is not None:
+            value, pk = after
+            cmp = 'lt' if desc else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{sort_key}__{cmp}': value})
+                | Q(**{sort_key: value, f'pk__{cmp}': pk})
+            )
+        prefix = '-' if desc else ''
+        return list(queryset.order_by(f'{prefix}{sort_key}', f'{prefix}pk')[:limit])
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        if view is not None:
+            for backend in getattr(view, 'filter_backends', []):
+                if issubclass(backend, OrderingFilter):
+                    ordering = backend().get_ordering(request, queryset, view)
+                    break
+            if ordering is None:
+                ordering = getattr(view, 'ordering', None)
+        if not ordering:
+            ordering = self.ordering
+        if isinstance(ordering, str):
+            ordering = [ordering]
+        first = ordering[0]
+        return first.lstrip('-'), first.startswith('-')
+
+    def _resolve_field(self, model, path):
+        field = None
+        nullable = False
+        for name in path.split(LOOKUP_SEP):
+            field = model._meta.get_field(name)
+            nullable = nullable or field.null
+            if field.is_relation:
+                model = field.related_model
+        return field, nullable
+
+    def _sort_expression(self, queryset, path):
+        try:
+            field, nullable = self._resolve_field(queryset.model, path)
+        except FieldDoesNotExist:
+            raise NotFound(self.invalid_cursor_message)
+        if not nullable:
+            return queryset, path
+        # NULLs sort differently per database and break "<"/">" comparisons, so nullable
+        # text keys are compared through COALESCE(field, '').
+        if isinstance(field, (models.CharField, models.TextField)):
+            alias = 'keyset_' + path.replace(LOOKUP_SEP, '_')
+            return queryset.annotate(**{alias: Coalesce(F(path), Value(''))}), alias
+        raise NotFound(self.invalid_cursor_message)
+
+    def _to_python(self, model, path, value):
+        field, nullable = self._resolve_field(model, path)
+        if value is None:
+            return '' if nullable else None
+        return field.to_python(value)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            return {'v': cursor['v'], 'id': int(cursor['id']), 'r': bool(cursor.get('r'))}
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        value = getattr(obj, self.sort_key, None) if self.sort_key != self.field else self._get_value(obj, self.field)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        elif value is not None and not isinstance(value, (int, float, str, bool)):
+            value = str(value)
+        payload = json.dumps({'v': value, 'id': obj.pk, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_value(self, obj, path):
+        for name in path.split(LOOKUP_SEP):
+            if obj is None:
+                return None
+            obj = getattr(obj, name)
+        return obj
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class KeysetOrPageNumberPagination(BasePagination):
+    """
+    Page-number pagination by default (keeps `count` for existing clients); switches to
+    KeysetPagination when the request carries `?cursor=` or `?pagination=cursor`.
+    """
+    keyset_class = KeysetPagination
+    page_number_class = PageNumberPagination
+    mode_query_param = 'pagination'
+
+    def __init__(self):
+        self.keyset = self.keyset_class()
+        self.page_number = self.page_number_class()
+        self.active = self.page_number
+
+    def _wants_keyset(self, request):
+        return (self.keyset.cursor_query_param in request.query_params
+                or request.query_params.get(self.mode_query_param) == 'cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.active = self.keyset if self._wants_keyset(request) else self.page_number
+        return self.active.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.active.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number.get_paginated_response_schema(schema)
@@ -93,6 +93,14 @@ STATIC_ROOT = os.getenv('STATIC_ROOT', BASE_DIR / 'staticfiles_collected')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.getenv('MEDIA_ROOT', BASE_DIR / 'mediafiles')
+# Document downloads: '' streams through Django, 'x-accel' hands off to nginx (an `internal`
+# location at FILE_DOWNLOAD_ACCEL_PREFIX aliased to MEDIA_ROOT), 'x-sendfile' to Apache/lighttpd
+FILE_DOWNLOAD_BACKEND = os.getenv('FILE_DOWNLOAD_BACKEND', '')
+FILE_DOWNLOAD_ACCEL_PREFIX = os.getenv('FILE_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+# Previews of uploaded images/PDFs (aerocrm_project.thumbnails), generated by a Celery worker
+THUMBNAIL_ASYNC = os.getenv('THUMBNAIL_ASYNC', 'True') == 'True'
+THUMBNAIL_MAX_SIZE = int(os.getenv('THUMBNAIL_MAX_SIZE', '320'))
+THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', '80'))
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -148,6 +156,51 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Audit log writer: BufferedAuditSink (in-process batches), CeleryAuditSink (batches sent to a worker)
+# or DatabaseAuditSink (one INSERT per request)
+AUDIT_LOG_SINK = os.getenv('AUDIT_LOG_SINK', 'apps.audit.sinks.BufferedAuditSink')
+AUDIT_LOG_BATCH_SIZE = int(os.getenv('AUDIT_LOG_BATCH_SIZE', '100'))
+AUDIT_LOG_FLUSH_INTERVAL = float(os.getenv('AUDIT_LOG_FLUSH_INTERVAL', '2.0'))
+AUDIT_LOG_MAX_BUFFER = int(os.getenv('AUDIT_LOG_MAX_BUFFER', '10000'))
+# Identical failures (user/IP, action, status) within this many seconds become one row; 0 disables
+AUDIT_LOG_COALESCE_WINDOW = int(os.getenv('AUDIT_LOG_COALESCE_WINDOW', '60'))
+# Monthly partitions of audit_auditlog (PostgreSQL only) and archival of closed months
+AUDIT_LOG_PARTITIONING = os.getenv('AUDIT_LOG_PARTITIONING', 'True') == 'True'
+AUDIT_HOT_MONTHS = int(os.getenv('AUDIT_HOT_MONTHS', '3'))
+AUDIT_ARCHIVE_ROOT = os.getenv('AUDIT_ARCHIVE_ROOT', BASE_DIR / 'audit_archive')
+# Audit rows are folded into the rollups only below an id that was the newest this many
+# seconds ago, so inserts still in flight (lower ids committing later) aren't skipped
+AUDIT_ROLLUP_LAG = int(os.getenv('AUDIT_ROLLUP_LAG', '60'))
+
+# Role fan-out of document assignments: run in a Celery worker (falls back to inline if the
+# broker is unreachable) and insert this many assignments/notifications per chunk
+DOCUMENT_FANOUT_ASYNC = os.getenv('DOCUMENT_FANOUT_ASYNC', 'True') == 'True'
+DOCUMENT_FANOUT_CHUNK_SIZE = int(os.getenv('DOCUMENT_FANOUT_CHUNK_SIZE', '500'))
+# Text of uploaded documents (PDF, DOCX, plain text) for the ?q= full-text search
+DOCUMENT_TEXT_EXTRACTION_ASYNC = os.getenv('DOCUMENT_TEXT_EXTRACTION_ASYNC', 'True') == 'True'
+DOCUMENT_TEXT_MAX_CHARS = int(os.getenv('DOCUMENT_TEXT_MAX_CHARS', '1000000'))
+# Bulk import of personal documents (CSV manifest + ZIP of scans): manifests up to
+# INLINE_ROWS rows are imported within the request, larger ones in a Celery worker
+PERSONAL_DOCUMENT_IMPORT_ASYNC = os.getenv('PERSONAL_DOCUMENT_IMPORT_ASYNC', 'True') == 'True'
+PERSONAL_DOCUMENT_IMPORT_INLINE_ROWS = int(os.getenv('PERSONAL_DOCUMENT_IMPORT_INLINE_ROWS', '100'))
+PERSONAL_DOCUMENT_IMPORT_BATCH_SIZE = int(os.getenv('PERSONAL_DOCUMENT_IMPORT_BATCH_SIZE', '500'))
+# Acknowledgment compliance report summaries; invalidated on writes, the TTL only bounds
+# how late newly overdue assignments show up
+DOCUMENT_COMPLIANCE_CACHE_TTL = int(os.getenv('DOCUMENT_COMPLIANCE_CACHE_TTL', '900'))
+# Month calendar of leaves, invalidated per month on changes; the TTL only evicts unused months
+LEAVE_CALENDAR_CACHE_TTL = int(os.getenv('LEAVE_CALENDAR_CACHE_TTL', '86400'))
+
+# Shared cache (Redis) so invalidation reaches every worker process; per-process memory otherwise
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', '')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+    } if CACHE_REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+# Streaming CSV/NDJSON downloads. `rows` is any iterator of sequences in `columns` order
+# and is written to the response as it is produced, so memory stays flat.
+
+ROWS_PER_WRITE = 500
+
+
+def _buffered(rows, write_row, header=''):
+    # Yield ~ROWS_PER_WRITE rows per chunk: one yield per row makes the WSGI layer the
+    # bottleneck, while a bounded buffer keeps memory constant.
+    buffer = io.StringIO()
+    buffer.write(header)
+    pending = 0
+    for row in rows:
+        write_row(buffer, row)
+        pending += 1
+        if pending >= ROWS_PER_WRITE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_csv(rows, columns):
+    header = io.StringIO()
+    header.write('\ufeff') # BOM so Excel opens UTF-8 (Cyrillic) correctly
+    csv.writer(header).writerow(columns)
+    return _buffered(rows, lambda buffer, row: csv.writer(buffer).writerow(row), header.getvalue())
+
+
+def stream_ndjson(rows, columns):
+    def write_row(buffer, row):
+        buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+        buffer.write('\n')
+    return _buffered(rows, write_row)
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8', 'csv'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson; charset=utf-8', 'ndjson'),
+}
+
+
+def streaming_export_response(rows, columns, export_format, name):
+    # `name`: file name prefix, the timestamp and extension are appended
+    stream, content_type, extension = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(stream(rows, columns), content_type=content_type)
+    filename = f"{name}-{timezone.localtime():%Y%m%d-%H%M%S}.{extension}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
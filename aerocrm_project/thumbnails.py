@@ -0,0 +1,133 @@
+import logging
+import os
+import tempfile
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from PIL import Image, ImageOps
+
+try:
+    import fitz  # PyMuPDF, optional: first-page previews of PDFs
+except ImportError:
+    fitz = None
+
+logger = logging.getLogger(__name__)
+
+# Size-bounded JPEG previews of uploaded files, stored next to the original as
+# `<name>.thumb.jpg`. Images are scaled with Pillow; PDFs get a first-page preview when
+# PyMuPDF is installed. Other files have no thumbnail. Once generated, the name is
+# stored in the model's `<field>_thumbnail` column, so serializing a row never touches
+# the storage.
+
+THUMBNAIL_SUFFIX = '.thumb.jpg'
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tif', '.tiff'}
+
+
+def thumbnail_name(name):
+    return os.path.splitext(name)[0] + THUMBNAIL_SUFFIX
+
+
+def thumbnail_field(field_name):
+    return f'{field_name}_thumbnail'
+
+
+def thumbnail_url(request, instance, field_name):
+    field_file = getattr(instance, field_name)
+    if not field_file or request is None:
+        return None
+    name = getattr(instance, thumbnail_field(field_name))
+    if not name or name != thumbnail_name(field_file.name):
+        return None # Not generated yet, or generated for a file since replaced
+    return request.build_absolute_uri(field_file.storage.url(name))
+
+
+def delete_thumbnail(storage, name):
+    # Thumbnail of a replaced or deleted file; never for shared blobs, whose thumbnail
+    # goes with the blob (gc_document_blobs)
+    if name:
+        storage.delete(thumbnail_name(name))
+
+
+def _open_preview(path, ext):
+    if ext in IMAGE_EXTENSIONS:
+        image = Image.open(path)
+        # Let the JPEG decoder downscale while decoding instead of loading full resolution
+        image.draft('RGB', (settings.THUMBNAIL_MAX_SIZE * 2, settings.THUMBNAIL_MAX_SIZE * 2))
+        return ImageOps.exif_transpose(image)
+    if ext == '.pdf' and fitz is not None:
+        with fitz.open(path) as pdf:
+            if not pdf.page_count:
+                return None
+            page = pdf.load_page(0)
+            zoom = settings.THUMBNAIL_MAX_SIZE / max(page.rect.width, page.rect.height)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+    return None
+
+
+def generate_thumbnail(field_file, force=False):
+    # Returns the thumbnail name, or None when the file type has no preview.
+    if not field_file:
+        return None
+    storage = field_file.storage
+    name = thumbnail_name(field_file.name)
+    target = storage.path(name)
+    if not force and os.path.exists(target):
+        return name # Content-addressed blobs share one thumbnail
+
+    ext = os.path.splitext(field_file.name)[1].lower()
+    image = _open_preview(storage.path(field_file.name), ext)
+    if image is None:
+        return None
+    with image:
+        preview = image.convert('RGB')
+        preview.thumbnail((settings.THUMBNAIL_MAX_SIZE, settings.THUMBNAIL_MAX_SIZE))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                preview.save(tmp, 'JPEG', quality=settings.THUMBNAIL_QUALITY, optimize=True)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return name
+
+
+def generate_thumbnail_for(model_label, pk, field_name):
+    manager = apps.get_model(model_label)._default_manager
+    instance = manager.filter(pk=pk).first()
+    if instance is None:
+        return None
+    field_file = getattr(instance, field_name)
+    try:
+        name = generate_thumbnail(field_file)
+    except Exception as e:
+        logger.error(f"Thumbnail: failed for {model_label} {pk} ({field_file.name}): {e}")
+        return None
+    if name:
+        # Every row pointing at this file (shared blobs, bulk imports scheduled once per
+        # file); update() so no save signals fire
+        manager.filter(**{field_name: field_file.name}).exclude(**{thumbnail_field(field_name): name}).update(
+            **{thumbnail_field(field_name): name}
+        )
+    return name
+
+
+def schedule_thumbnail(instance, field_name):
+    # After commit, in a Celery worker; inline if disabled or the broker is unreachable.
+    args = (instance._meta.label, instance.pk, field_name)
+
+    def enqueue():
+        if settings.THUMBNAIL_ASYNC:
+            from apps.documents.tasks import generate_file_thumbnail
+            try:
+                generate_file_thumbnail.delay(*args)
+                return
+            except Exception as e:
+                logger.error(f"Thumbnail: failed to enqueue {args}, running inline: {e}")
+        generate_thumbnail_for(*args)
+
+    transaction.on_commit(enqueue)
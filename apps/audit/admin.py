@@ -1,16 +1,44 @@
 from django.contrib import admin
-from .models import AuditLog
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_ipv46_address
+from django.db.models import Q
+from .models import AuditLog, AuditArchive
+from .search import search_condition
+from aerocrm_project.generic_relations import get_generic_target, resolve_generic_targets
 from django.utils.translation import gettext_lazy as _
 
+class AuditLogChangeList(ChangeList):
+    def get_results(self, request):
+        super().get_results(request)
+        resolve_generic_targets(self.result_list, 'target_object') # One query per target type per page
+
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
-    list_display = ('timestamp', 'user_display', 'action', 'ip_address', 'get_target_object_link')
+    list_display = ('timestamp', 'user_display', 'action', 'ip_address', 'hit_count', 'get_target_object_link')
     list_filter = ('action', ('timestamp', admin.DateFieldListFilter), 'user__email', 'content_type')
     search_fields = ('user__email', 'action', 'ip_address', 'description', 'object_id')
     readonly_fields = [f.name for f in AuditLog._meta.fields]
     list_select_related = ('user', 'content_type')
     date_hierarchy = 'timestamp'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Indexed full-text match on action/description plus exact email/IP/object id,
+        # instead of LIKE '%term%' over every search field.
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        condition = search_condition(search_term) | Q(user__email__iexact=search_term) | Q(object_id=search_term)
+        try:
+            validate_ipv46_address(search_term)
+            condition |= Q(ip_address=search_term)
+        except ValidationError:
+            pass
+        return queryset.filter(condition), False
+
+    def get_changelist(self, request, **kwargs):
+        return AuditLogChangeList
+
     def user_display(self, obj):
          return obj.user.email if obj.user else "Система/Аноним"
     user_display.short_description = _("Пользователь")
@@ -29,15 +57,16 @@ class AuditLogAdmin(admin.ModelAdmin):
     def get_target_object_link(self, obj):
         from django.urls import reverse
         from django.utils.html import format_html
-        if obj.target_object:
+        target = get_generic_target(obj, 'target_object')
+        if target:
             try:
                  app_label = obj.content_type.app_label
                  model_name = obj.content_type.model
                  admin_url = reverse(f'admin:{app_label}_{model_name}_change', args=[obj.object_id])
-                 return format_html('<a href="{}">{} ({})</a>', admin_url, obj.target_object, obj.content_type.model)
+                 return format_html('<a href="{}">{} ({})</a>', admin_url, target, obj.content_type.model)
             except Exception:
                  # Fallback if URL reversing fails or object deleted
-                 return f"{str(obj.target_object)[:50]} ({obj.content_type.model} ID: {obj.object_id})"
+                 return f"{str(target)[:50]} ({obj.content_type.model} ID: {obj.object_id})"
         elif obj.content_type and obj.object_id:
              # If object deleted but we have info
              return f"({obj.content_type.model} ID: {obj.object_id})"
@@ -45,3 +74,13 @@ class AuditLogAdmin(admin.ModelAdmin):
     get_target_object_link.short_description = _("Целевой объект")
 
 
+@admin.register(AuditArchive)
+class AuditArchiveAdmin(admin.ModelAdmin):
+    list_display = ('month', 'row_count', 'max_id', 'file_path', 'archived_at')
+    readonly_fields = ('month', 'row_count', 'max_id', 'file_path', 'archived_at')
+
+    def has_add_permission(self, request):
+        return False # Created by the archive_audit_logs command
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -7,3 +7,6 @@ class AuditConfig(AppConfig):
     verbose_name = _('Аудит Действий')
 
 
+
+    def ready(self):
+         import apps.audit.signals
@@ -0,0 +1,324 @@
+import gzip
+import heapq
+import json
+import logging
+import os
+from collections import OrderedDict, deque
+from datetime import date, datetime, time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from aerocrm_project.pagination import KeysetOrPageNumberPagination, KeysetPagination
+
+logger = logging.getLogger(__name__)
+
+# Closed months of AuditLog are moved out of the hot table into gzip-compressed NDJSON
+# files (one per month) and recorded in AuditArchive, which the API uses to decide
+# whether a date-filtered query has to read archived rows as well.
+
+ARCHIVE_FIELDS = (
+    'id', 'timestamp', 'user_id', 'action', 'ip_address', 'user_agent',
+    'description', 'content_type_id', 'object_id', 'hit_count', 'last_seen_at',
+)
+DATETIME_FIELDS = ('timestamp', 'last_seen_at')
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    # Months are cut at local midnight (settings.TIME_ZONE), like the admin date filters.
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(month, time.min), tz)
+    end = timezone.make_aware(datetime.combine(add_months(month, 1), time.min), tz)
+    return start, end
+
+
+def archive_root():
+    return Path(settings.AUDIT_ARCHIVE_ROOT)
+
+
+def archive_file_path(month):
+    return archive_root() / f'{month:%Y}' / f'auditlog-{month:%Y-%m}.ndjson.gz'
+
+
+def iter_archive_file(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def export_month(month, chunk_size=2000):
+    from .models import AuditLog, AuditArchive
+
+    start, end = month_bounds(month)
+    path = archive_file_path(month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    previous = AuditArchive.objects.filter(month=month).first()
+
+    rows = AuditLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    if previous:
+        rows = rows.filter(pk__gt=previous.max_id) # The rest is in the file already
+    rows = (
+        rows.order_by('timestamp', 'id')
+        .values_list(*ARCHIVE_FIELDS)
+    )
+
+    max_id = previous.max_id if previous else 0
+
+    def exported():
+        nonlocal max_id
+        for row in rows.iterator(chunk_size=chunk_size):
+            record = dict(zip(ARCHIVE_FIELDS, row))
+            max_id = max(max_id, record['id'])
+            for field in DATETIME_FIELDS:
+                if record[field] is not None:
+                    record[field] = record[field].isoformat()
+            yield record
+
+    def sort_key(record):
+        return parse_datetime(record['timestamp']), record['id']
+
+    sources = [exported()]
+    # Rows that arrived late for an already archived month are merged into its file,
+    # which stays sorted by (timestamp, id) for the API's ordered reads.
+    if previous and Path(previous.file_path).exists():
+        sources.insert(0, iter_archive_file(previous.file_path))
+    count = 0
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as fh:
+        for record in heapq.merge(*sources, key=sort_key):
+            fh.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+    os.replace(tmp_path, path)
+
+    AuditArchive.objects.update_or_create(
+        month=month,
+        defaults={'file_path': str(path), 'row_count': count, 'max_id': max_id, 'archived_at': timezone.now()}
+    )
+    return path, count
+
+
+def purge_month(month, batch_size=5000):
+    # Deletes the month's rows that export_month wrote to the archive (id <= max_id);
+    # rows that arrived during or after the export are left for the next export.
+    from .models import AuditArchive, AuditLog
+    from . import partitioning
+
+    archive = AuditArchive.objects.filter(month=month).first()
+    if archive is None:
+        return 0
+    partitioning.drop_partition(month, max_id=archive.max_id)
+    # Plain table (or rows that landed in the default partition): delete in batches so
+    # SQLite does not hold one huge write transaction.
+    start, end = month_bounds(month)
+    qs = AuditLog.objects.filter(timestamp__gte=start, timestamp__lt=end, pk__lte=archive.max_id)
+    deleted = 0
+    while True:
+        ids = list(qs.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += AuditLog.objects.filter(pk__in=ids).delete()[0]
+
+
+def _requested_dates(params):
+    exact = parse_date(params.get('timestamp__date') or '')
+    if exact:
+        return exact, exact
+    return parse_date(params.get('timestamp__date__gte') or ''), parse_date(params.get('timestamp__date__lte') or '')
+
+
+def archived_months_for(params):
+    from .models import AuditArchive
+
+    date_from, date_to = _requested_dates(params)
+    if not date_from and not date_to:
+        # Without a date filter the API only shows the hot table.
+        return []
+    months = AuditArchive.objects.all()
+    if date_from:
+        months = months.filter(month__gte=month_start(date_from))
+    if date_to:
+        months = months.filter(month__lte=date_to)
+    return list(months.order_by('month'))
+
+
+def _matches(record, local_date, params, date_from, date_to):
+    if date_from and local_date < date_from:
+        return False
+    if date_to and local_date > date_to:
+        return False
+    for param, key in (('user', 'user_id'), ('content_type', 'content_type_id')):
+        value = params.get(param)
+        if value and str(record.get(key)) != value:
+            return False
+    for param in ('action', 'ip_address', 'object_id'):
+        value = params.get(param)
+        if value and (record.get(param) or '') != value:
+            return False
+    contains = params.get('action__icontains')
+    if contains and contains.lower() not in (record.get('action') or '').lower():
+        return False
+    search = ' '.join(filter(None, (params.get('search'), params.get('q'))))
+    if search:
+        haystack = ' '.join(str(record.get(f) or '') for f in ('action', 'description', 'ip_address', 'object_id')).lower()
+        if any(term not in haystack for term in search.lower().split()):
+            return False
+    return True
+
+
+def iter_archived_records(months, params):
+    # Streams records from the archive files of `months` that match the same filters the
+    # API applies to the hot table, in file (timestamp) order.
+    date_from, date_to = _requested_dates(params)
+    for archive in months:
+        if not Path(archive.file_path).exists():
+            logger.warning(f"Audit archive file is missing: {archive.file_path}")
+            continue
+        for record in iter_archive_file(archive.file_path):
+            for field in DATETIME_FIELDS:
+                if record.get(field):
+                    record[field] = parse_datetime(record[field])
+            local_date = timezone.localtime(record['timestamp']).date()
+            if _matches(record, local_date, params, date_from, date_to):
+                yield record
+
+
+def _after_key(key, after, descending):
+    return after is None or (key < after if descending else key > after)
+
+
+def iter_archived_ordered(months, params, descending=True, after=None, limit=None):
+    # Matching archived records in (timestamp, id) order, strictly after the key `after`.
+    # Months don't overlap and each file is sorted ascending, so newest-first reads a
+    # month forward keeping only its last `limit` matches; memory stays O(limit).
+    months = sorted(months, key=lambda archive: archive.month, reverse=descending)
+    for archive in months:
+        if after is not None:
+            start, end = month_bounds(archive.month)
+            if (descending and start > after[0]) or (not descending and end <= after[0]):
+                continue
+        records = (
+            record for record in iter_archived_records([archive], params)
+            if _after_key((record['timestamp'], record['id']), after, descending)
+        )
+        if descending:
+            yield from reversed(deque(records, maxlen=limit))
+        else:
+            yield from records
+
+
+def _attach_relations(logs):
+    # Users and content types for archived rows, without a query per row
+    User = get_user_model()
+    user_ids = {log.user_id for log in logs if log.user_id}
+    users = User.objects.in_bulk(user_ids) if user_ids else {}
+    for log in logs:
+        if log.user_id:
+            log.user = users.get(log.user_id)
+        if log.content_type_id:
+            log.content_type = ContentType.objects.get_for_id(log.content_type_id)
+
+
+class ArchiveMergedResults:
+    # Hot rows and archived rows merged lazily in timestamp order. The hot table may still
+    # hold late rows of an archived month (purge_month keeps rows written after the
+    # export), so the two streams are heap-merged on (timestamp, id) rather than
+    # concatenated; each side is cut at offset + limit rows.
+    def __init__(self, queryset, months, params, descending=True):
+        self.queryset = queryset
+        self.model = queryset.model # For KeysetPagination's cursor field lookups
+        self.months = months
+        self.params = params
+        self.descending = descending
+
+    def fetch(self, limit, offset=0, after=None, descending=None):
+        from .models import AuditLog
+
+        descending = self.descending if descending is None else descending
+        needed = offset + limit
+        hot = self.queryset
+        if after is not None:
+            cmp = 'lt' if descending else 'gt'
+            hot = hot.filter(Q(**{f'timestamp__{cmp}': after[0]}) | Q(timestamp=after[0], **{f'pk__{cmp}': after[1]}))
+        prefix = '-' if descending else ''
+        hot = hot.order_by(f'{prefix}timestamp', f'{prefix}pk')[:needed]
+
+        archived = (
+            AuditLog(**record)
+            for record in iter_archived_ordered(self.months, self.params, descending, after, needed)
+        )
+        merged = heapq.merge(hot.iterator(), archived, key=lambda log: (log.timestamp, log.pk), reverse=descending)
+        logs = list(islice(merged, offset, needed))
+        _attach_relations([log for log in logs if log._state.adding])
+        return logs
+
+
+class ArchiveKeysetPagination(KeysetPagination):
+    # KeysetPagination over ArchiveMergedResults (timestamp ordering only)
+    def get_ordering(self, request, queryset, view):
+        return 'timestamp', queryset.descending
+
+    def fetch(self, queryset, sort_key, desc, after, limit):
+        return queryset.fetch(limit, after=after, descending=desc)
+
+
+class ArchivePageNumberPagination(PageNumberPagination):
+    # ?page= over ArchiveMergedResults: reads offset + page_size + 1 rows and no more, so
+    # the total isn't known and `count` is null.
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+            if self.page_number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        results = queryset.fetch(self.page_size_value + 1, offset=(self.page_number - 1) * self.page_size_value)
+        self.has_next = len(results) > self.page_size_value
+        return results[:self.page_size_value]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', None),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class ArchivePagination(KeysetOrPageNumberPagination):
+    keyset_class = ArchiveKeysetPagination
+    page_number_class = ArchivePageNumberPagination
@@ -0,0 +1,103 @@
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .sinks import get_audit_sink
+
+logger = logging.getLogger(__name__)
+
+# Identical failures (same user or IP, action and status) inside a window are collapsed
+# into one AuditLog row: the first entry is held in memory, later hits only bump its
+# hit_count/last_seen_at, and the row goes to the audit sink when the window closes.
+# A client retrying an expired token 1000 times a minute thus costs one row per minute.
+
+
+class FailureCoalescer:
+    def __init__(self, sink, window, max_keys=None):
+        self.sink = sink
+        self.window = timedelta(seconds=window)
+        self.max_keys = max_keys or getattr(settings, 'AUDIT_LOG_COALESCE_MAX_KEYS', 5000)
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+        atexit.register(self.close)
+
+    def offer(self, key, entry):
+        now = entry['timestamp']
+        ready = []
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None and now - pending['timestamp'] < self.window:
+                pending['hit_count'] += 1
+                pending['last_seen_at'] = now
+                return
+            if pending is not None:
+                ready.append(self._pending.pop(key))
+            entry = dict(entry, hit_count=1, last_seen_at=now)
+            self._pending[key] = entry
+            # Too many distinct keys (e.g. a scan over random URLs): release the oldest.
+            while len(self._pending) > self.max_keys:
+                ready.append(self._pending.popitem(last=False)[1])
+        self._emit(ready)
+        self._ensure_thread()
+
+    def flush(self, force=False):
+        cutoff = timezone.now() - self.window
+        with self._lock:
+            expired = [key for key, entry in self._pending.items() if force or entry['timestamp'] <= cutoff]
+            ready = [self._pending.pop(key) for key in expired]
+        self._emit(ready)
+
+    def close(self):
+        self._stopped = True
+        self._wakeup.set()
+        self.flush(force=True)
+        self.sink.flush()
+
+    def _emit(self, entries):
+        for entry in entries:
+            if entry['hit_count'] == 1:
+                entry['last_seen_at'] = None
+            self.sink.emit(entry)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='audit-log-coalescer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        interval = max(self.window.total_seconds() / 4, 1)
+        while not self._stopped:
+            self._wakeup.wait(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"AuditLog coalescer: flush failed: {e}")
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_failure_coalescer():
+    # None when AUDIT_LOG_COALESCE_WINDOW is 0 (every failure is logged separately).
+    global _coalescer
+    window = getattr(settings, 'AUDIT_LOG_COALESCE_WINDOW', 60)
+    if not window:
+        return None
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = FailureCoalescer(get_audit_sink(), window)
+    return _coalescer
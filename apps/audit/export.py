@@ -0,0 +1,68 @@
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+
+from aerocrm_project.streaming import EXPORT_FORMATS, streaming_export_response
+
+from .archive import archived_months_for, iter_archived_records
+
+# Streaming audit export. Rows are read as tuples with values_list().iterator(), which
+# uses a server-side cursor on PostgreSQL, and written to the response as they are
+# produced, so memory stays flat regardless of how many rows match.
+
+EXPORT_COLUMNS = (
+    'id', 'timestamp', 'user_id', 'user_email', 'action', 'ip_address',
+    'user_agent', 'description', 'content_type', 'object_id', 'hit_count', 'last_seen_at',
+)
+QUERY_FIELDS = (
+    'id', 'timestamp', 'user_id', 'user__email', 'action', 'ip_address',
+    'user_agent', 'description', 'content_type__model', 'object_id', 'hit_count', 'last_seen_at',
+)
+CHUNK_SIZE = 2000
+
+
+def _format_row(row):
+    row = list(row)
+    for index in (1, 11): # timestamp, last_seen_at
+        row[index] = timezone.localtime(row[index]).isoformat() if row[index] else None
+    return row
+
+
+def iter_hot_rows(queryset, chunk_size=CHUNK_SIZE):
+    for row in queryset.values_list(*QUERY_FIELDS).iterator(chunk_size=chunk_size):
+        yield _format_row(row)
+
+
+def iter_archived_rows(params, chunk_size=CHUNK_SIZE):
+    # Archived records only carry ids; emails and content type names are looked up
+    # once per chunk.
+    months = archived_months_for(params)
+    if not months:
+        return
+    User = get_user_model()
+    records = iter_archived_records(sorted(months, key=lambda m: m.month, reverse=True), params)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        user_ids = {record['user_id'] for record in chunk if record.get('user_id')}
+        emails = dict(User.objects.filter(pk__in=user_ids).values_list('pk', 'email')) if user_ids else {}
+        for record in chunk:
+            ct_id = record.get('content_type_id')
+            yield _format_row((
+                record['id'], record['timestamp'], record.get('user_id'), emails.get(record.get('user_id')),
+                record.get('action'), record.get('ip_address'), record.get('user_agent'),
+                record.get('description'), ContentType.objects.get_for_id(ct_id).model if ct_id else None,
+                record.get('object_id'), record.get('hit_count', 1), record.get('last_seen_at'),
+            ))
+
+
+def iter_export_rows(queryset, params):
+    yield from iter_hot_rows(queryset)
+    yield from iter_archived_rows(params)
+
+
+def export_response(queryset, params, export_format='csv'):
+    return streaming_export_response(iter_export_rows(queryset, params), EXPORT_COLUMNS, export_format, 'audit-log')
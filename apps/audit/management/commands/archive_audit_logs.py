@@ -0,0 +1,56 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.audit.archive import add_months, export_month, month_start, purge_month
+from apps.audit.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = "Переносит закрытые месяцы журнала аудита в сжатые NDJSON-архивы и удаляет их из рабочей таблицы."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months', type=int, default=getattr(settings, 'AUDIT_HOT_MONTHS', 3),
+            help="Сколько закрытых месяцев оставить в рабочей таблице (по умолчанию AUDIT_HOT_MONTHS)."
+        )
+        parser.add_argument('--month', help="Архивировать только указанный месяц (YYYY-MM).")
+        parser.add_argument('--dry-run', action='store_true', help="Только показать, какие месяцы будут архивированы.")
+
+    def handle(self, *args, **options):
+        current = month_start(timezone.localdate())
+        if options['month']:
+            try:
+                year, month = (int(part) for part in options['month'].split('-'))
+                months = [date(year, month, 1)]
+            except ValueError:
+                raise CommandError("Месяц нужно указать в формате YYYY-MM.")
+            if months[0] >= current:
+                raise CommandError("Текущий месяц ещё не закрыт.")
+        else:
+            months = self._closed_months(add_months(current, -options['keep_months']))
+
+        if not months:
+            self.stdout.write("Нет месяцев для архивации.")
+            return
+
+        for month in months:
+            if options['dry_run']:
+                self.stdout.write(f"{month:%Y-%m}: будет архивирован")
+                continue
+            path, count = export_month(month)
+            purge_month(month)
+            self.stdout.write(self.style.SUCCESS(f"{month:%Y-%m}: {count} записей перенесено в {path}"))
+
+    def _closed_months(self, cutoff):
+        oldest = AuditLog.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+        if oldest is None:
+            return []
+        months = []
+        month = month_start(timezone.localtime(oldest).date())
+        while month < cutoff:
+            months.append(month)
+            month = add_months(month, 1)
+        return months
@@ -0,0 +1,87 @@
+import resource
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.audit.models import AuditLog
+from apps.audit.views import AuditLogViewSet
+
+BENCH_ACTION = 'BENCHMARK export'
+
+
+class Command(BaseCommand):
+    help = "Замер пропускной способности потокового экспорта журнала аудита (не запускать на боевой БД)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Сколько тестовых записей создать.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--export-format', default='csv', choices=['csv', 'ndjson'])
+        parser.add_argument('--keep', action='store_true', help="Не удалять тестовые записи после замера.")
+        parser.add_argument(
+            '--trace-memory', action='store_true',
+            help="Измерять пиковое потребление памяти через tracemalloc (заметно замедляет замер)."
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        batch_size = options['batch_size']
+        existing = AuditLog.objects.filter(action=BENCH_ACTION).count()
+        if existing < rows:
+            self._seed(rows - existing, batch_size)
+
+        admin = get_user_model().objects.filter(is_staff=True, is_active=True).first()
+        if admin is None:
+            self.stderr.write("Нужен хотя бы один активный администратор (is_staff=True).")
+            return
+
+        request = APIRequestFactory().get(
+            '/api/v1/audit/export/', {'action': BENCH_ACTION, 'export_format': options['export_format']}
+        )
+        force_authenticate(request, user=admin)
+        view = AuditLogViewSet.as_view({'get': 'export'})
+
+        if options['trace_memory']:
+            tracemalloc.start()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        response = view(request)
+        exported = -1 if options['export_format'] == 'csv' else 0  # CSV header line
+        size = 0
+        for chunk in response.streaming_content:
+            size += len(chunk)
+            exported += chunk.count(b'\n')
+        elapsed = time.perf_counter() - started
+        rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Экспортировано {exported} строк ({size / 1024 / 1024:.1f} МБ) за {elapsed:.2f} с: "
+            f"{exported / elapsed:,.0f} строк/с, рост max RSS {rss_growth / 1024:.1f} МБ"
+        ))
+        if options['trace_memory']:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(f"Пик памяти Python (tracemalloc): {peak / 1024 / 1024:.1f} МБ")
+
+        if not options['keep']:
+            deleted, _ = AuditLog.objects.filter(action=BENCH_ACTION).delete()
+            self.stdout.write(f"Удалено тестовых записей: {deleted}")
+
+    def _seed(self, count, batch_size):
+        now = timezone.now()
+        created = 0
+        started = time.perf_counter()
+        while created < count:
+            size = min(batch_size, count - created)
+            AuditLog.objects.bulk_create([
+                AuditLog(
+                    action=BENCH_ACTION, timestamp=now, ip_address='127.0.0.1',
+                    user_agent='benchmark', description=f"Status: 200. Benchmark row {created + i}",
+                )
+                for i in range(size)
+            ])
+            created += size
+        self.stdout.write(f"Создано {created} тестовых записей за {time.perf_counter() - started:.1f} с")
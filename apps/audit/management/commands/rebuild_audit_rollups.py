@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.audit.rollups import rebuild_rollups, update_rollups
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает почасовые сводки журнала аудита (или догоняет их с --incremental)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true', help="Только учесть новые записи после водяной отметки.")
+        parser.add_argument(
+            '--include-archived', action='store_true',
+            help="Пересчитать и архивные месяцы по файлам архива (иначе их сводки сохраняются)."
+        )
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if options['incremental']:
+            processed = update_rollups(batch_size=options['batch_size'])
+        else:
+            processed = rebuild_rollups(batch_size=options['batch_size'], include_archived=options['include_archived'])
+        self.stdout.write(self.style.SUCCESS(f"Учтено записей аудита: {processed}"))
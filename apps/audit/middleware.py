@@ -1,4 +1,5 @@
-from .models import AuditLog
+from .coalescing import get_failure_coalescer
+from .sinks import get_audit_sink
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 import json
@@ -118,19 +119,25 @@ class AuditLogMiddleware:
              if object_id: action += f" ID={object_id}"
 
 
+        entry = {
+            'user_id': user.pk if user else None,
+            'action': action[:255],
+            'timestamp': timezone.now(),
+            'ip_address': get_client_ip(request),
+            'user_agent': request.META.get('HTTP_USER_AGENT', '')[:1000],
+            'description': description[:1000],
+            'content_type_id': content_type.pk if content_type else None,
+            'object_id': object_id,
+        }
+
+        # Handed to the configured sink (buffered by default) instead of an INSERT per request;
+        # repeated identical failures are collapsed into one row first.
         try:
-            AuditLog.objects.create(
-                user=user,
-                action=action[:255],
-                timestamp=timezone.now(),
-                ip_address=get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')[:1000],
-                description=description[:1000],
-                content_type=content_type,
-                object_id=object_id
-            )
+            coalescer = get_failure_coalescer() if status_code >= 400 else None
+            if coalescer is not None:
+                key = (entry['user_id'] or entry['ip_address'], entry['action'], status_code)
+                coalescer.offer(key, entry)
+            else:
+                get_audit_sink().emit(entry)
         except Exception as e:
              logger.error(f"AuditLogMiddleware: Failed to create audit log: {e}")
-
-
-
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
@@ -22,11 +24,19 @@ class AuditLog(models.Model):
     )
     object_id = models.CharField(max_length=255, null=True, blank=True, verbose_name=_("ID связанного объекта")) # Use CharField for flexibility if PK isn't int
     target_object = GenericForeignKey('content_type', 'object_id')
+    # Repeated identical failures are coalesced into one row (see apps.audit.coalescing):
+    # `timestamp` is the first occurrence, `last_seen_at` the last one.
+    hit_count = models.PositiveIntegerField(_("Количество повторов"), default=1)
+    last_seen_at = models.DateTimeField(_("Последнее повторение"), null=True, blank=True)
 
     class Meta:
         verbose_name = _("Запись аудита")
         verbose_name_plural = _("Журнал аудита")
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination key: (timestamp, id), see aerocrm_project.pagination
+            models.Index(fields=['timestamp', 'id'], name='audit_ts_id_idx'),
+        ]
 
     def __str__(self):
         user_str = self.user.email if self.user else "Система/Аноним"
@@ -34,3 +44,72 @@ class AuditLog(models.Model):
         return f"{ts_str} - {user_str} - {self.action}"
 
 
+
+
+class AuditArchive(models.Model):
+    month = models.DateField(_("Месяц"), unique=True, help_text=_("Первый день архивного месяца"))
+    file_path = models.CharField(_("Файл архива"), max_length=500)
+    row_count = models.PositiveIntegerField(_("Количество записей"), default=0)
+    # Highest AuditLog id in the file; purge_month deletes only up to it, so rows written
+    # after the export stay in the hot table for the next export
+    max_id = models.BigIntegerField(_("Последний id в архиве"), default=0)
+    archived_at = models.DateTimeField(_("Дата архивации"), default=timezone.now)
+
+    class Meta:
+        verbose_name = _("Архив аудита")
+        verbose_name_plural = _("Архивы аудита")
+        ordering = ['-month']
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} ({self.row_count})"
+
+
+class AuditRollup(models.Model):
+    # Hourly counters of audit events, maintained incrementally from AuditLog by
+    # apps.audit.rollups.update_rollups (watermark in AuditRollupState).
+    STATUS_CLASS_CHOICES = [
+        (0, _('Неизвестно')), (2, '2xx'), (3, '3xx'), (4, '4xx'), (5, '5xx'),
+    ]
+
+    bucket = models.DateTimeField(_("Час"), db_index=True)
+    action = models.CharField(_("Действие"), max_length=255)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, verbose_name=_("Пользователь"),
+        on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    status_class = models.PositiveSmallIntegerField(_("Класс статуса"), choices=STATUS_CLASS_CHOICES, default=0)
+    count = models.PositiveIntegerField(_("Количество"), default=0)
+
+    class Meta:
+        verbose_name = _("Сводка аудита")
+        verbose_name_plural = _("Сводки аудита")
+        ordering = ['-bucket']
+        indexes = [
+            models.Index(fields=['bucket', 'action', 'user', 'status_class'], name='audit_rollup_key_idx'),
+            models.Index(fields=['action', 'bucket'], name='audit_rollup_action_idx'),
+        ]
+        constraints = [
+            # One row per key; user is nullable and NULLs never conflict, hence COALESCE
+            models.UniqueConstraint(
+                'bucket', 'action', Coalesce('user', Value(0)), 'status_class', name='audit_rollup_key_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.bucket:%Y-%m-%d %H}:00 {self.action} ({self.count})"
+
+
+class AuditRollupState(models.Model):
+    last_log_id = models.BigIntegerField(_("Последняя учтённая запись аудита"), default=0)
+    # Newest id seen at pending_since; rows up to it are folded once it is AUDIT_ROLLUP_LAG old
+    pending_log_id = models.BigIntegerField(_("Снимок последней записи аудита"), default=0)
+    pending_since = models.DateTimeField(_("Время снимка"), null=True, blank=True)
+    updated_at = models.DateTimeField(_("Дата обновления"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Состояние сводок аудита")
+        verbose_name_plural = _("Состояние сводок аудита")
+
+    def __str__(self):
+        return f"AuditLog ID <= {self.last_log_id}"
+
@@ -0,0 +1,139 @@
+import logging
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .archive import month_bounds, month_start, add_months
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Monthly RANGE partitioning of the audit table on PostgreSQL. The Django model stays
+# unchanged; only the physical table is swapped for a partitioned one. On other
+# databases every function here is a no-op and archival falls back to batched DELETEs.
+
+TABLE = AuditLog._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def is_partitioned():
+    if not is_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def _partition_exists(cursor, name):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+    return cursor.fetchone()[0]
+
+
+def _create_partition(cursor, month):
+    name = partition_name(month)
+    if _partition_exists(cursor, name):
+        return False
+    start, end = month_bounds(month)
+    cursor.execute(
+        f'CREATE TABLE "{name}" PARTITION OF "{TABLE}" FOR VALUES FROM (%s) TO (%s)',
+        [start, end]
+    )
+    return True
+
+
+def ensure_partitions(months_ahead=2, since=None):
+    if not is_partitioned():
+        return 0
+    first = month_start(since or timezone.localdate())
+    last = add_months(month_start(timezone.localdate()), months_ahead)
+    created = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        month = first
+        while month <= last:
+            created += _create_partition(cursor, month)
+            month = add_months(month, 1)
+    if created:
+        logger.info(f"Audit partitions: created {created} monthly partitions of {TABLE}")
+    return created
+
+
+def convert_to_partitioned(months_ahead=2):
+    # One-off conversion of the plain table created by syncdb/migrate. The primary key
+    # becomes (id, timestamp) because PostgreSQL requires the partition key in it; ids
+    # keep coming from a standalone sequence continuing after the current maximum.
+    if not is_supported() or is_partitioned():
+        return False
+
+    old = f'{TABLE}_unpartitioned'
+    seq = f'{TABLE}_id_seq_p'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s "
+            "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u'))",
+            [TABLE, TABLE]
+        )
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [TABLE]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1, MIN("timestamp") FROM "{TABLE}"')
+        next_id, oldest = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{old}"')
+        for conname, _definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE "{old}" DROP CONSTRAINT "{conname}"')
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS "{seq}" START WITH {int(next_id)}')
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{old}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(f'''ALTER TABLE "{TABLE}" ALTER COLUMN id SET DEFAULT nextval('"{seq}"')''')
+        cursor.execute(f'ALTER SEQUENCE "{seq}" OWNED BY "{TABLE}".id')
+        cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+
+        month = month_start(timezone.localtime(oldest).date() if oldest else timezone.localdate())
+        last = add_months(month_start(timezone.localdate()), months_ahead)
+        while month <= last:
+            _create_partition(cursor, month)
+            month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{old}"')
+        cursor.execute(f'DROP TABLE "{old}"')
+        # Constraint and index names are free again once the old table is gone.
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY (id, "timestamp")')
+        for index_def in index_defs:
+            cursor.execute(index_def)
+        for conname, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{conname}" {definition}')
+    logger.info(f"Audit partitions: converted {TABLE} to a monthly partitioned table")
+    return True
+
+
+def drop_partition(month, max_id=None):
+    # Dropping a partition is O(1) compared to DELETE-ing a month of rows. With `max_id`
+    # the partition is kept (and left to batched DELETEs) if it holds newer rows.
+    if not is_partitioned():
+        return False
+    name = partition_name(month)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not _partition_exists(cursor, name):
+            return False
+        if max_id is not None:
+            cursor.execute(f'LOCK TABLE "{name}" IN ACCESS EXCLUSIVE MODE')
+            cursor.execute(f'SELECT 1 FROM "{name}" WHERE id > %s LIMIT 1', [max_id])
+            if cursor.fetchone() is not None:
+                return False
+        cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+        cursor.execute(f'DROP TABLE "{name}"')
+    return True
@@ -0,0 +1,173 @@
+import logging
+import re
+from collections import Counter
+from datetime import timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .archive import iter_archive_file, month_bounds
+from .models import AuditArchive, AuditLog, AuditRollup, AuditRollupState
+
+logger = logging.getLogger(__name__)
+
+# Incremental hourly rollups for the dashboard charts. Each run folds AuditLog rows with
+# id above the stored watermark into AuditRollup counters and advances the watermark in
+# the same transaction. Several processes insert audit rows, and a transaction holding a
+# lower id may commit after a higher one is visible. So rows are folded only up to the
+# newest id seen at least AUDIT_ROLLUP_LAG seconds ago (the pending snapshot); by then
+# every lower id has committed and each row is counted exactly once.
+
+STATUS_RE = re.compile(r'^Status: (\d)\d\d')
+OBJECT_ID_RE = re.compile(r' ID=\S+$')
+PATH_ID_RE = re.compile(r'/\d+(?=/|$)')
+
+
+def status_class(description):
+    # AuditLogMiddleware writes "Status: <code>..." at the start of the description.
+    match = STATUS_RE.match(description or '')
+    return int(match.group(1)) if match else 0
+
+
+def normalize_action(action):
+    # "Update: Document ID=15" -> "Update: Document", "GET /api/v1/documents/15/" ->
+    # "GET /api/v1/documents/{id}/", so object ids don't explode the number of keys.
+    action = OBJECT_ID_RE.sub('', action or '')
+    return PATH_ID_RE.sub('/{id}', action)[:255]
+
+
+def hour_bucket(timestamp):
+    return timestamp.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _merge(counts):
+    buckets = {key[0] for key in counts}
+    existing = {
+        (row.bucket, row.action, row.user_id, row.status_class): row
+        for row in AuditRollup.objects.select_for_update().filter(bucket__in=buckets)
+    }
+    to_update, to_create = [], []
+    for key, count in counts.items():
+        row = existing.get(key)
+        if row is not None:
+            row.count += count
+            to_update.append(row)
+        else:
+            bucket, action, user_id, status = key
+            to_create.append(AuditRollup(bucket=bucket, action=action, user_id=user_id, status_class=status, count=count))
+    AuditRollup.objects.bulk_update(to_update, ['count'], batch_size=1000)
+    AuditRollup.objects.bulk_create(to_create, batch_size=1000)
+
+
+def update_rollups(batch_size=10000, max_batches=None):
+    lag = timedelta(seconds=settings.AUDIT_ROLLUP_LAG)
+    processed = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            state, _ = AuditRollupState.objects.select_for_update().get_or_create(pk=1)
+            if state.last_log_id >= state.pending_log_id:
+                # Snapshot folded: take the next one, it is folded on a later run
+                newest = AuditLog.objects.aggregate(newest=Max('pk'))['newest'] or 0
+                if newest > state.pending_log_id:
+                    state.pending_log_id, state.pending_since = newest, timezone.now()
+                    state.save(update_fields=['pending_log_id', 'pending_since', 'updated_at'])
+                break
+            if state.pending_since and state.pending_since > timezone.now() - lag:
+                break
+            rows = list(
+                AuditLog.objects.filter(pk__gt=state.last_log_id, pk__lte=state.pending_log_id).order_by('pk')
+                .values_list('pk', 'timestamp', 'action', 'user_id', 'description', 'hit_count')[:batch_size]
+            )
+            # A coalesced failure row stands for `hit_count` requests.
+            _fold_rows((row[1:] for row in rows), batch_size)
+            state.last_log_id = rows[-1][0] if len(rows) == batch_size else state.pending_log_id
+            state.save(update_fields=['last_log_id', 'updated_at'])
+        processed += len(rows)
+        batches += 1
+    if processed:
+        logger.info(f"Audit rollups: processed {processed} audit log rows")
+    return processed
+
+
+def _fold_rows(rows, batch_size):
+    # rows: (timestamp, action, user_id, description, hit_count); merged every `batch_size` keys
+    counts = Counter()
+    processed = 0
+    for timestamp, action, user_id, description, hit_count in rows:
+        counts[(hour_bucket(timestamp), normalize_action(action), user_id, status_class(description))] += hit_count
+        processed += 1
+        if len(counts) >= batch_size:
+            _merge(counts)
+            counts.clear()
+    if counts:
+        _merge(counts)
+    return processed
+
+
+def _archived_rows(path):
+    for record in iter_archive_file(path):
+        yield (
+            parse_datetime(record['timestamp']), record.get('action'), record.get('user_id'),
+            record.get('description'), record.get('hit_count') or 1,
+        )
+
+
+def rebuild_rollups(batch_size=10000, include_archived=False):
+    # Recomputes the rollups from the hot table. Archived months are no longer in
+    # AuditLog, so their buckets are kept as they are, or with include_archived
+    # recomputed from the archive files.
+    archives = list(AuditArchive.objects.order_by('month'))
+    boundary = month_bounds(archives[-1].month)[1] if archives and not include_archived else None
+    processed = 0
+    with transaction.atomic():
+        state, _ = AuditRollupState.objects.select_for_update().get_or_create(pk=1)
+        # Up to the watermark only; newer rows are left to update_rollups and its lag
+        max_id = state.last_log_id
+        hot = AuditLog.objects.filter(pk__lte=max_id)
+        stale = AuditRollup.objects.all()
+        if boundary is not None:
+            stale = stale.filter(bucket__gte=boundary)
+            hot = hot.filter(timestamp__gte=boundary)
+        stale.delete()
+
+        if include_archived:
+            for archive in archives:
+                # Hot rows of an archived month up to max_id are in its file as well
+                start, end = month_bounds(archive.month)
+                hot = hot.exclude(timestamp__gte=start, timestamp__lt=end, pk__lte=archive.max_id)
+                if Path(archive.file_path).exists():
+                    processed += _fold_rows(_archived_rows(archive.file_path), batch_size)
+                else:
+                    logger.warning(f"Audit rollups: archive file is missing, {archive.month:%Y-%m} not counted: {archive.file_path}")
+
+        rows = hot.values_list('timestamp', 'action', 'user_id', 'description', 'hit_count')
+        processed += _fold_rows(rows.iterator(chunk_size=batch_size), batch_size)
+    # Plus rows past the watermark whose snapshot has aged
+    return processed + update_rollups(batch_size=batch_size)
+
+
+STATS_GROUP_FIELDS = {'action': 'action', 'user': 'user_id', 'status_class': 'status_class'}
+STATS_INTERVALS = {'hour': TruncHour, 'day': TruncDay}
+
+
+def rollup_series(start, end, interval='hour', group_by=(), filters=None):
+    # Trend query answered from AuditRollup only: a few hundred rows per day at most,
+    # regardless of how many audit events there were.
+    queryset = AuditRollup.objects.filter(bucket__gte=start, bucket__lt=end)
+    for lookup, value in (filters or {}).items():
+        queryset = queryset.filter(**{lookup: value})
+    fields = [STATS_GROUP_FIELDS[name] for name in group_by]
+    if 'user_id' in fields:
+        fields.append('user__email')
+    return (
+        queryset.annotate(period=STATS_INTERVALS[interval]('bucket'))
+        .values('period', *fields)
+        .annotate(count=Sum('count'))
+        .order_by('period', *fields)
+    )
@@ -0,0 +1,20 @@
+from aerocrm_project import fulltext
+
+from .models import AuditLog
+
+# Full-text index over AuditLog.action + description (aerocrm_project.fulltext).
+
+INDEX = fulltext.FullTextIndex(AuditLog, ['action', 'description'], ordering=('-timestamp', '-id'))
+
+
+def install_search_index():
+    return INDEX.install()
+
+
+def search_condition(query):
+    return INDEX.condition(query)
+
+
+class FullTextSearchFilter(fulltext.FullTextSearchFilter):
+    # ?q= ranked full-text mode; the icontains SearchFilter (?search=) is left as is.
+    index = INDEX
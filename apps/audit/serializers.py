@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import AuditLog
 from apps.users.serializers import UserSummarySerializer
+from aerocrm_project.generic_relations import get_generic_target
 
 class AuditLogSerializer(serializers.ModelSerializer):
     user = UserSummarySerializer(read_only=True)
@@ -10,13 +11,14 @@ class AuditLogSerializer(serializers.ModelSerializer):
         model = AuditLog
         fields = [
             'id', 'timestamp', 'user', 'action', 'ip_address', 'user_agent',
-            'description', 'target_object_info'
+            'description', 'target_object_info', 'hit_count', 'last_seen_at'
         ]
         read_only_fields = fields
 
     def get_target_object_info(self, obj):
          if obj.content_type and obj.object_id:
-              target_str = str(obj.target_object) if obj.target_object else f"ID: {obj.object_id}"
+              target = get_generic_target(obj, 'target_object') # Resolved per page by the view
+              target_str = str(target) if target else f"ID: {obj.object_id}"
               return {
                   'type': obj.content_type.model,
                   'id': obj.object_id,
@@ -1,3 +1,31 @@
-# No signals needed for audit log usually, middleware handles it.
+from django.conf import settings
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+import logging
 
+from . import partitioning, search
 
+logger = logging.getLogger(__name__)
+
+# Request logging itself is done by AuditLogMiddleware; signals here only maintain storage.
+
+
+@receiver(post_migrate)
+def setup_audit_partitions(sender, **kwargs):
+    if sender.name != 'apps.audit' or not getattr(settings, 'AUDIT_LOG_PARTITIONING', True):
+        return
+    try:
+        if not partitioning.convert_to_partitioned():
+            partitioning.ensure_partitions()
+    except Exception as e:
+        logger.error(f"Audit partitions: could not set up partitioning: {e}", exc_info=True)
+
+
+@receiver(post_migrate)
+def setup_audit_search_index(sender, **kwargs):
+    if sender.name != 'apps.audit':
+        return
+    try:
+        search.install_search_index()
+    except Exception as e:
+        logger.error(f"Audit search: could not install full-text index: {e}", exc_info=True)
@@ -0,0 +1,164 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connections
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Sinks receive plain dicts of AuditLog field values (FKs as *_id), so entries can be
+# buffered in memory or serialized to a Celery broker without touching model instances.
+
+DATETIME_FIELDS = ('timestamp', 'last_seen_at')
+
+
+def build_audit_logs(entries):
+    logs = []
+    for entry in entries:
+        entry = dict(entry)
+        for field in DATETIME_FIELDS:
+            if isinstance(entry.get(field), str):
+                entry[field] = parse_datetime(entry[field])
+        logs.append(AuditLog(**entry))
+    return logs
+
+
+class BaseAuditSink:
+    def emit(self, entry):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class DatabaseAuditSink(BaseAuditSink):
+    # Old behaviour: one INSERT per logged request, on the request thread.
+    def emit(self, entry):
+        try:
+            AuditLog.objects.create(**entry)
+        except Exception as e:
+            logger.error(f"AuditSink: Failed to create audit log: {e}")
+
+
+class BufferedAuditSink(BaseAuditSink):
+    # Collects entries in process memory and writes them with bulk_create, either when
+    # the buffer reaches `batch_size` or `flush_interval` seconds after the oldest entry.
+    # Entries are written in arrival order; the buffer is flushed on interpreter exit.
+    def __init__(self, batch_size=None, flush_interval=None, max_buffer=None):
+        self.batch_size = batch_size or getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 100)
+        self.flush_interval = flush_interval or getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 2.0)
+        self.max_buffer = max_buffer or getattr(settings, 'AUDIT_LOG_MAX_BUFFER', 10000)
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._oldest = None
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+        atexit.register(self.close)
+
+    def emit(self, entry):
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                # Writer is falling behind (e.g. DB is down) - drop the oldest entry
+                # rather than growing without bound.
+                self._buffer.popleft()
+                logger.warning("AuditSink: buffer is full, dropping oldest audit entry")
+            self._buffer.append(entry)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._buffer) >= self.batch_size
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        # _flush_lock serializes writers so batches hit the database in order.
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._buffer:
+                        self._oldest = None
+                        return
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                    self._oldest = time.monotonic() if self._buffer else None
+                self._write_batch(batch)
+
+    def close(self):
+        self._stopped = True
+        self._wakeup.set()
+        self.flush()
+
+    def _write_batch(self, batch):
+        try:
+            AuditLog.objects.bulk_create(build_audit_logs(batch), batch_size=self.batch_size)
+        except Exception as e:
+            logger.error(f"AuditSink: Failed to write {len(batch)} audit log entries: {e}")
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+            self._thread.start()
+
+    def _due(self):
+        with self._lock:
+            if not self._buffer:
+                return False
+            return (len(self._buffer) >= self.batch_size
+                    or time.monotonic() - self._oldest >= self.flush_interval)
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval / 2)
+            self._wakeup.clear()
+            if self._due():
+                self.flush()
+                # The flusher thread owns its own DB connection; don't keep it open idle.
+                connections.close_all()
+
+
+class CeleryAuditSink(BufferedAuditSink):
+    # Same buffering, but batches are handed to a Celery worker instead of being
+    # inserted from the web process.
+    def _write_batch(self, batch):
+        from .tasks import write_audit_entries
+        payload = []
+        for entry in batch:
+            entry = dict(entry)
+            for field in DATETIME_FIELDS:
+                if entry.get(field) is not None:
+                    entry[field] = entry[field].isoformat()
+            payload.append(entry)
+        try:
+            write_audit_entries.delay(payload)
+        except Exception as e:
+            logger.error(f"AuditSink: Failed to enqueue {len(batch)} audit log entries, writing directly: {e}")
+            super()._write_batch(batch)
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_audit_sink():
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                sink_path = getattr(settings, 'AUDIT_LOG_SINK', 'apps.audit.sinks.BufferedAuditSink')
+                _sink = import_string(sink_path)()
+    return _sink
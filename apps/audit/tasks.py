@@ -0,0 +1,34 @@
+from celery import shared_task
+from django.core.management import call_command
+import logging
+
+from . import partitioning, rollups
+from .models import AuditLog
+from .sinks import build_audit_logs
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name="write_audit_entries", ignore_result=True)
+def write_audit_entries(entries):
+    try:
+        AuditLog.objects.bulk_create(build_audit_logs(entries), batch_size=500)
+    except Exception as e:
+        logger.error(f"Error in write_audit_entries task ({len(entries)} entries): {e}", exc_info=True)
+
+
+@shared_task(name="ensure_audit_partitions")
+def ensure_audit_partitions():
+    created = partitioning.ensure_partitions()
+    return f"Создано партиций журнала аудита: {created}"
+
+
+@shared_task(name="archive_audit_logs")
+def archive_audit_logs():
+    call_command('archive_audit_logs')
+
+
+@shared_task(name="update_audit_rollups")
+def update_audit_rollups():
+    processed = rollups.update_rollups()
+    return f"Учтено записей аудита в сводках: {processed}"
@@ -1,18 +1,32 @@
-from rest_framework import viewsets, permissions, mixins
+from rest_framework import viewsets, permissions, mixins, serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
 from rest_framework import filters
 
+from .archive import ArchiveMergedResults, ArchivePagination, archived_months_for
+from .export import EXPORT_FORMATS, export_response
+from .rollups import STATS_GROUP_FIELDS, STATS_INTERVALS, rollup_series
 from .models import AuditLog
+from .search import FullTextSearchFilter
 from .serializers import AuditLogSerializer
 from apps.users.permissions import IsAdminUser
+from aerocrm_project.generic_relations import GenericTargetsMixin
+from aerocrm_project.pagination import KeysetOrPageNumberPagination
 
-class AuditLogViewSet(mixins.ListModelMixin,
+class AuditLogViewSet(GenericTargetsMixin,
+                      mixins.ListModelMixin,
                       mixins.RetrieveModelMixin,
                       viewsets.GenericViewSet):
     queryset = AuditLog.objects.select_related('user', 'content_type').all()
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminUser]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetOrPageNumberPagination # ?cursor= / ?pagination=cursor for deep history
+    generic_target_fields = ['target_object']
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter, FullTextSearchFilter]
     filterset_fields = {
         'user': ['exact'],
         'action': ['exact', 'icontains'],
@@ -25,4 +39,91 @@ class AuditLogViewSet(mixins.ListModelMixin,
     ordering_fields = ['timestamp', 'user__email', 'action']
     ordering = ['-timestamp']
 
+    def list(self, request, *args, **kwargs):
+        # Date filters that reach into archived months also read the NDJSON archives,
+        # merged with the hot rows in timestamp order (apps.audit.archive).
+        months = archived_months_for(request.query_params)
+        if not months:
+            return super().list(request, *args, **kwargs)
 
+        ordering = request.query_params.get('ordering', '').strip() or '-timestamp'
+        if ordering not in ('timestamp', '-timestamp'):
+            return Response(
+                {"detail": "Для периода с архивными месяцами поддерживается только сортировка timestamp или -timestamp."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        results = ArchiveMergedResults(queryset, months, request.query_params, descending=ordering.startswith('-'))
+        paginator = ArchivePagination()
+        page = self.resolve_generic_targets(paginator.paginate_queryset(results, request, view=self))
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        # Same filters as the list, streamed as CSV (default) or NDJSON without pagination.
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"detail": f"Неподдерживаемый формат экспорта. Допустимые: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(queryset, request.query_params, export_format)
+
+    @action(detail=False, methods=['get'], url_path='stats')
+    def stats(self, request):
+        # Trends from the hourly AuditRollup table, never from the raw log.
+        params = request.query_params
+        interval = params.get('interval', 'hour')
+        group_by = [name for name in params.get('group_by', '').split(',') if name]
+        if interval not in STATS_INTERVALS:
+            return Response({"detail": f"interval: допустимые значения {', '.join(STATS_INTERVALS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        if any(name not in STATS_GROUP_FIELDS for name in group_by):
+            return Response({"detail": f"group_by: допустимые значения {', '.join(STATS_GROUP_FIELDS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            end = self._parse_stats_bound(params.get('date_to'), end_of_day=True) or timezone.now()
+            start = self._parse_stats_bound(params.get('date_from')) or (
+                end - (timedelta(days=1) if interval == 'hour' else timedelta(days=30))
+            )
+            filters = {}
+            if params.get('action'):
+                filters['action'] = params['action']
+            if params.get('action__icontains'):
+                filters['action__icontains'] = params['action__icontains']
+            if params.get('user'):
+                filters['user_id'] = int(params['user'])
+            if params.get('status_class'):
+                filters['status_class'] = int(params['status_class'])
+        except ValueError:
+            return Response({"detail": "Неверный формат параметров."}, status=status.HTTP_400_BAD_REQUEST)
+
+        period_field = serializers.DateTimeField()
+        results = []
+        for row in rollup_series(start, end, interval, group_by, filters):
+            row['period'] = period_field.to_representation(row['period'])
+            if 'user_id' in row:
+                row['user'] = row.pop('user_id')
+                row['user_email'] = row.pop('user__email')
+            results.append(row)
+        return Response({
+            'interval': interval,
+            'date_from': period_field.to_representation(start),
+            'date_to': period_field.to_representation(end),
+            'results': results,
+        })
+
+    def _parse_stats_bound(self, value, end_of_day=False):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(value)
+            if end_of_day:
+                day += timedelta(days=1)
+            parsed = datetime.combine(day, time.min)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
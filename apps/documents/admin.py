@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
-from .models import DocumentType, Document, DocumentAssignment, PersonalDocument
+from .models import DocumentType, Document, DocumentAssignment, PersonalDocument, PersonalDocumentImport, StoredBlob
 from django.utils.translation import gettext_lazy as _
 
 @admin.register(DocumentType)
@@ -12,7 +12,7 @@ class DocumentTypeAdmin(admin.ModelAdmin):
 class DocumentAssignmentInline(admin.TabularInline):
     model = DocumentAssignment
     extra = 0
-    readonly_fields = ('user', 'assigned_at', 'acknowledged_at', 'is_acknowledged')
+    readonly_fields = ('user', 'role', 'assigned_at', 'acknowledged_at', 'is_acknowledged')
     autocomplete_fields = ['user']
     verbose_name = _("Статус ознакомления")
     verbose_name_plural = _("Статусы ознакомления")
@@ -26,24 +26,32 @@ class DocumentAssignmentInline(admin.TabularInline):
 
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
-    list_display = ('title', 'document_type', 'created_by', 'created_at', 'acknowledgment_deadline')
+    list_display = ('title', 'document_type', 'created_by', 'created_at', 'acknowledgment_deadline', 'get_acknowledgment_progress')
     list_filter = ('document_type', 'created_by', 'assignee_roles')
     search_fields = ('title', 'document_type__name', 'created_by__email')
     filter_horizontal = ('assignee_roles',) # Assignees are managed through inline
-    readonly_fields = ('created_at', 'updated_at', 'created_by')
+    readonly_fields = ('created_at', 'updated_at', 'created_by', 'assignments_total', 'assignments_acknowledged')
     autocomplete_fields = ['created_by']
     inlines = [DocumentAssignmentInline]
+    list_select_related = ('document_type', 'created_by')
     fieldsets = (
         (None, {'fields': ('title', 'document_type', 'document_file', 'acknowledgment_deadline')}),
         (_('Назначение Ролям'), {'fields': ('assignee_roles',)}),
-        (_('Информация'), {'fields': ('created_by', 'created_at', 'updated_at')}),
+        (_('Информация'), {'fields': ('created_by', 'created_at', 'updated_at', 'assignments_total', 'assignments_acknowledged')}),
     )
 
+    @admin.display(description=_('Ознакомлено'), ordering='assignments_acknowledged')
+    def get_acknowledgment_progress(self, obj):
+        return f"{obj.assignments_acknowledged} / {obj.assignments_total}"
+
     def save_model(self, request, obj, form, change):
         if not obj.pk:
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('content_text')
+
 
 @admin.register(PersonalDocument)
 class PersonalDocumentAdmin(admin.ModelAdmin):
@@ -74,3 +82,32 @@ class PersonalDocumentAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'ref_count', 'created_at', 'last_uploaded_at')
+    list_filter = (('last_uploaded_at', admin.DateFieldListFilter),)
+    search_fields = ('name', 'digest')
+    readonly_fields = ('name', 'digest', 'size', 'ref_count', 'created_at', 'last_uploaded_at')
+
+    def has_add_permission(self, request):
+        return False # Created by the storage backend on upload
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PersonalDocumentImport)
+class PersonalDocumentImportAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'created_by', 'created_at', 'finished_at', 'total_rows', 'created_count', 'error_count')
+    list_filter = ('status',)
+    list_select_related = ('created_by',)
+    readonly_fields = (
+        'manifest', 'archive', 'created_by', 'status', 'total_rows', 'created_count',
+        'error_count', 'errors', 'created_at', 'finished_at'
+    )
+
+    def has_add_permission(self, request):
+        return False # Created through the API or the import_personal_documents command
+
+    def has_change_permission(self, request, obj=None):
+        return False
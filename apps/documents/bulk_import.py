@@ -0,0 +1,301 @@
+import csv
+import io
+import logging
+import os
+import zipfile
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from aerocrm_project.thumbnails import schedule_thumbnail
+
+from .models import DocumentType, PersonalDocument, PersonalDocumentImport
+from .storage import retain_blobs
+from .textextract import decode_text
+
+logger = logging.getLogger(__name__)
+
+# Bulk import of personal documents: a CSV manifest (one row per document) plus an
+# optional ZIP with the scans. All rows are validated up front with one query per lookup
+# (users, document types, existing documents) instead of the per-row queries of
+# PersonalDocumentSerializer.validate; valid rows are inserted with bulk_create in
+# batches and every rejected row is reported with its line number.
+#
+# Manifest columns: email or employee_id, document_type (name or id), expiry_date,
+# and optionally document_number, issue_date, notes and file (path inside the ZIP).
+# Dates are ГГГГ-ММ-ДД or ДД.ММ.ГГГГ; ',' or ';' separated, UTF-8 or cp1251.
+
+USER_COLUMNS = ('email', 'employee_id')
+REQUIRED_COLUMNS = ('document_type', 'expiry_date')
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y')
+MAX_FILE_SIZE = 50 * 1024 * 1024
+DUPLICATE_MESSAGE = "Такой личный документ у сотрудника уже существует."
+
+User = get_user_model()
+
+
+class ManifestError(ValueError):
+    # The manifest as a whole can't be processed (as opposed to per-row errors)
+    pass
+
+
+def read_manifest(fileobj):
+    # [(line number, {column: value})], column names lower-cased
+    try:
+        text = decode_text(fileobj.read(), strict=True)
+    except UnicodeDecodeError:
+        raise ManifestError("Не удалось определить кодировку манифеста (ожидается UTF-8 или cp1251).")
+    try:
+        dialect = csv.Sniffer().sniff(text.split('\n', 1)[0], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    columns = {(name or '').strip().lower() for name in reader.fieldnames or ()}
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if not columns & set(USER_COLUMNS):
+        missing.insert(0, ' или '.join(USER_COLUMNS))
+    if missing:
+        raise ManifestError(f"В манифесте нет обязательных колонок: {', '.join(missing)}.")
+    rows = []
+    for row in reader:
+        values = {(name or '').strip().lower(): (value or '').strip() for name, value in row.items() if name}
+        if any(values.values()):
+            rows.append((reader.line_num, values))
+    return rows
+
+
+def _parse_date(value):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+class _Report:
+    def __init__(self, total):
+        self.total = total
+        self.created = 0
+        self.errors = []
+        self.thumbnailed = set() # Stored names; rows sharing a scan share its thumbnail
+
+    def error(self, line, field, message):
+        self.errors.append({'row': line, 'field': field, 'message': message})
+
+    def as_dict(self):
+        return {'total': self.total, 'created': self.created, 'errors': sorted(self.errors, key=lambda e: e['row'])}
+
+
+def _archive_members(archive):
+    # Exact paths, plus bare file names when they are unambiguous
+    members, by_basename = {}, {}
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        name = info.filename.replace('\\', '/')
+        members[name] = info
+        by_basename.setdefault(os.path.basename(name), []).append(info)
+    for basename, infos in by_basename.items():
+        if len(infos) == 1:
+            members.setdefault(basename, infos[0])
+    return members
+
+
+def _validate(rows, members, report):
+    emails = {row['email'].lower() for _, row in rows if row.get('email')}
+    employee_ids = {row['employee_id'] for _, row in rows if row.get('employee_id')}
+    users_by_email = dict(
+        User.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=emails).values_list('email_lower', 'pk')
+    ) if emails else {}
+    users_by_employee_id = dict(
+        User.objects.filter(employee_id__in=employee_ids).values_list('employee_id', 'pk')
+    ) if employee_ids else {}
+    types = {}
+    for pk, name in DocumentType.objects.filter(is_personal=True).values_list('pk', 'name'):
+        types[str(pk)] = pk
+        types[name.lower()] = pk
+
+    candidates = []
+    for line, row in rows:
+        if row.get('email'):
+            user_id, user_field = users_by_email.get(row['email'].lower()), 'email'
+        else:
+            user_id, user_field = users_by_employee_id.get(row.get('employee_id')), 'employee_id'
+        type_id = types.get(row.get('document_type', '').lower())
+        expiry_date = _parse_date(row.get('expiry_date', ''))
+        issue_date = _parse_date(row['issue_date']) if row.get('issue_date') else None
+        file_name = row.get('file', '').replace('\\', '/')
+        info = members.get(file_name) if members is not None and file_name else None
+
+        problems = []
+        if user_id is None:
+            problems.append((user_field, "Сотрудник не найден."))
+        if type_id is None:
+            problems.append(('document_type', "Личный тип документа не найден."))
+        if expiry_date is None:
+            problems.append(('expiry_date', "Неверная дата (ожидается ГГГГ-ММ-ДД или ДД.ММ.ГГГГ)."))
+        if row.get('issue_date') and issue_date is None:
+            problems.append(('issue_date', "Неверная дата (ожидается ГГГГ-ММ-ДД или ДД.ММ.ГГГГ)."))
+        if len(row.get('document_number', '')) > 100:
+            problems.append(('document_number', "Номер документа длиннее 100 символов."))
+        if file_name:
+            if members is None:
+                problems.append(('file', "Архив со сканами не загружен."))
+            elif info is None:
+                problems.append(('file', "Файл не найден в архиве."))
+            elif info.file_size > MAX_FILE_SIZE:
+                problems.append(('file', f"Файл больше {MAX_FILE_SIZE // (1024 * 1024)} МБ."))
+        for field, message in problems:
+            report.error(line, field, message)
+        if not problems:
+            candidates.append((line, row, user_id, type_id, issue_date, expiry_date, info))
+
+    # Duplicates against the database and within the manifest itself
+    existing = set(
+        PersonalDocument.objects.filter(user_id__in={c[2] for c in candidates}).values_list('user_id', 'document_type_id')
+    ) if candidates else set()
+    valid = []
+    for candidate in candidates:
+        key = (candidate[2], candidate[3])
+        if key in existing:
+            report.error(candidate[0], 'document_type', DUPLICATE_MESSAGE)
+            continue
+        existing.add(key)
+        valid.append(candidate)
+    return valid
+
+
+def _insert_batch(documents, report):
+    # documents: [(line, unsaved PersonalDocument)]
+    try:
+        with transaction.atomic():
+            created = PersonalDocument.objects.bulk_create([document for _, document in documents])
+            # bulk_create sends no post_save, so do what the signal receivers would
+            retain_blobs(document.uploaded_file.name for document in created)
+            for document in created:
+                name = document.uploaded_file.name
+                if name and name not in report.thumbnailed:
+                    report.thumbnailed.add(name)
+                    schedule_thumbnail(document, 'uploaded_file')
+        report.created += len(created)
+    except IntegrityError:
+        # Someone created one of these documents since validation; insert one by one
+        # (regular save(), signals included) to find which.
+        for line, document in documents:
+            try:
+                with transaction.atomic():
+                    document.save()
+                report.created += 1
+            except IntegrityError:
+                report.error(line, 'document_type', DUPLICATE_MESSAGE)
+
+
+def import_personal_documents(manifest, archive=None, uploaded_by=None, batch_size=None, progress=None):
+    # `manifest`: binary file object; `archive`: path or binary file object of a ZIP.
+    # Returns {'total', 'created', 'errors': [{'row', 'field', 'message'}]}.
+    batch_size = batch_size or settings.PERSONAL_DOCUMENT_IMPORT_BATCH_SIZE
+    uploaded_by_id = getattr(uploaded_by, 'pk', uploaded_by)
+    rows = read_manifest(manifest)
+    report = _Report(len(rows))
+    field = PersonalDocument._meta.get_field('uploaded_file')
+
+    try:
+        zip_file = zipfile.ZipFile(archive) if archive is not None else None
+    except zipfile.BadZipFile:
+        raise ManifestError("Архив со сканами повреждён или не является ZIP-файлом.")
+    try:
+        members = _archive_members(zip_file) if zip_file else None
+        valid = _validate(rows, members, report)
+        stored = {} # ZIP member -> stored name; the same scan may be referenced by several rows
+
+        for start in range(0, len(valid), batch_size):
+            documents = []
+            for line, row, user_id, type_id, issue_date, expiry_date, info in valid[start:start + batch_size]:
+                document = PersonalDocument(
+                    user_id=user_id, document_type_id=type_id, document_number=row.get('document_number', ''),
+                    issue_date=issue_date, expiry_date=expiry_date, notes=row.get('notes', ''),
+                    uploaded_by_id=uploaded_by_id,
+                )
+                if info is not None:
+                    if info.filename not in stored:
+                        try:
+                            # Streamed from the archive into storage, never fully in memory
+                            with zip_file.open(info) as fh:
+                                name = field.generate_filename(document, os.path.basename(info.filename))
+                                stored[info.filename] = field.storage.save(name, File(fh, name=name), max_length=field.max_length)
+                        except (OSError, zipfile.BadZipFile, RuntimeError) as e:
+                            logger.warning(f"Personal document import: can't store {info.filename}: {e}")
+                            report.error(line, 'file', "Не удалось прочитать файл из архива.")
+                            continue
+                    document.uploaded_file.name = stored[info.filename]
+                documents.append((line, document))
+            if documents:
+                _insert_batch(documents, report)
+            if progress:
+                progress(report)
+    finally:
+        if zip_file:
+            zip_file.close()
+    return report.as_dict()
+
+
+def run_import(import_id):
+    # Processes a PersonalDocumentImport created by the API; runs at most once per job.
+    claimed = PersonalDocumentImport.objects.filter(
+        pk=import_id, status=PersonalDocumentImport.Status.PENDING
+    ).update(status=PersonalDocumentImport.Status.RUNNING)
+    if not claimed:
+        return None
+    job = PersonalDocumentImport.objects.get(pk=import_id)
+
+    def report_progress(report):
+        PersonalDocumentImport.objects.filter(pk=import_id).update(created_count=report.created)
+
+    try:
+        with job.manifest.open('rb') as manifest:
+            archive = job.archive.open('rb') if job.archive else None
+            try:
+                result = import_personal_documents(manifest, archive, job.created_by_id, progress=report_progress)
+            finally:
+                if archive:
+                    archive.close()
+    except ManifestError as e:
+        job.status = PersonalDocumentImport.Status.FAILED
+        job.errors = [{'row': None, 'field': None, 'message': str(e)}]
+    except Exception as e:
+        logger.error(f"Personal document import #{import_id} failed: {e}", exc_info=True)
+        job.status = PersonalDocumentImport.Status.FAILED
+        job.errors = [{'row': None, 'field': None, 'message': "Внутренняя ошибка при импорте."}]
+    else:
+        job.status = PersonalDocumentImport.Status.DONE
+        job.total_rows = result['total']
+        job.created_count = result['created']
+        job.errors = result['errors']
+    job.error_count = len(job.errors)
+    job.finished_at = timezone.now()
+    if job.archive:
+        job.archive.delete(save=False) # The scans now live in the blob storage
+    job.save()
+    return job
+
+
+def schedule_import(job):
+    # Small manifests are imported within the request; larger ones by a Celery worker
+    # (inline as well if async is disabled or the broker is unreachable).
+    def enqueue():
+        if settings.PERSONAL_DOCUMENT_IMPORT_ASYNC and job.total_rows > settings.PERSONAL_DOCUMENT_IMPORT_INLINE_ROWS:
+            from .tasks import import_personal_documents_job
+            try:
+                import_personal_documents_job.delay(job.pk)
+                return
+            except Exception as e:
+                logger.error(f"Personal document import: failed to enqueue #{job.pk}, running inline: {e}")
+        run_import(job.pk)
+
+    transaction.on_commit(enqueue)
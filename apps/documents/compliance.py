@@ -0,0 +1,134 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from aerocrm_project.streaming import EXPORT_FORMATS, streaming_export_response
+
+from .models import DocumentAssignment
+
+# Acknowledgment compliance across the organization: for every document whose type
+# requires acknowledgment, how many active employees of each department/shift/role have
+# (not) acknowledged it. The summary is one GROUP BY over DocumentAssignment joined to
+# users and is cached; the cache is invalidated by bumping a version key whenever
+# assignments, acknowledgments or the grouping fields of users change.
+
+GROUPINGS = {
+    'department': 'user__department',
+    'shift': 'user__shift',
+    'role': 'user__role__name',
+}
+FILTERS = {
+    'document': 'document_id',
+    'document_type': 'document__document_type_id',
+    'department': 'user__department',
+    'shift': 'user__shift',
+    'role': 'user__role_id',
+}
+SUMMARY_COLUMNS = (
+    'document_id', 'document_title', 'acknowledgment_deadline', 'group',
+    'total', 'acknowledged', 'pending', 'overdue', 'acknowledged_percent',
+)
+PENDING_COLUMNS = (
+    'document_id', 'document_title', 'acknowledgment_deadline', 'user_id', 'user_email',
+    'last_name', 'first_name', 'department', 'shift', 'role', 'assigned_at', 'is_overdue',
+)
+PENDING_FIELDS = (
+    'document_id', 'document__title', 'document__acknowledgment_deadline', 'user_id', 'user__email',
+    'user__last_name', 'user__first_name', 'user__department', 'user__shift', 'user__role__name', 'assigned_at',
+)
+VERSION_KEY = 'documents:compliance:version'
+CHUNK_SIZE = 2000
+
+
+def invalidate_compliance_report():
+    # Old entries are never read again and expire by their TTL.
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def _cache_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.add(VERSION_KEY, version, None)
+        version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def compliance_assignments(params):
+    queryset = DocumentAssignment.objects.filter(
+        document__document_type__requires_acknowledgment=True, user__is_active=True
+    )
+    for param, field in FILTERS.items():
+        value = params.get(param)
+        if value:
+            queryset = queryset.filter(**{field: value})
+    return queryset.order_by()
+
+
+def _isoformat(value):
+    return timezone.localtime(value).isoformat() if value else None
+
+
+def summary_rows(params, group_by='department'):
+    group_field = GROUPINGS[group_by]
+    now = timezone.now()
+    rows = (
+        compliance_assignments(params)
+        .values('document_id', 'document__title', 'document__acknowledgment_deadline', group_field)
+        .annotate(
+            total=Count('pk'),
+            acknowledged=Count('pk', filter=Q(is_acknowledged=True)),
+            overdue=Count('pk', filter=Q(is_acknowledged=False, document__acknowledgment_deadline__lt=now)),
+        )
+        .order_by('document__title', 'document_id', group_field)
+    )
+    return [
+        [
+            row['document_id'], row['document__title'], _isoformat(row['document__acknowledgment_deadline']),
+            row[group_field] or '', row['total'], row['acknowledged'], row['total'] - row['acknowledged'],
+            row['overdue'], round(100 * row['acknowledged'] / row['total'], 1),
+        ]
+        for row in rows.iterator(chunk_size=CHUNK_SIZE)
+    ]
+
+
+def cached_summary_rows(params, group_by='department'):
+    filters = sorted((param, str(params.get(param))) for param in FILTERS if params.get(param))
+    digest = hashlib.md5(json.dumps([group_by, filters]).encode()).hexdigest()
+    key = f'documents:compliance:{_cache_version()}:{digest}'
+    rows = cache.get(key)
+    if rows is None:
+        rows = summary_rows(params, group_by)
+        # The TTL bounds how stale `overdue` gets as deadlines pass without any writes
+        cache.set(key, rows, settings.DOCUMENT_COMPLIANCE_CACHE_TTL)
+    return rows
+
+
+def iter_pending_rows(params):
+    # Every (employee, document) pair that is still waiting for an acknowledgment.
+    now = timezone.now()
+    rows = (
+        compliance_assignments(params).filter(is_acknowledged=False)
+        .order_by('document_id', 'user__last_name', 'user__first_name', 'user_id')
+        .values_list(*PENDING_FIELDS)
+    )
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        row = list(row)
+        deadline = row[2]
+        row[2] = _isoformat(deadline)
+        row[10] = _isoformat(row[10])
+        row.append(bool(deadline and deadline < now))
+        yield row
+
+
+def compliance_report_response(params, view='summary', group_by='department', export_format='csv'):
+    if view == 'pending':
+        rows, columns = iter_pending_rows(params), PENDING_COLUMNS
+    else:
+        rows, columns = cached_summary_rows(params, group_by), SUMMARY_COLUMNS
+    return streaming_export_response(rows, columns, export_format, f'acknowledgment-compliance-{view}')
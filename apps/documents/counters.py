@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .compliance import invalidate_compliance_report
+from .inbox import refresh_inboxes
+from .models import Document, DocumentAssignment
+
+# Document.assignments_total / assignments_acknowledged are denormalized from
+# DocumentAssignment so list and detail views don't COUNT per document. Code that
+# creates or deletes assignments in bulk calls recount_assignments() for the touched
+# documents; single acknowledgments use the atomic F() increments below.
+
+
+def _count_subquery(**filters):
+    counts = (
+        DocumentAssignment.objects.filter(document=OuterRef('pk'), **filters)
+        .order_by().values('document').annotate(count=Count('pk')).values('count')
+    )
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def actual_counts():
+    return {
+        'actual_total': _count_subquery(),
+        'actual_acknowledged': _count_subquery(is_acknowledged=True),
+    }
+
+
+def recount_assignments(document_ids=None):
+    # One UPDATE with correlated counts, for the given documents (or all of them).
+    documents = Document.objects.all()
+    if document_ids is not None:
+        document_ids = set(document_ids)
+        if not document_ids:
+            return 0
+        documents = documents.filter(pk__in=document_ids)
+    updated = documents.update(
+        assignments_total=_count_subquery(),
+        assignments_acknowledged=_count_subquery(is_acknowledged=True),
+    )
+    # After commit, so a concurrent report can't re-cache the old rows under the new version
+    transaction.on_commit(invalidate_compliance_report)
+    return updated
+
+
+def drifted_documents():
+    return Document.objects.annotate(**actual_counts()).filter(
+        ~Q(assignments_total=F('actual_total')) | ~Q(assignments_acknowledged=F('actual_acknowledged'))
+    )
+
+
+def delete_assignments(queryset):
+    # Set-based DELETE of assignments, then recount only the documents and inboxes it touched.
+    touched = list(queryset.order_by().values_list('document_id', 'user_id'))
+    deleted, _ = queryset.delete()
+    if deleted:
+        recount_assignments({document_id for document_id, _ in touched})
+        refresh_inboxes({user_id for _, user_id in touched})
+    return deleted
+
+
+def mark_acknowledged(document_id, created=False):
+    updates = {'assignments_acknowledged': F('assignments_acknowledged') + 1}
+    if created:
+        updates['assignments_total'] = F('assignments_total') + 1
+    Document.objects.filter(pk=document_id).update(**updates)
+    transaction.on_commit(invalidate_compliance_report)
@@ -0,0 +1,130 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date
+
+from .storage import blob_digest
+
+# Authenticated file downloads. The view checks permissions, then either hands the actual
+# transfer to the web server (FILE_DOWNLOAD_BACKEND = 'x-accel' for nginx, 'x-sendfile' for
+# Apache/lighttpd) or streams the file itself with Range and conditional GET support.
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def file_etag(field_file, stat=None):
+    # Blobs are named by their SHA-256, which makes a strong validator; older files get a
+    # weak one from size and mtime.
+    digest = blob_digest(field_file.name)
+    if digest:
+        return f'"{digest}"'
+    stat = stat or os.stat(field_file.path)
+    return f'W/"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # If-None-Match uses weak comparison
+    bare = etag[2:] if etag.startswith('W/') else etag
+    return any(
+        (tag.strip()[2:] if tag.strip().startswith('W/') else tag.strip()) == bare
+        for tag in header.split(',')
+    )
+
+
+def _parse_range(header, size):
+    # Single byte range only; multipart ranges are served as the full file.
+    match = RANGE_RE.match(header.strip())
+    if not match or ',' in header:
+        return None
+    start, end = match.groups()
+    if start == '':
+        if end == '':
+            return None
+        length = min(int(end), size)
+        return size - length, size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        return 'invalid'
+    return start, end
+
+
+def _iter_range(path, start, end):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = fh.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_download_response(request, field_file, filename):
+    # Raises FileNotFoundError (OSError) when the row exists but the file is gone
+    path = field_file.path
+    stat = os.stat(path)
+    etag = file_etag(field_file, stat)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    common_headers = {
+        'ETag': etag,
+        # Private: the file is only for this user; no-cache: revalidate (304) on every use
+        'Cache-Control': 'private, no-cache',
+    }
+
+    if _etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponseNotModified()
+        for header, value in common_headers.items():
+            response[header] = value
+        return response
+
+    backend = getattr(settings, 'FILE_DOWNLOAD_BACKEND', '')
+    if backend in ('x-accel', 'x-sendfile'):
+        # The web server does the transfer (and handles Range itself).
+        response = HttpResponse(content_type=content_type)
+        if backend == 'x-accel':
+            response['X-Accel-Redirect'] = settings.FILE_DOWNLOAD_ACCEL_PREFIX.rstrip('/') + '/' + quote(field_file.name)
+        else:
+            response['X-Sendfile'] = path
+    else:
+        size = stat.st_size
+        byte_range = None
+        range_header = request.headers.get('Range')
+        if range_header and request.method == 'GET':
+            if_range = request.headers.get('If-Range')
+            if not if_range or if_range.strip() == etag:
+                byte_range = _parse_range(range_header, size)
+        if byte_range == 'invalid':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(_iter_range(path, start, end), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    for header, value in common_headers.items():
+        response[header] = value
+    return response
+
+
+def download_filename(base, field_file):
+    ext = os.path.splitext(field_file.name)[1]
+    base = re.sub(r'[\\/:*?"<>|\r\n]+', '_', base).strip() or 'document'
+    return f'{base}{ext}'
@@ -0,0 +1,203 @@
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
+
+from apps.notifications.models import Notification
+
+from .counters import delete_assignments, recount_assignments
+from .inbox import refresh_inboxes
+from .models import Document, DocumentAssignment
+
+logger = logging.getLogger(__name__)
+
+# Role-based assignment of documents. Targets are computed with set-based queries and
+# inserted chunk by chunk with bulk_create(ignore_conflicts=True); every new assignment
+# gets one notification. Assignments created here carry the role they came from, so
+# removing a role deletes exactly its role-only assignments.
+
+
+def role_targets(document_id, role_ids):
+    # Active members of the roles who don't have an assignment for the document yet.
+    User = get_user_model()
+    return (
+        User.objects.filter(role_id__in=role_ids, is_active=True)
+        .exclude(Exists(DocumentAssignment.objects.filter(document_id=document_id, user=OuterRef('pk'))))
+        .order_by('pk')
+    )
+
+
+def fan_out_roles(document_id, role_ids, chunk_size=None, progress=None):
+    chunk_size = chunk_size or settings.DOCUMENT_FANOUT_CHUNK_SIZE
+    document = Document.objects.filter(pk=document_id).first()
+    if document is None or not role_ids:
+        return 0
+    content_type = ContentType.objects.get_for_model(Document)
+    title = f"Новый документ для ознакомления: {document.title}"
+    message = f"Вам назначен новый документ '{document.title}'. Требуется ознакомление."
+
+    targets = role_targets(document_id, role_ids).values_list('pk', 'role_id')
+    total = targets.count()
+    done = 0
+    last_pk = 0
+    while True:
+        chunk = list(targets.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+        with transaction.atomic():
+            DocumentAssignment.objects.bulk_create(
+                [DocumentAssignment(document_id=document_id, user_id=user_id, role_id=role_id) for user_id, role_id in chunk],
+                ignore_conflicts=True
+            )
+            Notification.objects.bulk_create([
+                Notification(
+                    recipient_id=user_id, level='INFO', title=title, message=message,
+                    content_type=content_type, object_id=document_id
+                )
+                for user_id, _ in chunk
+            ])
+        refresh_inboxes(user_id for user_id, _ in chunk)
+        done += len(chunk)
+        if progress:
+            progress(done, total)
+
+    if done:
+        recount_assignments([document_id])
+    logger.info(f"Document fan-out: document {document_id}, roles {sorted(role_ids)}: {done} assignments")
+    return done
+
+
+def remove_role_assignments(document_id, role_ids):
+    # One DELETE: assignments that came from the removed roles, unless the user's current
+    # role is still assigned to the document.
+    remaining = Document.assignee_roles.through.objects.filter(document_id=document_id).values('role_id')
+    stale = (
+        DocumentAssignment.objects.filter(document_id=document_id, role_id__in=role_ids)
+        .exclude(user__role_id__in=remaining)
+    )
+    return delete_assignments(stale)
+
+
+def _drop_stale_assignments(queryset):
+    # Pending assignments are deleted; acknowledged ones are a record (compliance report,
+    # audits), so they are kept and detached from the role instead.
+    queryset.filter(is_acknowledged=True).update(role=None)
+    return delete_assignments(queryset.filter(is_acknowledged=False))
+
+
+def remove_all_role_assignments(document_id):
+    return delete_assignments(DocumentAssignment.objects.filter(document_id=document_id, role__isnull=False))
+
+
+def tag_role_assignments():
+    # Assignments created before they carried their role have role=NULL and look direct,
+    # so removing the role from the document would never delete them. Tags those whose
+    # user's current role is targeted by the document; a direct assignment to a member
+    # of a targeted role can't be told apart and is tagged as well. One UPDATE.
+    User = get_user_model()
+    through = Document.assignee_roles.through
+    targeted = Exists(through.objects.filter(document_id=OuterRef('document_id'), role_id=OuterRef('user__role_id')))
+    return DocumentAssignment.objects.filter(role__isnull=True, user__is_active=True).filter(targeted).update(
+        role_id=Subquery(User.objects.filter(pk=OuterRef('user_id')).values('role_id')[:1])
+    )
+
+
+def _notify_new_assignments(pairs, content_type):
+    # pairs: (document_id, user_id) of assignments that were just created
+    titles = dict(Document.objects.filter(pk__in={document_id for document_id, _ in pairs}).values_list('pk', 'title'))
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=user_id, level='INFO',
+            title=f"Новый документ для ознакомления: {titles[document_id]}",
+            message=f"Вам назначен новый документ '{titles[document_id]}'. Требуется ознакомление.",
+            content_type=content_type, object_id=document_id
+        )
+        for document_id, user_id in pairs
+    ])
+
+
+def sync_user_assignments(user_id, chunk_size=None):
+    """
+    Brings one user's role-based assignments in line with their current role and active
+    status: removes pending role-only assignments the current role no longer implies
+    (acknowledged ones are kept, detached from the role), re-tags
+    the ones it still implies, and adds the documents targeted at the current role.
+    Direct assignments are left alone. Returns (added, removed).
+    """
+    chunk_size = chunk_size or settings.DOCUMENT_FANOUT_CHUNK_SIZE
+    User = get_user_model()
+    through = Document.assignee_roles.through
+    user = User.objects.filter(pk=user_id).values('role_id', 'is_active').first()
+    if user is None:
+        return 0, 0
+    role_id = user['role_id'] if user['is_active'] else None
+
+    role_only = DocumentAssignment.objects.filter(user_id=user_id, role__isnull=False)
+    if role_id is None:
+        removed = _drop_stale_assignments(role_only)
+        if removed:
+            logger.info(f"Document assignment sync: user {user_id}: -{removed}")
+        return 0, removed
+
+    targeted = Exists(through.objects.filter(document_id=OuterRef('document_id'), role_id=role_id))
+    removed = _drop_stale_assignments(role_only.exclude(targeted))
+    role_only.exclude(role_id=role_id).update(role_id=role_id)
+
+    missing = (
+        through.objects.filter(role_id=role_id)
+        .exclude(Exists(DocumentAssignment.objects.filter(document_id=OuterRef('document_id'), user_id=user_id)))
+        .order_by('document_id').values_list('document_id', flat=True)
+    )
+    content_type = ContentType.objects.get_for_model(Document)
+    added_ids = []
+    last_id = 0
+    while True:
+        chunk = list(missing.filter(document_id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1]
+        with transaction.atomic():
+            DocumentAssignment.objects.bulk_create(
+                [DocumentAssignment(document_id=document_id, user_id=user_id, role_id=role_id) for document_id in chunk],
+                ignore_conflicts=True
+            )
+            _notify_new_assignments([(document_id, user_id) for document_id in chunk], content_type)
+        added_ids.extend(chunk)
+
+    recount_assignments(added_ids)
+    if added_ids:
+        refresh_inboxes([user_id])
+    if added_ids or removed:
+        logger.info(f"Document assignment sync: user {user_id}: +{len(added_ids)} / -{removed}")
+    return len(added_ids), removed
+
+
+def _run_after_commit(task_name, args, inline):
+    # Runs after the surrounding transaction commits, so the worker sees the new state.
+    def enqueue():
+        if settings.DOCUMENT_FANOUT_ASYNC:
+            from . import tasks
+            try:
+                getattr(tasks, task_name).delay(*args)
+                return
+            except Exception as e:
+                logger.error(f"Document fan-out: failed to enqueue {task_name}{tuple(args)}, running inline: {e}")
+        inline(*args)
+
+    transaction.on_commit(enqueue)
+
+
+def schedule_fan_out(document_id, role_ids):
+    _run_after_commit('fan_out_document_roles', (document_id, sorted(role_ids)), fan_out_roles)
+
+
+def schedule_assignment_sync(user_ids):
+    def inline(user_ids):
+        for user_id in user_ids:
+            sync_user_assignments(user_id)
+
+    _run_after_commit('sync_user_document_assignments', (sorted(user_ids),), inline)
@@ -0,0 +1,52 @@
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import DocumentAssignment, DocumentInbox
+
+# DocumentInbox holds, per user, the number of unacknowledged assignments, how many of
+# them are past the deadline, and the nearest deadline still ahead. Every code path that
+# creates, deletes or acknowledges assignments refreshes the users it touched with one
+# aggregate query per chunk. Time passing is handled on read: once next_deadline is in the
+# past, the overdue count is stale and the user's inbox is refreshed.
+
+CHUNK_SIZE = 500
+
+
+def refresh_inboxes(user_ids):
+    user_ids = sorted(set(user_ids))
+    now = timezone.now()
+    for start in range(0, len(user_ids), CHUNK_SIZE):
+        chunk = user_ids[start:start + CHUNK_SIZE]
+        rows = {
+            row['user_id']: row for row in
+            DocumentAssignment.objects.filter(user_id__in=chunk, is_acknowledged=False)
+            .order_by().values('user_id').annotate(
+                pending=Count('pk'),
+                overdue=Count('pk', filter=Q(document__acknowledgment_deadline__lt=now)),
+                upcoming=Min('document__acknowledgment_deadline', filter=Q(document__acknowledgment_deadline__gte=now)),
+            )
+        }
+        inboxes = []
+        for user_id in chunk:
+            row = rows.get(user_id, {})
+            inboxes.append(DocumentInbox(
+                user_id=user_id, pending_count=row.get('pending', 0), overdue_count=row.get('overdue', 0),
+                next_deadline=row.get('upcoming'), updated_at=now,
+            ))
+        DocumentInbox.objects.bulk_create(
+            inboxes, update_conflicts=True, unique_fields=['user'],
+            update_fields=['pending_count', 'overdue_count', 'next_deadline', 'updated_at'],
+        )
+
+
+def refresh_document_inboxes(document_id):
+    # Everyone assigned to the document, e.g. after its deadline changed.
+    refresh_inboxes(DocumentAssignment.objects.filter(document_id=document_id).values_list('user_id', flat=True))
+
+
+def get_inbox(user):
+    inbox = DocumentInbox.objects.filter(user=user).first()
+    if inbox is None or (inbox.next_deadline and inbox.next_deadline <= timezone.now()):
+        refresh_inboxes([user.pk])
+        inbox = DocumentInbox.objects.get(user=user)
+    return inbox
@@ -0,0 +1,142 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.documents.counters import recount_assignments
+from apps.documents.models import Document, DocumentAssignment, DocumentType
+from apps.documents.views import DocumentViewSet
+from apps.users.models import Role
+
+BENCH_PREFIX = 'BENCHMARK'
+BENCH_EMAIL_DOMAIN = 'benchmark.invalid'
+
+
+class Command(BaseCommand):
+    help = "Замер числа запросов и времени ответа списка общих документов (не запускать на боевой БД)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=10_000)
+        parser.add_argument('--users', type=int, default=5_000)
+        parser.add_argument('--roles', type=int, default=10)
+        parser.add_argument('--assignments-per-document', type=int, default=50)
+        parser.add_argument(
+            '--wide-documents', type=int, default=20,
+            help="Сколько самых новых документов назначить всем тестовым сотрудникам."
+        )
+        parser.add_argument('--repeat', type=int, default=10, help="Сколько раз повторять каждый запрос.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keep', action='store_true', help="Не удалять тестовые данные после замера.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.filter(email__endswith=f'@{BENCH_EMAIL_DOMAIN}')
+        if not users.exists():
+            self._seed(options)
+
+        staff = users.filter(is_staff=True).first()
+        employee = users.filter(is_staff=False, role__isnull=False).order_by('pk').first()
+        view = DocumentViewSet.as_view({'get': 'list'})
+        last_page = max(options['documents'] // 20, 1)
+
+        cases = [
+            ("admin, стр. 1", staff, {}),
+            (f"admin, стр. {last_page}", staff, {'page': last_page}),
+            ("сотрудник, стр. 1", employee, {}),
+            ("сотрудник, acknowledged=false", employee, {'acknowledged': 'false'}),
+            ("сотрудник, поиск", employee, {'search': BENCH_PREFIX}),
+        ]
+        factory = APIRequestFactory()
+        for label, user, params in cases:
+            timings = []
+            queries = 0
+            for _ in range(options['repeat']):
+                request = factory.get('/api/v1/documents/', params)
+                force_authenticate(request, user=user)
+                with CaptureQueriesContext(connection) as ctx:
+                    started = time.perf_counter()
+                    response = view(request)
+                    response.render()
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries = len(ctx.captured_queries)
+            self.stdout.write(
+                f"{label:<32} статус {response.status_code}, запросов {queries:>3}, "
+                f"медиана {statistics.median(timings):8.1f} мс, макс {max(timings):8.1f} мс"
+            )
+
+        if not options['keep']:
+            self._cleanup()
+
+    def _seed(self, options):
+        User = get_user_model()
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        roles = Role.objects.bulk_create([
+            Role(name=f'{BENCH_PREFIX} роль {i}') for i in range(options['roles'])
+        ])
+        role_ids = [role.pk for role in Role.objects.filter(name__startswith=BENCH_PREFIX).order_by('pk')]
+        User.objects.bulk_create([
+            User(
+                email=f'bench-{i}@{BENCH_EMAIL_DOMAIN}', password='!', last_name=f'Тест {i:05d}',
+                is_staff=(i == 0), role_id=role_ids[i % len(role_ids)] if roles else None,
+            )
+            for i in range(options['users'])
+        ], batch_size=batch_size)
+        user_ids = list(User.objects.filter(email__endswith=f'@{BENCH_EMAIL_DOMAIN}').order_by('pk').values_list('pk', flat=True))
+        members = {role_id: [pk for n, pk in enumerate(user_ids) if role_ids[n % len(role_ids)] == role_id] for role_id in role_ids}
+
+        doc_type, _ = DocumentType.objects.get_or_create(name=f'{BENCH_PREFIX} тип')
+        Document.objects.bulk_create([
+            Document(document_type=doc_type, title=f'{BENCH_PREFIX} документ {i}', document_file=f'general_documents/bench/{i}.pdf')
+            for i in range(options['documents'])
+        ], batch_size=batch_size)
+        doc_ids = list(Document.objects.filter(title__startswith=BENCH_PREFIX).order_by('pk').values_list('pk', flat=True))
+        wide_ids = doc_ids[-options['wide_documents']:] if options['wide_documents'] else []
+        # Wide documents are the newest, so they land on the first page of the list.
+        Document.objects.filter(pk__in=wide_ids).update(created_at=timezone.now() + timedelta(minutes=1))
+
+        through = Document.assignee_roles.through
+        role_links = []
+        assignments = []
+        per_document = options['assignments_per_document']
+        for n, doc_id in enumerate(doc_ids):
+            if doc_id in wide_ids:
+                role_id = None
+                targets = user_ids
+            else:
+                role_id = role_ids[n % len(role_ids)]
+                role_links.append(through(document_id=doc_id, role_id=role_id))
+                targets = members[role_id][:per_document]
+            assignments.extend(
+                DocumentAssignment(document_id=doc_id, user_id=user_id, role_id=role_id, is_acknowledged=(user_id + n) % 3 == 0)
+                for user_id in targets
+            )
+            if len(assignments) >= batch_size:
+                DocumentAssignment.objects.bulk_create(assignments, batch_size=batch_size)
+                assignments = []
+        DocumentAssignment.objects.bulk_create(assignments, batch_size=batch_size)
+        through.objects.bulk_create(role_links, batch_size=batch_size)
+        recount_assignments(doc_ids)
+
+        self.stdout.write(
+            f"Создано {len(user_ids)} сотрудников, {len(doc_ids)} документов и "
+            f"{DocumentAssignment.objects.filter(document_id__in=doc_ids).count()} назначений "
+            f"за {time.perf_counter() - started:.1f} с"
+        )
+
+    def _cleanup(self):
+        User = get_user_model()
+        documents = Document.objects.filter(title__startswith=BENCH_PREFIX)
+        DocumentAssignment.objects.filter(document__in=documents).delete()
+        documents.delete()
+        DocumentType.objects.filter(name=f'{BENCH_PREFIX} тип').delete()
+        User.objects.filter(email__endswith=f'@{BENCH_EMAIL_DOMAIN}').delete()
+        Role.objects.filter(name__startswith=BENCH_PREFIX).delete()
+        self.stdout.write("Тестовые данные удалены.")
@@ -0,0 +1,86 @@
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.documents.models import Document, PersonalDocument, StoredBlob
+from aerocrm_project.thumbnails import thumbnail_name
+from apps.documents.storage import BLOB_PREFIX, TMP_DIR, blob_digest, blob_storage
+
+
+class Command(BaseCommand):
+    help = "Удаляет из хранилища документов файлы, на которые больше не ссылается ни один документ."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=int, default=24,
+            help="Не трогать файлы, загруженные позже этого срока (загрузка могла ещё не сохраниться)."
+        )
+        parser.add_argument('--recount', action='store_true', help="Сначала пересчитать ссылки по таблицам документов.")
+        parser.add_argument('--dry-run', action='store_true', help="Только показать, что будет удалено.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        dry_run = options['dry_run']
+
+        if options['recount']:
+            self._recount(dry_run)
+
+        removed = freed = 0
+        garbage = StoredBlob.objects.filter(ref_count__lte=0, last_uploaded_at__lt=cutoff)
+        for blob in garbage.iterator():
+            self.stdout.write(f"{'[dry-run] ' if dry_run else ''}{blob.name} ({blob.size} байт)")
+            if not dry_run:
+                # Conditional delete: skip the blob if it was referenced meanwhile, and keep
+                # the file if the same content was uploaded again right after
+                if not StoredBlob.objects.filter(pk=blob.pk, ref_count__lte=0).delete()[0]:
+                    continue
+                if not StoredBlob.objects.filter(name=blob.name).exists():
+                    blob_storage.delete(blob.name)
+                    blob_storage.delete(thumbnail_name(blob.name))
+            removed += 1
+            freed += blob.size
+
+        stray = self._sweep_untracked(cutoff, dry_run)
+        self.stdout.write(self.style.SUCCESS(
+            f"Удалено файлов: {removed} ({freed / 1024 / 1024:.1f} МБ), неучтённых файлов: {stray}"
+        ))
+
+    def _recount(self, dry_run):
+        references = Counter()
+        for model, field in ((Document, 'document_file'), (PersonalDocument, 'uploaded_file')):
+            for name in model.objects.filter(**{f'{field}__startswith': f'{BLOB_PREFIX}/'}).values_list(field, flat=True).iterator():
+                references[name] += 1
+        fixed = []
+        for blob in StoredBlob.objects.only('pk', 'name', 'ref_count').iterator():
+            if blob.ref_count != references[blob.name]:
+                self.stdout.write(f"{blob.name}: ссылок {blob.ref_count} -> {references[blob.name]}")
+                blob.ref_count = references[blob.name]
+                fixed.append(blob)
+        if fixed and not dry_run:
+            StoredBlob.objects.bulk_update(fixed, ['ref_count'], batch_size=1000)
+        self.stdout.write(f"Исправлено счётчиков ссылок: {len(fixed)}")
+
+    def _sweep_untracked(self, cutoff, dry_run):
+        # Files left by interrupted uploads: temp files and blobs without a StoredBlob row.
+        root = blob_storage.path(BLOB_PREFIX)
+        if not os.path.isdir(root):
+            return 0
+        known = set(StoredBlob.objects.values_list('name', flat=True))
+        removed = 0
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, blob_storage.location).replace(os.sep, '/')
+                in_tmp = os.path.relpath(dirpath, root).split(os.sep)[0] == TMP_DIR
+                if not in_tmp and (name in known or not blob_digest(name)):
+                    continue
+                if datetime.fromtimestamp(os.path.getmtime(path), tz=dt_timezone.utc) >= cutoff:
+                    continue
+                self.stdout.write(f"{'[dry-run] ' if dry_run else ''}{name} (не учтён)")
+                if not dry_run:
+                    os.remove(path)
+                removed += 1
+        return removed
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+
+from aerocrm_project.thumbnails import generate_thumbnail_for, thumbnail_field
+
+FIELDS = (
+    ('documents.Document', 'document_file'),
+    ('documents.PersonalDocument', 'uploaded_file'),
+    ('users.User', 'profile_picture'),
+)
+
+
+class Command(BaseCommand):
+    help = "Создаёт недостающие миниатюры файлов и записывает их в карточки (например, после обновления)."
+
+    def handle(self, *args, **options):
+        from django.apps import apps
+
+        for model_label, field_name in FIELDS:
+            model = apps.get_model(model_label)
+            # One representative row per file; generate_thumbnail_for updates the others
+            pending = (
+                model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                .filter(**{thumbnail_field(field_name): ''})
+                .values(field_name).annotate(first_pk=Min('pk')).values_list('first_pk', flat=True)
+            )
+            done = sum(1 for pk in list(pending) if generate_thumbnail_for(model_label, pk, field_name))
+            self.stdout.write(f"{model_label}.{field_name}: миниатюр {done}")
+        self.stdout.write(self.style.SUCCESS("Готово."))
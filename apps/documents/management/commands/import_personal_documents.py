@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.documents.bulk_import import ManifestError, import_personal_documents
+
+
+class Command(BaseCommand):
+    help = "Импортирует личные документы сотрудников из CSV-манифеста и ZIP-архива сканов."
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help="Путь к CSV-манифесту.")
+        parser.add_argument('--archive', help="Путь к ZIP-архиву со сканами.")
+        parser.add_argument('--uploaded-by', help="Email сотрудника, от имени которого загружаются документы.")
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        uploaded_by = None
+        if options['uploaded_by']:
+            uploaded_by = get_user_model().objects.filter(email__iexact=options['uploaded_by']).first()
+            if uploaded_by is None:
+                raise CommandError(f"Сотрудник {options['uploaded_by']} не найден.")
+
+        def progress(report):
+            self.stdout.write(f"Создано: {report.created} из {report.total}")
+
+        try:
+            with open(options['manifest'], 'rb') as manifest:
+                result = import_personal_documents(
+                    manifest, options['archive'], uploaded_by, batch_size=options['batch_size'], progress=progress
+                )
+        except (ManifestError, OSError) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(f"Строка {error['row']}, {error['field']}: {error['message']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Строк: {result['total']}, создано документов: {result['created']}, ошибок: {len(result['errors'])}"
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from django.contrib.auth import get_user_model
+
+from apps.documents.counters import drifted_documents, recount_assignments
+from apps.documents.inbox import refresh_inboxes
+
+
+class Command(BaseCommand):
+    help = "Сверяет счётчики назначений/ознакомлений общих документов с таблицей назначений и исправляет расхождения."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Только показать документы с расхождениями.")
+        parser.add_argument('--all', action='store_true', help="Пересчитать все документы, а не только расходящиеся.")
+        parser.add_argument('--inboxes', action='store_true', help="Также пересобрать сводки документов всех сотрудников.")
+
+    def handle(self, *args, **options):
+        if options['inboxes'] and not options['dry_run']:
+            user_ids = list(get_user_model().objects.values_list('pk', flat=True))
+            refresh_inboxes(user_ids)
+            self.stdout.write(f"Пересобрано сводок сотрудников: {len(user_ids)}")
+
+        if options['all'] and not options['dry_run']:
+            updated = recount_assignments()
+            self.stdout.write(self.style.SUCCESS(f"Пересчитано документов: {updated}"))
+            return
+
+        drifted = list(drifted_documents().values_list(
+            'pk', 'title', 'assignments_total', 'actual_total', 'assignments_acknowledged', 'actual_acknowledged'
+        ))
+        for pk, title, total, actual_total, acknowledged, actual_acknowledged in drifted:
+            self.stdout.write(
+                f"#{pk} {title}: всего {total} -> {actual_total}, ознакомлено {acknowledged} -> {actual_acknowledged}"
+            )
+        if not drifted:
+            self.stdout.write("Расхождений не найдено.")
+            return
+        if options['dry_run']:
+            self.stdout.write(f"Документов с расхождениями: {len(drifted)}")
+            return
+        updated = recount_assignments(pk for pk, *_ in drifted)
+        self.stdout.write(self.style.SUCCESS(f"Исправлено документов: {updated}"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from apps.documents.models import Document
+from apps.documents.search import index_document_content, install_search_index
+from apps.documents.tasks import index_document_text
+
+
+class Command(BaseCommand):
+    help = "Извлекает текст файлов общих документов для полнотекстового поиска (только изменившиеся файлы)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Переиндексировать все документы.")
+        parser.add_argument('--async', action='store_true', dest='run_async', help="Выполнить в Celery.")
+
+    def handle(self, *args, **options):
+        install_search_index()
+        documents = Document.objects.order_by('pk')
+        if not options['force']:
+            documents = documents.exclude(content_indexed_name=F('document_file'))
+        document_ids = list(documents.values_list('pk', flat=True))
+
+        indexed = 0
+        for document_id in document_ids:
+            if options['run_async']:
+                index_document_text.delay(document_id, force=options['force'])
+            elif index_document_content(document_id, force=options['force']):
+                indexed += 1
+        if options['run_async']:
+            self.stdout.write(self.style.SUCCESS(f"Поставлено в очередь документов: {len(document_ids)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Проиндексировано документов: {indexed}"))
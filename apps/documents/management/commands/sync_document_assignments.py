@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.documents.fanout import sync_user_assignments, tag_role_assignments
+from apps.documents.tasks import sync_user_document_assignments
+
+
+class Command(BaseCommand):
+    help = "Приводит назначения документов по ролям в соответствие с текущими ролями и статусом сотрудников."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help="ID сотрудника (можно несколько раз).")
+        parser.add_argument('--role', type=int, action='append', dest='role_ids', help="Все сотрудники роли (можно несколько раз).")
+        parser.add_argument('--all', action='store_true', help="Все сотрудники.")
+        parser.add_argument('--async', action='store_true', dest='run_async', help="Выполнить в Celery пачками.")
+        parser.add_argument('--chunk-size', type=int, default=200, help="Сотрудников в одной задаче Celery.")
+        parser.add_argument(
+            '--tag-roles', action='store_true',
+            help="Сначала проставить роль старым назначениям без роли, если роль сотрудника назначена документу "
+                 "(однократно после обновления; прямые назначения таким сотрудникам тоже станут ролевыми)."
+        )
+
+    def handle(self, *args, **options):
+        if options['tag_roles']:
+            tagged = tag_role_assignments()
+            self.stdout.write(f"Назначениям проставлена роль: {tagged}")
+            if not (options['user_ids'] or options['role_ids'] or options['all']):
+                return
+        users = get_user_model().objects.order_by('pk')
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+        elif options['role_ids']:
+            users = users.filter(role_id__in=options['role_ids'])
+        elif not options['all']:
+            raise CommandError("Укажите --user, --role или --all.")
+        user_ids = list(users.values_list('pk', flat=True))
+
+        if options['run_async']:
+            chunk_size = options['chunk_size']
+            for start in range(0, len(user_ids), chunk_size):
+                sync_user_document_assignments.delay(user_ids[start:start + chunk_size])
+            self.stdout.write(self.style.SUCCESS(f"Поставлено в очередь сотрудников: {len(user_ids)}"))
+            return
+
+        added = removed = 0
+        for user_id in user_ids:
+            user_added, user_removed = sync_user_assignments(user_id)
+            added += user_added
+            removed += user_removed
+        self.stdout.write(self.style.SUCCESS(
+            f"Сотрудников: {len(user_ids)}, добавлено назначений: {added}, удалено: {removed}"
+        ))
@@ -3,6 +3,8 @@ from django.conf import settings
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .storage import get_blob_storage
+
 class DocumentType(models.Model):
     name = models.CharField(_("Название типа"), max_length=255, unique=True)
     description = models.TextField(_("Описание"), blank=True)
@@ -36,8 +38,10 @@ class Document(models.Model):
     )
     title = models.CharField(_("Заголовок/Название"), max_length=255)
     document_file = models.FileField(
-        _("Файл документа"), upload_to='general_documents/%Y/%m/'
+        _("Файл документа"), upload_to='general_documents/%Y/%m/', storage=get_blob_storage
     )
+    # Set by aerocrm_project.thumbnails once the preview exists
+    document_file_thumbnail = models.CharField(_("Миниатюра файла"), max_length=255, blank=True, editable=False)
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL, verbose_name=_("Кем загружен"),
         on_delete=models.SET_NULL, null=True, related_name='created_documents'
@@ -56,6 +60,13 @@ class Document(models.Model):
     acknowledgment_deadline = models.DateTimeField(
         _("Срок подтверждения ознакомления"), null=True, blank=True
     )
+    # Maintained by apps.documents.counters; repaired by `reconcile_document_counters`
+    assignments_total = models.PositiveIntegerField(_("Всего назначений"), default=0, editable=False)
+    assignments_acknowledged = models.PositiveIntegerField(_("Ознакомлено"), default=0, editable=False)
+    # Extracted file text for full-text search (apps.documents.search); content_indexed_name is
+    # the file it was extracted from, so unchanged files are not re-indexed
+    content_text = models.TextField(_("Текст документа"), blank=True, editable=False)
+    content_indexed_name = models.CharField(max_length=255, blank=True, editable=False)
 
     class Meta:
         verbose_name = _("Общий документ")
@@ -73,6 +84,11 @@ class DocumentAssignment(models.Model):
         _("Дата и время ознакомления"), null=True, blank=True
     )
     is_acknowledged = models.BooleanField(_("Ознакомлен"), default=False, db_index=True)
+    # Role the assignment came from; NULL for direct assignments, which role changes never remove
+    role = models.ForeignKey(
+        'users.Role', verbose_name=_("Назначен через роль"), on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='+'
+    )
 
     class Meta:
         verbose_name = _("Назначение/Ознакомление")
@@ -98,8 +114,9 @@ class PersonalDocument(models.Model):
     issue_date = models.DateField(_("Дата выдачи"), null=True, blank=True)
     expiry_date = models.DateField(_("Дата истечения срока"), db_index=True)
     uploaded_file = models.FileField(
-        _("Скан-копия файла"), upload_to='personal_docs/%Y/%m/', null=True, blank=True
+        _("Скан-копия файла"), upload_to='personal_docs/%Y/%m/', storage=get_blob_storage, null=True, blank=True
     )
+    uploaded_file_thumbnail = models.CharField(_("Миниатюра скан-копии"), max_length=255, blank=True, editable=False)
     uploaded_by = models.ForeignKey(
         settings.AUTH_USER_MODEL, verbose_name=_("Кем загружен"),
         on_delete=models.SET_NULL, null=True, related_name='uploaded_personal_docs'
@@ -128,3 +145,71 @@ class PersonalDocument(models.Model):
         return 0
 
 
+class DocumentInbox(models.Model):
+    # Per-user summary of unacknowledged assignments, kept up to date by apps.documents.inbox
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='document_inbox'
+    )
+    pending_count = models.PositiveIntegerField(_("Ожидают ознакомления"), default=0)
+    overdue_count = models.PositiveIntegerField(_("Просрочено"), default=0)
+    next_deadline = models.DateTimeField(_("Ближайший срок"), null=True, blank=True)
+    updated_at = models.DateTimeField(_("Дата обновления"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Сводка документов сотрудника")
+        verbose_name_plural = _("Сводки документов сотрудников")
+
+    def __str__(self):
+        return f"{self.user}: {self.pending_count} / {self.overdue_count}"
+
+
+class StoredBlob(models.Model):
+    # One row per file in the content-addressed store (apps.documents.storage)
+    name = models.CharField(_("Путь в хранилище"), max_length=255, unique=True)
+    digest = models.CharField(_("SHA-256"), max_length=64, db_index=True)
+    size = models.BigIntegerField(_("Размер, байт"))
+    ref_count = models.IntegerField(_("Число ссылок"), default=0)
+    created_at = models.DateTimeField(_("Дата создания"), auto_now_add=True)
+    last_uploaded_at = models.DateTimeField(_("Последняя загрузка"), default=timezone.now)
+
+    class Meta:
+        verbose_name = _("Файл хранилища")
+        verbose_name_plural = _("Файлы хранилища")
+        indexes = [
+            models.Index(fields=['ref_count', 'last_uploaded_at'], name='doc_blob_gc_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class PersonalDocumentImport(models.Model):
+    # Bulk import of personal documents from a CSV manifest plus a ZIP of scans
+    # (apps.documents.bulk_import); the per-row error report is kept in `errors`.
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('В очереди')
+        RUNNING = 'running', _('Выполняется')
+        DONE = 'done', _('Завершен')
+        FAILED = 'failed', _('Ошибка')
+
+    manifest = models.FileField(_("CSV-манифест"), upload_to='imports/personal_docs/%Y/%m/')
+    archive = models.FileField(_("ZIP-архив сканов"), upload_to='imports/personal_docs/%Y/%m/', null=True, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, verbose_name=_("Кем загружен"),
+        on_delete=models.SET_NULL, null=True, related_name='personal_document_imports'
+    )
+    status = models.CharField(_("Статус"), max_length=10, choices=Status.choices, default=Status.PENDING)
+    total_rows = models.PositiveIntegerField(_("Строк в манифесте"), default=0)
+    created_count = models.PositiveIntegerField(_("Создано документов"), default=0)
+    error_count = models.PositiveIntegerField(_("Строк с ошибками"), default=0)
+    errors = models.JSONField(_("Ошибки"), default=list, blank=True)
+    created_at = models.DateTimeField(_("Дата создания"), auto_now_add=True)
+    finished_at = models.DateTimeField(_("Дата завершения"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Импорт личных документов")
+        verbose_name_plural = _("Импорты личных документов")
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Импорт #{self.pk} ({self.get_status_display()})"
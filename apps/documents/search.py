@@ -0,0 +1,59 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from aerocrm_project import fulltext
+
+from .models import Document
+from .textextract import extract_text
+
+logger = logging.getLogger(__name__)
+
+# Full-text index over Document.title + content_text (text extracted from the file), see
+# aerocrm_project.fulltext. Title matches weigh more than matches in the body; counter
+# updates don't re-index documents.
+
+INDEX = fulltext.FullTextIndex(
+    Document, ['title', 'content_text'], config='russian', weights=(5.0, 1.0), ordering=('-created_at', '-id')
+)
+
+
+def install_search_index():
+    return INDEX.install()
+
+
+class DocumentContentSearchFilter(fulltext.FullTextSearchFilter):
+    # ?q= ranked search over titles and file contents, applied to the viewset's queryset
+    # (so visibility rules still hold).
+    index = INDEX
+
+
+def index_document_content(document_id, force=False):
+    # Extracts and stores the text of one document. Incremental: skipped when the file
+    # hasn't changed since it was last indexed (blob names are content hashes).
+    document = Document.objects.filter(pk=document_id).only('document_file', 'content_indexed_name').first()
+    if document is None:
+        return False
+    name = document.document_file.name or ''
+    if not force and name == document.content_indexed_name:
+        return False
+    text = extract_text(document.document_file.path, settings.DOCUMENT_TEXT_MAX_CHARS) if name else ''
+    # Conditional update: a newer upload that landed meanwhile gets its own task
+    Document.objects.filter(pk=document_id, document_file=name).update(content_text=text, content_indexed_name=name)
+    return True
+
+
+def schedule_content_indexing(document_id):
+    # After commit, in a Celery worker; inline if disabled or the broker is unreachable.
+    def enqueue():
+        if settings.DOCUMENT_TEXT_EXTRACTION_ASYNC:
+            from .tasks import index_document_text
+            try:
+                index_document_text.delay(document_id)
+                return
+            except Exception as e:
+                logger.error(f"Document search: failed to enqueue document {document_id}, indexing inline: {e}")
+        index_document_content(document_id)
+
+    transaction.on_commit(enqueue)
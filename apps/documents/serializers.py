@@ -1,8 +1,16 @@
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from django.conf import settings
 from django.utils import timezone
-from .models import DocumentType, Document, DocumentAssignment, PersonalDocument
+from .counters import recount_assignments
+from .inbox import refresh_inboxes
+import zipfile
+
+from .bulk_import import ManifestError, read_manifest
+from .models import DocumentType, Document, DocumentAssignment, PersonalDocument, DocumentInbox, PersonalDocumentImport
+from apps.users.models import Role
 from apps.users.serializers import UserSummarySerializer
+from aerocrm_project.thumbnails import thumbnail_url
 
 from django.contrib.auth import get_user_model
 
@@ -25,19 +33,31 @@ class DocumentListSerializer(serializers.ModelSerializer):
     created_by = UserSummarySerializer(read_only=True)
     my_assignment = serializers.SerializerMethodField()
     document_file_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField() # Authenticated, cacheable download
+    document_file_thumbnail_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Document
         fields = [
             'id', 'title', 'document_type', 'document_file', 'document_file_url',
-            'created_by', 'created_at', 'acknowledgment_deadline', 'my_assignment'
+            'created_by', 'created_at', 'acknowledgment_deadline', 'my_assignment',
+            'assignments_total', 'assignments_acknowledged', 'download_url', 'document_file_thumbnail_url'
+        ]
+        read_only_fields = [
+            'document_file_url', 'assignments_total', 'assignments_acknowledged', 'download_url',
+            'document_file_thumbnail_url'
         ]
-        read_only_fields = ['document_file_url']
 
     def get_my_assignment(self, obj):
         user = self.context['request'].user
-        assignment = getattr(obj, 'my_assignment_instance', None) # Use prefetched data if available
-        if assignment:
+        if hasattr(obj, 'my_assignment_id'): # Annotated by DocumentViewSet.get_queryset
+            if obj.my_assignment_id is None:
+                return None
+            assignment = DocumentAssignment(
+                id=obj.my_assignment_id, document=obj, user=user,
+                assigned_at=obj.my_assigned_at, acknowledged_at=obj.my_acknowledged_at,
+                is_acknowledged=obj.is_acknowledged_by_me
+            )
             return DocumentAssignmentSerializer(assignment).data
 
         # Fallback if not prefetched (less efficient)
@@ -53,24 +73,38 @@ class DocumentListSerializer(serializers.ModelSerializer):
              return request.build_absolute_uri(obj.document_file.url)
         return None
 
+    def get_download_url(self, obj):
+        request = self.context.get('request')
+        if obj.document_file and request:
+             return reverse('document-download', args=[obj.pk], request=request)
+        return None
+
+    def get_document_file_thumbnail_url(self, obj):
+        return thumbnail_url(self.context.get('request'), obj, 'document_file')
+
 
 class DocumentDetailSerializer(DocumentListSerializer):
-    assignees_summary = serializers.SerializerMethodField()
     acknowledgment_stats = serializers.SerializerMethodField()
 
     class Meta(DocumentListSerializer.Meta):
-         fields = DocumentListSerializer.Meta.fields + ['assignees_summary', 'acknowledgment_stats']
+         fields = DocumentListSerializer.Meta.fields + ['acknowledgment_stats']
          read_only_fields = DocumentListSerializer.Meta.read_only_fields + ['document_file']
 
-    def get_assignees_summary(self, obj):
-         assignments = obj.documentassignment_set.select_related('user').order_by('user__last_name')
-         return DocumentAssignmentSerializer(assignments, many=True).data
-
     def get_acknowledgment_stats(self, obj):
-         assignments = obj.documentassignment_set # Use prefetched if available
-         total = assignments.count()
-         acknowledged = assignments.filter(is_acknowledged=True).count()
-         return {'total': total, 'acknowledged': acknowledged}
+         # Denormalized counters, see apps.documents.counters
+         return {'total': obj.assignments_total, 'acknowledged': obj.assignments_acknowledged}
+
+class DocumentInboxSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DocumentInbox
+        fields = ['pending_count', 'overdue_count', 'next_deadline', 'updated_at']
+
+
+class DocumentBulkAcknowledgeSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500
+    )
+
 
 class DocumentCreateSerializer(serializers.ModelSerializer):
     assignee_ids = serializers.PrimaryKeyRelatedField(
@@ -78,7 +112,7 @@ class DocumentCreateSerializer(serializers.ModelSerializer):
         many=True, write_only=True, required=False
     )
     assignee_role_ids = serializers.PrimaryKeyRelatedField(
-        queryset='users.Role'.objects.all(),
+        queryset=Role.objects.all(),
         many=True, write_only=True, required=False
     )
 
@@ -100,18 +134,19 @@ class DocumentCreateSerializer(serializers.ModelSerializer):
         # Create the document first
         document = Document.objects.create(**validated_data)
 
-        # Set roles (ManyToMany relation)
+        # Direct assignments go in before the roles, so the role fan-out skips these users
+        # and their assignments stay direct
+        assignments = [DocumentAssignment(document=document, user=user) for user in assignee_ids]
+        DocumentAssignment.objects.bulk_create(assignments, ignore_conflicts=True) # Ignore if assignment exists
+        # ignore_conflicts doesn't report what was inserted, so recount instead of adding len()
+        recount_assignments([document.pk])
+        refresh_inboxes(user.pk for user in assignee_ids)
+
+        # Set roles (ManyToMany relation); role members are assigned by the fan-out job
+        # scheduled from the m2m_changed signal (apps.documents.fanout)
         if role_ids:
             document.assignee_roles.set(role_ids)
-
-        # Determine target users
-        users_directly_assigned = set(User.objects.filter(id__in=[user.id for user in assignee_ids]))
-        users_from_roles = set(User.objects.filter(role__in=role_ids, is_active=True))
-        all_target_users = users_directly_assigned.union(users_from_roles)
-
-        # Create assignments efficiently
-        assignments = [DocumentAssignment(document=document, user=user) for user in all_target_users]
-        DocumentAssignment.objects.bulk_create(assignments, ignore_conflicts=True) # Ignore if assignment exists
+        document.refresh_from_db(fields=['assignments_total', 'assignments_acknowledged'])
 
         return document
 
@@ -127,6 +162,8 @@ class PersonalDocumentSerializer(serializers.ModelSerializer):
     days_until_expiry = serializers.IntegerField(read_only=True)
     uploaded_file = serializers.FileField(required=False, allow_null=True)
     uploaded_file_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField() # Authenticated, cacheable download
+    uploaded_file_thumbnail_url = serializers.SerializerMethodField()
 
     class Meta:
         model = PersonalDocument
@@ -134,9 +171,12 @@ class PersonalDocumentSerializer(serializers.ModelSerializer):
             'id', 'user', 'document_type', 'document_type_id', 'document_number',
             'issue_date', 'expiry_date', 'uploaded_file', 'uploaded_file_url',
             'uploaded_by', 'uploaded_at', 'notes', 'is_expired', 'days_until_expiry',
-            'is_expiry_notified'
+            'is_expiry_notified', 'download_url', 'uploaded_file_thumbnail_url'
         ]
-        read_only_fields = ('user', 'uploaded_by', 'uploaded_at', 'is_expired', 'days_until_expiry', 'uploaded_file_url', 'is_expiry_notified')
+        read_only_fields = (
+            'user', 'uploaded_by', 'uploaded_at', 'is_expired', 'days_until_expiry', 'uploaded_file_url',
+            'is_expiry_notified', 'download_url', 'uploaded_file_thumbnail_url'
+        )
         extra_kwargs = {
             'uploaded_file': {'write_only': True},
         }
@@ -147,6 +187,15 @@ class PersonalDocumentSerializer(serializers.ModelSerializer):
              return request.build_absolute_uri(obj.uploaded_file.url)
         return None
 
+    def get_download_url(self, obj):
+        request = self.context.get('request')
+        if obj.uploaded_file and request:
+             return reverse('personal-document-download', args=[obj.pk], request=request)
+        return None
+
+    def get_uploaded_file_thumbnail_url(self, obj):
+        return thumbnail_url(self.context.get('request'), obj, 'uploaded_file')
+
     def validate(self, attrs):
         # Determine the user context
         request = self.context.get('request')
@@ -195,3 +244,44 @@ class PersonalDocumentSerializer(serializers.ModelSerializer):
         validated_data.pop('user', None) # User cannot be changed on update via this serializer
         validated_data['uploaded_by'] = request.user # Log who last updated/uploaded file
         return super().update(instance, validated_data)
+
+
+class PersonalDocumentImportSerializer(serializers.ModelSerializer):
+    created_by = UserSummarySerializer(read_only=True)
+
+    class Meta:
+        model = PersonalDocumentImport
+        fields = [
+            'id', 'status', 'created_by', 'created_at', 'finished_at',
+            'total_rows', 'created_count', 'error_count', 'errors'
+        ]
+        read_only_fields = fields
+
+
+class PersonalDocumentImportCreateSerializer(serializers.Serializer):
+    manifest = serializers.FileField()
+    archive = serializers.FileField(required=False, allow_null=True)
+
+    def validate_manifest(self, value):
+        # Header check and row count now, so a broken file is rejected before it is queued
+        try:
+            self.context['total_rows'] = len(read_manifest(value))
+        except ManifestError as e:
+            raise serializers.ValidationError(str(e))
+        value.seek(0)
+        if not self.context['total_rows']:
+            raise serializers.ValidationError("Манифест не содержит строк.")
+        return value
+
+    def validate_archive(self, value):
+        if value is not None:
+            if not zipfile.is_zipfile(value):
+                raise serializers.ValidationError("Архив со сканами должен быть ZIP-файлом.")
+            value.seek(0)
+        return value
+
+    def create(self, validated_data):
+        return PersonalDocumentImport.objects.create(
+            manifest=validated_data['manifest'], archive=validated_data.get('archive'),
+            created_by=self.context['request'].user, total_rows=self.context['total_rows']
+        )
@@ -1,43 +1,153 @@
-from django.db.models.signals import m2m_changed, post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, pre_save, post_save, pre_delete, post_delete, post_migrate
 from django.dispatch import receiver
-from django.conf import settings
-from .models import Document, DocumentAssignment, PersonalDocument
-from apps.notifications.tasks import create_notification
+import logging
+from django.contrib.auth import get_user_model
+from .compliance import invalidate_compliance_report
+from .counters import recount_assignments
+from .inbox import refresh_document_inboxes, refresh_inboxes
+from .fanout import remove_all_role_assignments, remove_role_assignments, schedule_fan_out
+from .models import Document, DocumentAssignment, DocumentType, PersonalDocument
+from .search import install_search_index, schedule_content_indexing
+from .storage import blob_digest, release_blob, retain_blob
+from aerocrm_project.thumbnails import delete_thumbnail, schedule_thumbnail
 
-User = settings.AUTH_USER_MODEL
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
 
 @receiver(m2m_changed, sender=Document.assignee_roles.through)
-def handle_role_assignment(sender, instance, action, pk_set, **kwargs):
+def handle_role_assignment(sender, instance, action, pk_set, reverse, **kwargs):
+    # Forward: instance is a Document and pk_set are role ids; reverse
+    # (role.assigned_documents_by_role.add(...)): instance is a Role and pk_set are documents.
     if action == "post_add":
-        users_in_roles = User.objects.filter(role_id__in=pk_set, is_active=True)
-        assignments = []
-        notifications = []
-        for user in users_in_roles:
-            assignment, created = DocumentAssignment.objects.get_or_create(document=instance, user=user)
-            if created:
-                 assignments.append(assignment)
-                 create_notification(
-                    user=user,
-                    level='INFO',
-                    title=f"Новый документ для ознакомления: {instance.title}",
-                    message=f"Вам назначен новый документ '{instance.title}'. Требуется ознакомление.",
-                    related_object=instance
-                 )
-        # Bulk create handled by the task/view usually, but direct creation is possible here too
+        if reverse:
+            for document_id in pk_set:
+                schedule_fan_out(document_id, [instance.pk])
+        else:
+            schedule_fan_out(instance.pk, pk_set)
 
     elif action == "post_remove":
-        # Remove assignments only if user is not assigned directly or via another role
-        users_in_removed_roles = User.objects.filter(role_id__in=pk_set)
-        current_roles = instance.assignee_roles.all()
-        direct_assignees = instance.assignees.all()
+        if reverse:
+            for document_id in pk_set:
+                remove_role_assignments(document_id, [instance.pk])
+        else:
+            remove_role_assignments(instance.pk, pk_set)
+
+    elif action == "pre_clear" and reverse:
+        # pk_set is not sent for clear(); remember the role's documents before they go
+        instance._cleared_document_ids = list(instance.assigned_documents_by_role.values_list('pk', flat=True))
+
+    elif action == "post_clear":
+        if reverse:
+            for document_id in getattr(instance, '_cleared_document_ids', []):
+                remove_role_assignments(document_id, [instance.pk])
+        else:
+            remove_all_role_assignments(instance.pk)
+
+
+# Assignments removed by cascade when a user is hard-deleted
+@receiver(pre_delete, sender=User)
+def remember_assigned_documents(sender, instance, **kwargs):
+    instance._assigned_document_ids = list(
+        DocumentAssignment.objects.filter(user=instance).values_list('document_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=User)
+def recount_assigned_documents(sender, instance, **kwargs):
+    recount_assignments(getattr(instance, '_assigned_document_ids', []))
+
+
+# Inboxes of assignees (apps.documents.inbox) when a document's deadline changes or it is deleted
+@receiver(pre_save, sender=Document)
+def remember_deadline(sender, instance, **kwargs):
+    instance._stored_deadline = (
+        Document.objects.filter(pk=instance.pk).values_list('acknowledgment_deadline', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Document)
+def refresh_inboxes_on_deadline_change(sender, instance, created, **kwargs):
+    if not created and instance.acknowledgment_deadline != getattr(instance, '_stored_deadline', None):
+        refresh_document_inboxes(instance.pk)
+
+
+# Compliance report (apps.documents.compliance): rows carry document titles/deadlines,
+# are filtered by document type and grouped by the users' department, shift and role
+COMPLIANCE_USER_FIELDS = {'department', 'shift', 'role', 'role_id', 'is_active'}
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+@receiver(post_save, sender=DocumentType)
+@receiver(post_delete, sender=DocumentType)
+def invalidate_compliance_on_document_change(sender, **kwargs):
+    transaction.on_commit(invalidate_compliance_report)
+
+
+@receiver(post_save, sender=User)
+def invalidate_compliance_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return # No assignments yet
+    if update_fields is None or COMPLIANCE_USER_FIELDS & set(update_fields):
+        transaction.on_commit(invalidate_compliance_report)
+
+
+@receiver(pre_delete, sender=Document)
+def remember_assignees(sender, instance, **kwargs):
+    instance._assignee_ids = list(DocumentAssignment.objects.filter(document=instance).values_list('user_id', flat=True))
+
+
+@receiver(post_delete, sender=Document)
+def refresh_assignee_inboxes(sender, instance, **kwargs):
+    refresh_inboxes(getattr(instance, '_assignee_ids', []))
+
+
+# Reference counts of content-addressed blobs (apps.documents.storage)
+BLOB_FIELDS = {Document: 'document_file', PersonalDocument: 'uploaded_file'}
+
+
+def remember_stored_file(sender, instance, **kwargs):
+    field = BLOB_FIELDS[sender]
+    instance._stored_file_name = (
+        sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first() if instance.pk else None
+    )
+
+
+def count_stored_file(sender, instance, **kwargs):
+    old_name = getattr(instance, '_stored_file_name', None)
+    new_name = getattr(instance, BLOB_FIELDS[sender]).name
+    if new_name != old_name:
+        retain_blob(new_name)
+        release_blob(old_name)
+        if new_name:
+            schedule_thumbnail(instance, BLOB_FIELDS[sender])
+        if old_name and not blob_digest(old_name):
+            # Pre-blob file names aren't shared; blob thumbnails go with the blob
+            storage = getattr(instance, BLOB_FIELDS[sender]).storage
+            transaction.on_commit(lambda: delete_thumbnail(storage, old_name))
+        if sender is Document:
+            schedule_content_indexing(instance.pk)
+    instance._stored_file_name = new_name
 
-        for user in users_in_removed_roles:
-            if user not in direct_assignees and not user.role in current_roles:
-                DocumentAssignment.objects.filter(document=instance, user=user).delete()
 
+def release_stored_file(sender, instance, **kwargs):
+    release_blob(getattr(instance, BLOB_FIELDS[sender]).name)
 
-# Signal might be redundant if assignment creation happens in serializer/view
-# Keeping it simple for now, handle assignment logic primarily in views/serializers
 
+for model in BLOB_FIELDS:
+    pre_save.connect(remember_stored_file, sender=model, dispatch_uid=f'remember_stored_file_{model.__name__}')
+    post_save.connect(count_stored_file, sender=model, dispatch_uid=f'count_stored_file_{model.__name__}')
+    post_delete.connect(release_stored_file, sender=model, dispatch_uid=f'release_stored_file_{model.__name__}')
 
 
+@receiver(post_migrate)
+def setup_document_search_index(sender, **kwargs):
+    if sender.name != 'apps.documents':
+        return
+    try:
+        install_search_index()
+    except Exception as e:
+        logger.error(f"Document search: could not install full-text index: {e}", exc_info=True)
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import tempfile
+from collections import Counter, defaultdict
+
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+# Uploaded document files are stored once per content: the name a file is saved under is
+# derived from the SHA-256 of its bytes (blobs/ab/cd/<sha256><ext>), so the same PDF
+# uploaded a hundred times occupies one file. StoredBlob counts the model fields that
+# point at each blob; blobs nobody references are removed by `gc_document_blobs`.
+
+BLOB_PREFIX = 'blobs'
+TMP_DIR = 'tmp'
+
+
+def blob_digest(name):
+    # SHA-256 of a file stored in the blob layout (usable as a strong ETag), else None.
+    if not name or not name.startswith(f'{BLOB_PREFIX}/'):
+        return None
+    digest = os.path.splitext(os.path.basename(name))[0]
+    return digest if len(digest) == 64 else None
+
+
+@deconstructible(path='apps.documents.storage.ContentAddressedStorage')
+class ContentAddressedStorage(FileSystemStorage):
+    hash_chunk_size = 64 * 1024
+
+    def get_available_name(self, name, max_length=None):
+        # Names are content hashes; an existing file with the same name is the same content.
+        return name
+
+    def _save(self, name, content):
+        tmp_root = self.path(os.path.join(BLOB_PREFIX, TMP_DIR))
+        os.makedirs(tmp_root, exist_ok=True)
+        sha256 = hashlib.sha256()
+        size = 0
+        # Hash while streaming to a temp file next to the blobs, so the final move is a rename.
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_root)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks(self.hash_chunk_size):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    sha256.update(chunk)
+                    size += len(chunk)
+                    tmp.write(chunk)
+            digest = sha256.hexdigest()
+            ext = os.path.splitext(name)[1].lower()
+            blob_name = f'{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+            blob_path = self.path(blob_name)
+            if os.path.exists(blob_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, blob_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        from .models import StoredBlob
+        blob, created = StoredBlob.objects.get_or_create(name=blob_name, defaults={'digest': digest, 'size': size})
+        if not created:
+            StoredBlob.objects.filter(pk=blob.pk).update(last_uploaded_at=timezone.now())
+        return blob_name
+
+
+blob_storage = ContentAddressedStorage()
+
+
+def get_blob_storage():
+    return blob_storage
+
+
+def retain_blob(name):
+    if blob_digest(name):
+        from .models import StoredBlob
+        StoredBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+
+def retain_blobs(names):
+    # retain_blob() for rows inserted with bulk_create (no post_save): one UPDATE per
+    # distinct reference count instead of one per file.
+    counts = Counter(name for name in names if blob_digest(name))
+    by_count = defaultdict(list)
+    for name, count in counts.items():
+        by_count[count].append(name)
+    from .models import StoredBlob
+    for count, blob_names in by_count.items():
+        StoredBlob.objects.filter(name__in=blob_names).update(ref_count=F('ref_count') + count)
+
+
+def release_blob(name):
+    if blob_digest(name):
+        from .models import StoredBlob
+        StoredBlob.objects.filter(name=name).update(ref_count=F('ref_count') - 1)
@@ -0,0 +1,48 @@
+from celery import shared_task
+import logging
+
+from aerocrm_project.thumbnails import generate_thumbnail_for
+
+from .bulk_import import run_import
+from .fanout import fan_out_roles, sync_user_assignments
+from .search import index_document_content
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name="fan_out_document_roles", bind=True)
+def fan_out_document_roles(self, document_id, role_ids):
+    def report(done, total):
+        self.update_state(state='PROGRESS', meta={'document_id': document_id, 'done': done, 'total': total})
+
+    created = fan_out_roles(document_id, role_ids, progress=report)
+    return f"Создано назначений по ролям для документа {document_id}: {created}"
+
+
+@shared_task(name="sync_user_document_assignments", bind=True)
+def sync_user_document_assignments(self, user_ids):
+    added = removed = 0
+    for done, user_id in enumerate(user_ids, start=1):
+        user_added, user_removed = sync_user_assignments(user_id)
+        added += user_added
+        removed += user_removed
+        self.update_state(state='PROGRESS', meta={'done': done, 'total': len(user_ids)})
+    return f"Синхронизация назначений для {len(user_ids)} сотрудников: добавлено {added}, удалено {removed}"
+
+
+@shared_task(name="generate_file_thumbnail", ignore_result=True)
+def generate_file_thumbnail(model_label, pk, field_name):
+    generate_thumbnail_for(model_label, pk, field_name)
+
+
+@shared_task(name="index_document_text", ignore_result=True)
+def index_document_text(document_id, force=False):
+    index_document_content(document_id, force=force)
+
+
+@shared_task(name="import_personal_documents")
+def import_personal_documents_job(import_id):
+    job = run_import(import_id)
+    if job is None:
+        return f"Импорт #{import_id} уже обработан"
+    return f"Импорт #{import_id}: создано {job.created_count}, ошибок {job.error_count}"
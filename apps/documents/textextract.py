@@ -0,0 +1,86 @@
+import logging
+import os
+import re
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+logger = logging.getLogger(__name__)
+
+# Plain text of uploaded documents for the full-text index (apps.documents.search).
+# Unsupported or unreadable files yield ''.
+
+TEXT_EXTENSIONS = {'.txt', '.md', '.csv', '.rtf', '.html', '.htm'}
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def decode_text(data, strict=False):
+    # UTF-8 (with or without BOM), then cp1251; strict raises UnicodeDecodeError when
+    # neither fits instead of replacing the undecodable bytes
+    for encoding in ('utf-8-sig', 'cp1251'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='strict' if strict else 'replace')
+
+
+def _text_file(path, max_chars):
+    with open(path, 'rb') as fh:
+        # cp1251/utf-8 use at most 4 bytes per character
+        return decode_text(fh.read(max_chars * 4))
+
+
+def _docx(path, max_chars):
+    # word/document.xml streamed with iterparse; one line per paragraph
+    parts = []
+    size = 0
+    with zipfile.ZipFile(path) as archive, archive.open('word/document.xml') as xml:
+        for _, element in iterparse(xml, events=('end',)):
+            if element.tag == f'{W_NS}t' and element.text:
+                parts.append(element.text)
+                size += len(element.text)
+            elif element.tag == f'{W_NS}p':
+                parts.append('\n')
+                element.clear()
+            if size >= max_chars:
+                break
+    return ''.join(parts)
+
+
+def _pdf(path, max_chars):
+    if PdfReader is None:
+        logger.warning("Text extraction: pypdf is not installed, PDF contents are not indexed")
+        return ''
+    parts = []
+    size = 0
+    for page in PdfReader(path).pages:
+        text = page.extract_text() or ''
+        parts.append(text)
+        size += len(text)
+        if size >= max_chars:
+            break
+    return '\n'.join(parts)
+
+
+EXTRACTORS = {'.docx': _docx, '.pdf': _pdf}
+
+
+def extract_text(path, max_chars):
+    ext = os.path.splitext(path)[1].lower()
+    extractor = EXTRACTORS.get(ext) or (_text_file if ext in TEXT_EXTENSIONS else None)
+    if extractor is None:
+        return ''
+    try:
+        text = extractor(path, max_chars)
+    except Exception as e:
+        logger.error(f"Text extraction: failed for {path}: {e}")
+        return ''
+    # Collapse whitespace runs and drop NUL bytes (PostgreSQL text can't store them)
+    text = re.sub(r'[ \t\r\f\v]+', ' ', text.replace('\x00', ''))
+    text = re.sub(r'\n\s*\n+', '\n', text)
+    return text.strip()[:max_chars]
@@ -1,17 +1,26 @@
 from rest_framework import viewsets, permissions, status, mixins, generics
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
-from django.db.models import Q, Prefetch, OuterRef, Subquery, BooleanField, Case, When
+from django.db import transaction
+from django.db.models import Exists, Prefetch, OuterRef, Subquery
 from django.shortcuts import get_object_or_404
 
-from .models import DocumentType, Document, DocumentAssignment, PersonalDocument
+from .bulk_import import schedule_import
+from .compliance import EXPORT_FORMATS, GROUPINGS, compliance_report_response
+from .counters import mark_acknowledged, recount_assignments
+from .inbox import get_inbox, refresh_inboxes
+from .downloads import download_filename, file_download_response
+from .search import DocumentContentSearchFilter
+from .models import DocumentType, Document, DocumentAssignment, PersonalDocument, PersonalDocumentImport
 from .serializers import (
     DocumentTypeSerializer, DocumentListSerializer, DocumentDetailSerializer,
-    DocumentCreateSerializer, DocumentAssignmentSerializer, PersonalDocumentSerializer
+    DocumentCreateSerializer, DocumentAssignmentSerializer, PersonalDocumentSerializer,
+    DocumentBulkAcknowledgeSerializer, DocumentInboxSerializer,
+    PersonalDocumentImportSerializer, PersonalDocumentImportCreateSerializer
 )
 from apps.users.permissions import IsAdminUser, IsAdminOrReadOnly, IsSelfOrAdmin
 
@@ -27,7 +36,7 @@ class DocumentViewSet(mixins.CreateModelMixin,
                       viewsets.GenericViewSet):
     parser_classes = [MultiPartParser, FormParser]
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter, DocumentContentSearchFilter]
     filterset_fields = {'document_type': ['exact'], 'created_by': ['exact'], 'assignee_roles': ['exact']}
     search_fields = ['title', 'document_type__name']
     ordering_fields = ['created_at', 'title', 'acknowledgment_deadline']
@@ -35,47 +44,40 @@ class DocumentViewSet(mixins.CreateModelMixin,
 
     def get_queryset(self):
         user = self.request.user
+        my_assignments = DocumentAssignment.objects.filter(document=OuterRef('pk'), user=user)
 
-        # Subquery to get the current user's assignment instance for prefetching
-        user_assignment_subquery = DocumentAssignment.objects.filter(
-            document=OuterRef('pk'),
-            user=user
-        )
+        # content_text can be megabytes per row and is only used by the search index
+        queryset = Document.objects.select_related('document_type', 'created_by').defer('content_text')
 
-        base_queryset = Document.objects.select_related(
-            'document_type', 'created_by'
-        ).prefetch_related(
-            Prefetch('documentassignment_set', queryset=DocumentAssignment.objects.select_related('user'), to_attr='all_assignments'),
-            Prefetch('documentassignment_set', queryset=user_assignment_subquery, to_attr='my_assignment_list')
-        )
+        if not user.is_staff:
+            # EXISTS instead of joining documentassignment/assignee_roles: no row
+            # multiplication, so no .distinct() over the whole result either.
+            visible = Exists(my_assignments)
+            if user.role_id:
+                visible |= Exists(Document.assignee_roles.through.objects.filter(
+                    document_id=OuterRef('pk'), role_id=user.role_id
+                ))
+            queryset = queryset.filter(visible)
 
-        if user.is_staff:
-            queryset = base_queryset
-        else:
-            user_roles = user.role_id
-            query = Q(documentassignment__user=user)
-            if user_roles:
-                query |= Q(assignee_roles=user_roles)
-            queryset = base_queryset.filter(query).distinct()
-
-        # Annotate with the assignment instance for easier access in serializer
-        # Handle cases where my_assignment_list might be empty
+        # Current user's assignment as scalar subqueries (one row per document)
         queryset = queryset.annotate(
-             my_assignment_instance=Subquery(user_assignment_subquery.values('pk')[:1]),
-             # Add annotation for filtering/sorting by acknowledged status
-             is_acknowledged_by_me=Case(
-                When(documentassignment__user=user, documentassignment__is_acknowledged=True, then=True),
-                default=False,
-                output_field=BooleanField()
-             )
+            my_assignment_id=Subquery(my_assignments.values('pk')[:1]),
+            my_assigned_at=Subquery(my_assignments.values('assigned_at')[:1]),
+            my_acknowledged_at=Subquery(my_assignments.values('acknowledged_at')[:1]),
+            is_acknowledged_by_me=Exists(my_assignments.filter(is_acknowledged=True)),
         )
 
         # Allow filtering by acknowledged status
         acknowledged_param = self.request.query_params.get('acknowledged')
         if acknowledged_param is not None:
-             is_acknowledged = acknowledged_param.lower() == 'true'
-             queryset = queryset.filter(documentassignment__user=user, documentassignment__is_acknowledged=is_acknowledged)
+            is_acknowledged = acknowledged_param.lower() == 'true'
+            queryset = queryset.filter(Exists(my_assignments.filter(is_acknowledged=is_acknowledged)))
 
+        # Full assignee list (with users) is only needed for the acknowledgments action
+        if self.action == 'get_acknowledgments':
+            queryset = queryset.prefetch_related(
+                Prefetch('documentassignment_set', queryset=DocumentAssignment.objects.select_related('user').order_by('user__last_name'), to_attr='all_assignments')
+            )
 
         return queryset
 
@@ -102,35 +104,117 @@ class DocumentViewSet(mixins.CreateModelMixin,
     def acknowledge(self, request, pk=None):
         document = self.get_object()
         user = request.user
-        try:
-            # Use the prefetched list if available, otherwise query
-            assignment = next((a for a in getattr(document, 'my_assignment_list', []) if a.user == user), None)
-            if not assignment:
-                 assignment = DocumentAssignment.objects.get(document=document, user=user)
-
-            if not assignment.is_acknowledged:
-                assignment.is_acknowledged = True
-                assignment.acknowledged_at = timezone.now()
-                assignment.save()
-                return Response(DocumentAssignmentSerializer(assignment).data)
-            else:
-                return Response({"detail": "Вы уже подтвердили ознакомление."}, status=status.HTTP_400_BAD_REQUEST)
-        except DocumentAssignment.DoesNotExist:
+        if document.my_assignment_id is None:
             # Check if user should have access via role
             user_roles = user.role_id
-            if user_roles and document.assignee_roles.filter(pk=user_roles).exists():
-                 # Create assignment on the fly if accessed via role and not yet assigned
-                 assignment, created = DocumentAssignment.objects.get_or_create(document=document, user=user)
-                 if created or not assignment.is_acknowledged:
-                      assignment.is_acknowledged = True
-                      assignment.acknowledged_at = timezone.now()
-                      assignment.save()
-                      return Response(DocumentAssignmentSerializer(assignment).data)
-                 else:
-                      return Response({"detail": "Вы уже подтвердили ознакомление."}, status=status.HTTP_400_BAD_REQUEST)
-            else:
+            if not (user_roles and document.assignee_roles.filter(pk=user_roles).exists()):
                  return Response({"detail": "Документ не назначен вам."}, status=status.HTTP_404_NOT_FOUND)
 
+        with transaction.atomic():
+            # Create assignment on the fly if accessed via role and not yet assigned
+            assignment, created = DocumentAssignment.objects.get_or_create(
+                document=document, user=user, defaults={'role_id': user.role_id}
+            )
+            # Conditional UPDATE so concurrent requests can't count the same acknowledgment twice
+            acknowledged = DocumentAssignment.objects.filter(pk=assignment.pk, is_acknowledged=False).update(
+                is_acknowledged=True, acknowledged_at=timezone.now()
+            )
+            if not acknowledged:
+                 return Response({"detail": "Вы уже подтвердили ознакомление."}, status=status.HTTP_400_BAD_REQUEST)
+            mark_acknowledged(document.pk, created=created)
+            refresh_inboxes([user.pk])
+
+        assignment.refresh_from_db()
+        return Response(DocumentAssignmentSerializer(assignment).data)
+
+    @action(detail=False, methods=['get'], url_path='inbox')
+    def inbox(self, request):
+        # Badge data for the top bar/dashboard without running the document list query
+        return Response(DocumentInboxSerializer(get_inbox(request.user)).data)
+
+    @action(detail=False, methods=['post'], url_path='acknowledge-bulk', parser_classes=[JSONParser, FormParser, MultiPartParser])
+    def acknowledge_bulk(self, request):
+        serializer = DocumentBulkAcknowledgeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids'])) # Keep order, drop duplicates
+        user = request.user
+
+        # Visibility, current assignment state and role targeting in one query
+        via_role = Exists(Document.assignee_roles.through.objects.filter(document_id=OuterRef('pk'), role_id=user.role_id))
+        visible = {
+            document_id: (assignment_id, acknowledged, by_role)
+            for document_id, assignment_id, acknowledged, by_role in self.get_queryset().filter(pk__in=ids)
+            .annotate(via_my_role=via_role).order_by().values_list('pk', 'my_assignment_id', 'is_acknowledged_by_me', 'via_my_role')
+        }
+
+        results = {}
+        pending = []
+        missing = []
+        for document_id in ids:
+            if document_id not in visible:
+                results[document_id] = 'not_found'
+                continue
+            assignment_id, acknowledged, by_role = visible[document_id]
+            if acknowledged:
+                results[document_id] = 'already_acknowledged'
+            elif assignment_id is None and not by_role:
+                results[document_id] = 'not_assigned'
+            else:
+                pending.append(document_id)
+                if assignment_id is None:
+                    missing.append(document_id)
+
+        if pending:
+            with transaction.atomic():
+                # Role-derived assignments that don't exist yet
+                DocumentAssignment.objects.bulk_create(
+                    [DocumentAssignment(document_id=document_id, user=user, role_id=user.role_id) for document_id in missing],
+                    ignore_conflicts=True
+                )
+                to_flip = DocumentAssignment.objects.filter(user=user, document_id__in=pending, is_acknowledged=False)
+                flipped = set(to_flip.select_for_update().values_list('document_id', flat=True))
+                DocumentAssignment.objects.filter(user=user, document_id__in=flipped).update(
+                    is_acknowledged=True, acknowledged_at=timezone.now()
+                )
+                recount_assignments(flipped)
+                refresh_inboxes([user.pk])
+            for document_id in pending:
+                # Not in `flipped`: acknowledged by a concurrent request in the meantime
+                results[document_id] = 'acknowledged' if document_id in flipped else 'already_acknowledged'
+
+        return Response({
+            'acknowledged': sum(1 for result in results.values() if result == 'acknowledged'),
+            'results': [{'id': document_id, 'status': results[document_id]} for document_id in ids],
+        })
+
+    @action(detail=True, methods=['get'], url_path='download')
+    def download(self, request, pk=None):
+        document = self.get_object() # Same visibility rules as retrieve
+        if not document.document_file:
+            return Response({"detail": "Файл не найден."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            return file_download_response(request, document.document_file, download_filename(document.title, document.document_file))
+        except OSError:
+            # The row outlived its file (deleted or not yet synced to this server)
+            return Response({"detail": "Файл не найден."}, status=status.HTTP_404_NOT_FOUND)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated, IsAdminUser], url_path='compliance-report')
+    def compliance_report(self, request):
+        # Who has not acknowledged what, per department/shift/role, as a CSV/NDJSON download.
+        # Filters: document, document_type, department, shift, role (id).
+        params = request.query_params
+        view = params.get('view', 'summary')
+        group_by = params.get('group_by', 'department')
+        # Not `format`: that one is reserved for DRF's renderer negotiation
+        export_format = params.get('export_format', 'csv')
+        if view not in ('summary', 'pending'):
+            return Response({"detail": "Параметр view должен быть summary или pending."}, status=status.HTTP_400_BAD_REQUEST)
+        if group_by not in GROUPINGS:
+            return Response({"detail": f"Параметр group_by должен быть одним из: {', '.join(GROUPINGS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        if export_format not in EXPORT_FORMATS:
+            return Response({"detail": f"Неизвестный формат: {export_format}."}, status=status.HTTP_400_BAD_REQUEST)
+        return compliance_report_response(params, view=view, group_by=group_by, export_format=export_format)
+
     @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated, IsAdminUser], url_path='acknowledgments')
     def get_acknowledgments(self, request, pk=None):
          document = self.get_object()
@@ -184,6 +268,37 @@ class PersonalDocumentViewSet(viewsets.ModelViewSet):
 
     # perform_create and perform_update handled by serializer validation logic now
 
+    @action(detail=True, methods=['get'], url_path='download')
+    def download(self, request, pk=None):
+        doc = self.get_object() # Non-admins only see their own documents
+        if not doc.uploaded_file:
+            return Response({"detail": "Файл не найден."}, status=status.HTTP_404_NOT_FOUND)
+        base = f"{doc.document_type.name} {doc.document_number}".strip()
+        try:
+            return file_download_response(request, doc.uploaded_file, download_filename(base, doc.uploaded_file))
+        except OSError:
+            return Response({"detail": "Файл не найден."}, status=status.HTTP_404_NOT_FOUND)
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsAdminUser], url_path='import')
+    def bulk_import(self, request):
+        # CSV manifest + optional ZIP of scans, see apps.documents.bulk_import for the format.
+        # 201 with the report if it was imported right away, 202 if it was queued.
+        serializer = PersonalDocumentImportCreateSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        job = serializer.save()
+        schedule_import(job)
+        job.refresh_from_db()
+        queued = job.status in (PersonalDocumentImport.Status.PENDING, PersonalDocumentImport.Status.RUNNING)
+        return Response(
+            PersonalDocumentImportSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED if queued else status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated, IsAdminUser], url_path=r'import/(?P<import_id>\d+)')
+    def import_status(self, request, import_id=None):
+        job = get_object_or_404(PersonalDocumentImport.objects.select_related('created_by'), pk=import_id)
+        return Response(PersonalDocumentImportSerializer(job).data)
+
     @action(detail=True, methods=['post'], url_path='ack-expiry-notification')
     def acknowledge_expiry_notification(self, request, pk=None):
          doc = self.get_object()
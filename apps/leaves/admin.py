@@ -1,12 +1,17 @@
 from django.contrib import admin
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
-from .models import LeaveType, LeaveRecord
+from .calendar import invalidate_calendar_periods
+from .balances import post_usage
+from .models import LeaveType, LeaveRecord, LeaveCapacityLimit, LeaveOccupancy, LeaveBalance, LeaveBalanceEntry
+from .occupancy import release_records
 from django.utils.translation import gettext_lazy as _
 
 @admin.register(LeaveType)
 class LeaveTypeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'is_vacation', 'is_paid')
+    list_display = ('name', 'is_vacation', 'is_paid', 'annual_days')
+    search_fields = ('name',) # Required by LeaveRecordAdmin.autocomplete_fields
 
 @admin.register(LeaveRecord)
 class LeaveRecordAdmin(admin.ModelAdmin):
@@ -26,13 +31,32 @@ class LeaveRecordAdmin(admin.ModelAdmin):
     )
 
 
+    def _lock_requested(self, queryset, *fields):
+        # The REQUESTED rows, locked until commit so an employee's cancel can't slip in
+        # between the snapshot and the update
+        requested = queryset.filter(status='REQUESTED').select_related(None).select_for_update().order_by('pk')
+        return list(requested.values_list('pk', *fields))
+
     def approve_leaves(self, request, queryset):
-        count = queryset.filter(status='REQUESTED').update(status='APPROVED', approved_by=request.user, processed_at=timezone.now())
+        with transaction.atomic():
+            # The ledger usage is posted in the same transaction as the status change
+            records = self._lock_requested(queryset, 'user_id', 'leave_type_id', 'start_date', 'end_date') # update() sends no post_save
+            count = LeaveRecord.objects.filter(pk__in=[pk for pk, *_ in records]).update(
+                status='APPROVED', approved_by=request.user, processed_at=timezone.now()
+            )
+            periods = [(start, end) for _pk, _user, _type, start, end in records]
+            transaction.on_commit(lambda: invalidate_calendar_periods(periods))
+            post_usage(records)
         self.message_user(request, f'{count} записей успешно одобрено.')
     approve_leaves.short_description = _("Одобрить выбранные запросы")
 
     def reject_leaves(self, request, queryset):
-        count = queryset.filter(status='REQUESTED').update(status='REJECTED', approved_by=request.user, processed_at=timezone.now())
+        with transaction.atomic():
+            locked = self._lock_requested(queryset, 'user_id', 'start_date', 'end_date') # update() bypasses LeaveRecord.save()
+            count = LeaveRecord.objects.filter(pk__in=[pk for pk, *_ in locked]).update(
+                status='REJECTED', approved_by=request.user, processed_at=timezone.now()
+            )
+            release_records([record for _pk, *record in locked])
         self.message_user(request, f'{count} записей успешно отклонено.')
     reject_leaves.short_description = _("Отклонить выбранные запросы")
 
@@ -61,4 +85,56 @@ class LeaveRecordAdmin(admin.ModelAdmin):
          return False
 
 
+@admin.register(LeaveCapacityLimit)
+class LeaveCapacityLimitAdmin(admin.ModelAdmin):
+    list_display = ('group_type', 'group', 'max_absent')
+    list_filter = ('group_type',)
+    search_fields = ('group',)
+
+
+@admin.register(LeaveOccupancy)
+class LeaveOccupancyAdmin(admin.ModelAdmin):
+    # Maintained automatically; rebuild with `manage.py rebuild_leave_occupancy`
+    list_display = ('group_type', 'group', 'day', 'count')
+    list_filter = ('group_type', ('day', admin.DateFieldListFilter))
+    search_fields = ('group',)
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LeaveBalance)
+class LeaveBalanceAdmin(admin.ModelAdmin):
+    # Maintained from the ledger; rebuild with `manage.py rebuild_leave_balances`
+    list_display = ('user', 'leave_type', 'year', 'accrued', 'used', 'remaining')
+    list_filter = ('year', 'leave_type', 'user__department')
+    search_fields = ('user__email', 'user__last_name', 'user__first_name')
+    list_select_related = ('user', 'leave_type')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LeaveBalanceEntry)
+class LeaveBalanceEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'leave_type', 'year', 'kind', 'days', 'leave_record', 'note', 'created_at')
+    list_filter = ('kind', 'year', 'leave_type')
+    search_fields = ('user__email', 'user__last_name', 'user__first_name', 'note')
+    list_select_related = ('user', 'leave_type', 'leave_record')
+    raw_id_fields = ('leave_record',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
+    def has_delete_permission(self, request, obj=None):
+        return False
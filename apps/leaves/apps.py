@@ -6,4 +6,5 @@ class LeavesConfig(AppConfig):
     name = 'apps.leaves'
     verbose_name = _('Отпуска и Отсутствия')
 
-
+    def ready(self):
+         import apps.leaves.signals
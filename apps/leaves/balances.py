@@ -0,0 +1,177 @@
+from collections import defaultdict
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Q, Sum
+
+# Leave balance ledger. LeaveBalanceEntry records every change of an employee's balance
+# per (leave type, year): the annual accrual, the days used by an approved leave and
+# their reversal when it is cancelled, rejected after approval, moved or deleted.
+# LeaveBalance keeps the running totals of those entries, so a balance is read with one
+# row lookup; both are written in the same transaction as the change of the record.
+# A leave spanning New Year is split between the two years.
+#
+# Accrual: the nightly `accrue_leave_balances` job grants each active employee the
+# year's LeaveType.annual_days once, pro-rated by the days left in the year after the
+# hire date. `rebuild_leave_balances` regenerates usage from the approved records and
+# recomputes the totals from the ledger.
+
+BALANCE_STATUS = 'APPROVED'
+CENT = Decimal('0.01')
+
+
+def _year_parts(start, end):
+    # [(year, days)] of start..end
+    parts = []
+    for year in range(start.year, end.year + 1):
+        first, last = max(start, date(year, 1, 1)), min(end, date(year, 12, 31))
+        parts.append((year, (last - first).days + 1))
+    return parts
+
+
+def accrual_amount(annual_days, hire_date, year):
+    # Full entitlement when hired before the year (or unknown hire date), else pro-rated
+    year_start, year_end = date(year, 1, 1), date(year, 12, 31)
+    if hire_date is None or hire_date <= year_start:
+        return Decimal(annual_days).quantize(CENT)
+    if hire_date > year_end:
+        return Decimal(0)
+    share = Decimal((year_end - hire_date).days + 1) / Decimal((year_end - year_start).days + 1)
+    return (Decimal(annual_days) * share).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _apply(deltas):
+    # deltas: {(user_id, leave_type_id, year): (accrued delta, used delta)}
+    from .models import LeaveBalance
+
+    if not deltas:
+        return
+    LeaveBalance.objects.bulk_create(
+        [LeaveBalance(user_id=user_id, leave_type_id=type_id, year=year) for user_id, type_id, year in deltas],
+        ignore_conflicts=True
+    )
+    for (user_id, type_id, year), (accrued, used) in deltas.items():
+        LeaveBalance.objects.filter(user_id=user_id, leave_type_id=type_id, year=year).update(
+            accrued=F('accrued') + accrued, used=F('used') + used
+        )
+
+
+def post_usage(records, reverse=False):
+    # records: [(record_id, user_id, leave_type_id, start_date, end_date)] that became
+    # approved (or, with reverse=True, stopped being approved)
+    from .models import LeaveBalanceEntry
+
+    kind = LeaveBalanceEntry.Kind.REVERSAL if reverse else LeaveBalanceEntry.Kind.USAGE
+    entries = []
+    deltas = defaultdict(lambda: (Decimal(0), Decimal(0)))
+    for record_id, user_id, type_id, start, end in records:
+        for year, days in _year_parts(start, end):
+            entries.append(LeaveBalanceEntry(
+                user_id=user_id, leave_type_id=type_id, year=year, kind=kind, days=days, leave_record_id=record_id,
+                note=f"{start:%d.%m.%Y}–{end:%d.%m.%Y}",
+            ))
+            key = (user_id, type_id, year)
+            deltas[key] = (Decimal(0), deltas[key][1] + (-days if reverse else days))
+    with transaction.atomic():
+        LeaveBalanceEntry.objects.bulk_create(entries)
+        _apply(deltas)
+
+
+def update_balance(record, old_state):
+    # old_state: LeaveRecord.tracked_state() before the save, None for a new record
+    new_state = record.tracked_state()
+    old_counted = old_state is not None and old_state['status'] == BALANCE_STATUS
+    new_counted = new_state['status'] == BALANCE_STATUS
+    if old_counted and new_counted and old_state == new_state:
+        return
+    if old_counted:
+        post_usage([(record.pk, old_state['user_id'], old_state['leave_type_id'],
+                     old_state['start_date'], old_state['end_date'])], reverse=True)
+    if new_counted:
+        post_usage([(record.pk, record.user_id, record.leave_type_id, record.start_date, record.end_date)])
+
+
+def accrue_balances(year=None, today=None, batch_size=1000):
+    # Grants the year's accrual to every active employee who hasn't received it yet and
+    # was hired by `today`. Safe to re-run: the accrual is unique per (user, type, year).
+    from .models import LeaveBalance, LeaveBalanceEntry, LeaveType
+
+    today = today or date.today()
+    year = year or today.year
+    created = 0
+    for leave_type in LeaveType.objects.filter(annual_days__gt=0):
+        accrued = LeaveBalanceEntry.objects.filter(
+            leave_type=leave_type, year=year, kind=LeaveBalanceEntry.Kind.ACCRUAL
+        ).values('user_id')
+        users = (
+            get_user_model().objects.filter(is_active=True)
+            .filter(Q(hire_date__isnull=True) | Q(hire_date__lte=min(today, date(year, 12, 31))))
+            .exclude(pk__in=accrued)
+            .order_by('pk').values_list('pk', 'hire_date')
+        )
+        while True:
+            batch = list(users[:batch_size])
+            if not batch:
+                break
+            by_amount = defaultdict(list)
+            for user_id, hire_date in batch:
+                by_amount[accrual_amount(leave_type.annual_days, hire_date, year)].append(user_id)
+            with transaction.atomic():
+                LeaveBalanceEntry.objects.bulk_create([
+                    LeaveBalanceEntry(user_id=user_id, leave_type=leave_type, year=year,
+                                      kind=LeaveBalanceEntry.Kind.ACCRUAL, days=amount)
+                    for amount, user_ids in by_amount.items() for user_id in user_ids
+                ])
+                LeaveBalance.objects.bulk_create(
+                    [LeaveBalance(user_id=user_id, leave_type=leave_type, year=year) for user_id, _ in batch],
+                    ignore_conflicts=True
+                )
+                # One UPDATE per distinct amount rather than per employee
+                for amount, user_ids in by_amount.items():
+                    LeaveBalance.objects.filter(user_id__in=user_ids, leave_type=leave_type, year=year).update(
+                        accrued=F('accrued') + amount
+                    )
+            created += len(batch)
+    return created
+
+
+def rebuild_balances(batch_size=5000):
+    # Regenerates usage entries from the approved records (accruals are kept) and
+    # recomputes every LeaveBalance from the ledger.
+    from .models import LeaveBalance, LeaveBalanceEntry, LeaveRecord
+
+    with transaction.atomic():
+        LeaveBalanceEntry.objects.exclude(kind=LeaveBalanceEntry.Kind.ACCRUAL).delete()
+        entries = []
+        records = LeaveRecord.objects.filter(status=BALANCE_STATUS).values_list(
+            'pk', 'user_id', 'leave_type_id', 'start_date', 'end_date'
+        )
+        for record_id, user_id, type_id, start, end in records.iterator(chunk_size=batch_size):
+            for year, days in _year_parts(start, end):
+                entries.append(LeaveBalanceEntry(
+                    user_id=user_id, leave_type_id=type_id, year=year, kind=LeaveBalanceEntry.Kind.USAGE,
+                    days=days, leave_record_id=record_id, note=f"{start:%d.%m.%Y}–{end:%d.%m.%Y}",
+                ))
+            if len(entries) >= batch_size:
+                LeaveBalanceEntry.objects.bulk_create(entries)
+                entries = []
+        LeaveBalanceEntry.objects.bulk_create(entries)
+
+        totals = (
+            LeaveBalanceEntry.objects.order_by().values('user_id', 'leave_type_id', 'year')
+            .annotate(
+                accrued=Sum('days', filter=Q(kind=LeaveBalanceEntry.Kind.ACCRUAL)),
+                used=Sum('days', filter=Q(kind=LeaveBalanceEntry.Kind.USAGE)),
+            )
+        )
+        LeaveBalance.objects.all().delete()
+        LeaveBalance.objects.bulk_create([
+            LeaveBalance(
+                user_id=row['user_id'], leave_type_id=row['leave_type_id'], year=row['year'],
+                accrued=row['accrued'] or 0, used=row['used'] or 0,
+            )
+            for row in totals.iterator(chunk_size=batch_size)
+        ], batch_size=batch_size)
+    return LeaveBalance.objects.count()
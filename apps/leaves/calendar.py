@@ -0,0 +1,132 @@
+import hashlib
+import json
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Compact month calendar of approved leaves: per-user day spans grouped by department or
+# shift, with users and leave types side-loaded once by id instead of nested in every
+# record. Results are cached per (month, filters, scope) under two version keys:
+#   - one per month, bumped when a record touching that month changes status, dates,
+#     employee or type (apps.leaves.signals);
+#   - a global one, bumped when users' names/department/shift or leave types change.
+
+GROUPINGS = ('department', 'shift')
+FILTERS = {
+    'department': 'user__department',
+    'shift': 'user__shift',
+    'leave_type': 'leave_type_id',
+    'user': 'user_id',
+}
+CALENDAR_STATUS = 'APPROVED'
+GLOBAL_VERSION_KEY = 'leaves:calendar:version'
+ROW_FIELDS = (
+    'id', 'user_id', 'leave_type_id', 'start_date', 'end_date',
+    'user__email', 'user__last_name', 'user__first_name', 'user__patronymic',
+    'user__department', 'user__shift', 'user__position',
+    'leave_type__name', 'leave_type__is_vacation', 'leave_type__is_paid',
+)
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def month_bounds(year, month):
+    start = date(year, month, 1)
+    return start, _next_month(start) - timedelta(days=1)
+
+
+def months_between(start, end):
+    months = set()
+    current = date(start.year, start.month, 1)
+    while current <= end:
+        months.add(f'{current:%Y-%m}')
+        current = _next_month(current)
+    return months
+
+
+def _month_version_key(month):
+    return f'leaves:calendar:{month}:version'
+
+
+def invalidate_calendar_months(months):
+    if months:
+        version = time.time_ns()
+        cache.set_many({_month_version_key(month): version for month in months}, None)
+
+
+def invalidate_calendar_periods(periods):
+    # periods: [(start_date, end_date)] of records changed by a queryset.update()
+    months = set()
+    for start, end in periods:
+        months |= months_between(start, end)
+    invalidate_calendar_months(months)
+
+
+def invalidate_calendar():
+    cache.set(GLOBAL_VERSION_KEY, time.time_ns(), None)
+
+
+def _versions(month):
+    keys = [GLOBAL_VERSION_KEY, _month_version_key(month)]
+    versions = cache.get_many(keys)
+    if len(versions) < len(keys):
+        for key in keys:
+            if key not in versions:
+                cache.add(key, time.time_ns(), None)
+        versions = cache.get_many(keys)
+    return [versions.get(key) for key in keys]
+
+
+def build_month_calendar(queryset, year, month, group_by='department'):
+    start, end = month_bounds(year, month)
+    rows = (
+        queryset.filter(status=CALENDAR_STATUS, start_date__lte=end, end_date__gte=start)
+        .order_by('user__last_name', 'user__first_name', 'user_id', 'start_date')
+        .values_list(*ROW_FIELDS)
+    )
+    users, leave_types, spans, groups = {}, {}, {}, {}
+    for (pk, user_id, leave_type_id, start_date, end_date, email, last_name, first_name, patronymic,
+         department, shift, position, type_name, is_vacation, is_paid) in rows:
+        if user_id not in users:
+            users[user_id] = {
+                'name': f"{last_name or ''} {first_name or ''} {patronymic or ''}".strip() or email,
+                'department': department, 'shift': shift, 'position': position,
+            }
+            spans[user_id] = []
+            groups.setdefault((department if group_by == 'department' else shift) or '', []).append(user_id)
+        if leave_type_id not in leave_types:
+            leave_types[leave_type_id] = {'name': type_name, 'is_vacation': is_vacation, 'is_paid': is_paid}
+        # [first day, last day (days of this month, clipped), leave type id, record id]
+        spans[user_id].append([max(start_date, start).day, min(end_date, end).day, leave_type_id, pk])
+    return {
+        'year': year,
+        'month': month,
+        'days': end.day,
+        'group_by': group_by,
+        'groups': [{'key': key, 'user_ids': user_ids} for key, user_ids in sorted(groups.items())],
+        'users': users,
+        'leave_types': leave_types,
+        'spans': spans,
+    }
+
+
+def cached_month_calendar(queryset, year, month, params, group_by='department', scope='all'):
+    # `scope` separates what different viewers may see (staff: all, others: their own records).
+    filters = sorted((param, str(params.get(param))) for param in FILTERS if params.get(param))
+    digest = hashlib.md5(json.dumps([scope, group_by, filters]).encode()).hexdigest()
+    month_key = f'{year:04d}-{month:02d}'
+    global_version, month_version = _versions(month_key)
+    key = f'leaves:calendar:{month_key}:{global_version}:{month_version}:{digest}'
+    data = cache.get(key)
+    if data is None:
+        for param, field in FILTERS.items():
+            if params.get(param):
+                queryset = queryset.filter(**{field: params.get(param)})
+        data = build_month_calendar(queryset, year, month, group_by)
+        # Versions handle invalidation; the TTL only evicts months nobody looks at
+        cache.set(key, data, settings.LEAVE_CALENDAR_CACHE_TTL)
+    return data
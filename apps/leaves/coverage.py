@@ -0,0 +1,70 @@
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+
+from .models import LeaveRecord
+
+# Staffing coverage: how many active employees of each department/shift/role are absent
+# on each day of a range, and which share of the group's headcount that is. Every record
+# adds +1 at its first day and -1 after its last day of a per-group difference array; a
+# running sum turns that into per-day counts, so the cost is O(records + groups x days)
+# regardless of how long the leaves are. Active leaves of one employee never overlap
+# (apps.leaves.overlap), so a day is counted at most once per person.
+
+GROUPINGS = {
+    'department': 'department',
+    'shift': 'shift',
+    'role': 'role__name',
+}
+MAX_DAYS = 366
+
+
+def coverage(date_from, date_to, group_by='department', statuses=('APPROVED',), leave_type=None, group=None):
+    User = get_user_model()
+    user_field = GROUPINGS[group_by]
+    days = (date_to - date_from).days + 1
+
+    users = User.objects.filter(is_active=True)
+    records = LeaveRecord.objects.filter(
+        user__is_active=True, status__in=statuses, start_date__lte=date_to, end_date__gte=date_from
+    )
+    if leave_type:
+        records = records.filter(leave_type_id=leave_type)
+    if group is not None:
+        users = users.filter(**{user_field: group})
+        records = records.filter(**{f'user__{user_field}': group})
+
+    headcount = {
+        row[user_field] or '': row['count']
+        for row in users.order_by().values(user_field).annotate(count=Count('pk'))
+    }
+    diffs = {}
+    for key, start, end in records.order_by().values_list(f'user__{user_field}', 'start_date', 'end_date').iterator():
+        diff = diffs.get(key or '')
+        if diff is None:
+            diff = diffs[key or ''] = [0] * (days + 1)
+        diff[max((start - date_from).days, 0)] += 1
+        diff[min((end - date_from).days, days - 1) + 1] -= 1
+
+    groups = []
+    for key in sorted(set(headcount) | set(diffs)):
+        total = headcount.get(key, 0)
+        absent = list(accumulate(diffs[key][:days])) if key in diffs else [0] * days
+        peak = max(absent)
+        groups.append({
+            'key': key,
+            'headcount': total,
+            'absent': absent,
+            'ratio': [round(count / total, 3) if total else None for count in absent],
+            'peak': peak,
+            'peak_date': (date_from + timedelta(days=absent.index(peak))).isoformat() if peak else None,
+        })
+    return {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'group_by': group_by,
+        'dates': [(date_from + timedelta(days=offset)).isoformat() for offset in range(days)],
+        'groups': groups,
+    }
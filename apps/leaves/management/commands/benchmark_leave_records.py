@@ -0,0 +1,131 @@
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.leaves.models import LeaveRecord, LeaveType
+from apps.leaves.overlap import ACTIVE_STATUSES, database_enforces_overlap
+from apps.leaves.views import LeaveRecordViewSet
+
+BENCH_PREFIX = 'BENCHMARK'
+BENCH_EMAIL_DOMAIN = 'benchmark-leaves.invalid'
+HISTORY_START = date(2000, 1, 3)
+FUTURE_START = date(2100, 1, 4)
+
+
+class Command(BaseCommand):
+    help = "Замер времени создания и одобрения заявок на отсутствие при большой истории (не запускать на боевой БД)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=100_000, help="Сколько исторических записей создать.")
+        parser.add_argument('--users', type=int, default=2_000)
+        parser.add_argument('--repeat', type=int, default=50, help="Сколько заявок создать и одобрить при замере.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keep', action='store_true', help="Не удалять тестовые данные после замера.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.filter(email__endswith=f'@{BENCH_EMAIL_DOMAIN}')
+        if not users.exists():
+            self._seed(options)
+        self.stdout.write(
+            "Пересечения проверяет " + ("база данных" if database_enforces_overlap() else "приложение (блокировка сотрудника)")
+        )
+
+        staff = users.filter(is_staff=True).first()
+        employees = list(users.filter(is_staff=False).order_by('pk')[:options['repeat']])
+        leave_type = LeaveType.objects.get(name=f'{BENCH_PREFIX} тип')
+        factory = APIRequestFactory()
+        create_view = LeaveRecordViewSet.as_view({'post': 'create'})
+        approve_view = LeaveRecordViewSet.as_view({'post': 'approve'})
+
+        def measure(label, calls):
+            timings = []
+            queries = 0
+            statuses = set()
+            for view, user, path, data, kwargs in calls:
+                request = factory.post(path, data, format='json')
+                force_authenticate(request, user=user)
+                with CaptureQueriesContext(connection) as ctx:
+                    started = time.perf_counter()
+                    response = view(request, **kwargs)
+                    response.render()
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries = len(ctx.captured_queries)
+                statuses.add(response.status_code)
+                yield response
+            self.stdout.write(
+                f"{label:<28} статус {','.join(map(str, sorted(statuses)))}, запросов {queries:>3}, "
+                f"медиана {statistics.median(timings):8.1f} мс, макс {max(timings):8.1f} мс"
+            )
+
+        def period(n):
+            start = FUTURE_START + timedelta(days=7 * n)
+            return {'leave_type_id': leave_type.pk, 'start_date': start.isoformat(), 'end_date': (start + timedelta(days=4)).isoformat()}
+
+        created = [
+            response.data['id'] for response in measure("создание заявки", [
+                (create_view, employee, '/api/v1/leaves/', period(n), {}) for n, employee in enumerate(employees)
+            ])
+        ]
+        list(measure("пересекающаяся заявка", [
+            (create_view, employee, '/api/v1/leaves/', period(n), {}) for n, employee in enumerate(employees)
+        ]))
+        list(measure("одобрение", [
+            (approve_view, staff, f'/api/v1/leaves/{pk}/approve/', {}, {'pk': pk}) for pk in created
+        ]))
+
+        if not options['keep']:
+            self._cleanup()
+
+    def _seed(self, options):
+        User = get_user_model()
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        User.objects.bulk_create([
+            User(email=f'bench-{i}@{BENCH_EMAIL_DOMAIN}', password='!', last_name=f'Тест {i:05d}', is_staff=(i == 0))
+            for i in range(options['users'] + 1)
+        ], batch_size=batch_size)
+        user_ids = list(
+            User.objects.filter(email__endswith=f'@{BENCH_EMAIL_DOMAIN}', is_staff=False).order_by('pk').values_list('pk', flat=True)
+        )
+        leave_type, _ = LeaveType.objects.get_or_create(name=f'{BENCH_PREFIX} тип')
+
+        # Back-to-back weekly leaves in the past; bulk_create bypasses save(), so the
+        # history is generated without overlaps instead of being checked.
+        statuses = ('APPROVED', 'APPROVED', 'REJECTED', 'CANCELLED')
+        records = []
+        for n in range(options['records']):
+            user_id = user_ids[n % len(user_ids)]
+            start = HISTORY_START + timedelta(days=7 * (n // len(user_ids)))
+            records.append(LeaveRecord(
+                user_id=user_id, leave_type=leave_type, start_date=start, end_date=start + timedelta(days=4),
+                status=statuses[n % len(statuses)],
+            ))
+            if len(records) >= batch_size:
+                LeaveRecord.objects.bulk_create(records)
+                records = []
+        LeaveRecord.objects.bulk_create(records)
+
+        self.stdout.write(
+            f"Создано {len(user_ids)} сотрудников и {options['records']} записей об отсутствии "
+            f"за {time.perf_counter() - started:.1f} с"
+        )
+
+    def _cleanup(self):
+        User = get_user_model()
+        users = User.objects.filter(email__endswith=f'@{BENCH_EMAIL_DOMAIN}')
+        records = LeaveRecord.objects.filter(user__in=users)
+        # Benchmark users have no department/shift, so there's no occupancy to release;
+        # spares the per-record post_delete bookkeeping
+        records.filter(status__in=ACTIVE_STATUSES).update(status='CANCELLED')
+        records.delete()
+        LeaveType.objects.filter(name=f'{BENCH_PREFIX} тип').delete()
+        users.delete()
+        self.stdout.write("Тестовые данные удалены.")
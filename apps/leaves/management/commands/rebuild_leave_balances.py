@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.leaves.balances import accrue_balances, rebuild_balances
+
+
+class Command(BaseCommand):
+    help = "Пересоздаёт операции использования по одобренным записям и пересчитывает балансы отсутствий."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accrue', action='store_true', help="Сначала начислить недостающие годовые начисления.")
+        parser.add_argument('--year', type=int, help="Год начисления для --accrue (по умолчанию текущий).")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['accrue']:
+            accrued = accrue_balances(year=options['year'])
+            self.stdout.write(f"Начислено: {accrued}")
+        rows = rebuild_balances(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Пересчитано балансов: {rows}"))
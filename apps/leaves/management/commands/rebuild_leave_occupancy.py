@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.leaves.occupancy import rebuild_occupancy
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает занятость по дням (лимиты одновременных отсутствий) по запрошенным и одобренным записям."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rows = rebuild_occupancy(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Пересчитано дней по группам: {rows}"))
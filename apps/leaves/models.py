@@ -1,13 +1,20 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from .balances import update_balance
+from .occupancy import remaining_capacity, update_occupancy, user_groups
+from .overlap import ACTIVE_STATUSES, OVERLAP_MESSAGE, overlapping_leaves, save_without_overlap
+
 class LeaveType(models.Model):
     name = models.CharField(_("Название типа отсутствия"), max_length=100, unique=True)
     is_vacation = models.BooleanField(_("Является отпуском?"), default=False)
     is_paid = models.BooleanField(_("Оплачиваемый?"), default=True)
+    annual_days = models.PositiveIntegerField(
+        _("Дней в год"), default=0, help_text=_("Ежегодное начисление для баланса; 0 — не начисляется")
+    )
 
     class Meta:
         verbose_name = _("Тип отсутствия")
@@ -49,30 +56,87 @@ class LeaveRecord(models.Model):
         verbose_name = _("Запись об отсутствии")
         verbose_name_plural = _("Записи об отсутствиях")
         ordering = ['-start_date']
+        indexes = [
+            # Overlap lookups and calendar ranges per employee (apps.leaves.overlap)
+            models.Index(fields=['user', 'start_date', 'end_date'], name='leave_user_period_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.leave_type.name} ({self.start_date} - {self.end_date})"
 
-    def clean(self):
+    # Values as loaded from the database, to tell what a save() changes (overlap check,
+    # calendar cache invalidation in apps.leaves.signals)
+    TRACKED_FIELDS = ('user_id', 'leave_type_id', 'start_date', 'end_date', 'status')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if set(cls.TRACKED_FIELDS) <= set(field_names):
+            instance._loaded_state = instance.tracked_state()
+        return instance
+
+    def tracked_state(self):
+        return {field: getattr(self, field) for field in self.TRACKED_FIELDS}
+
+    @staticmethod
+    def _period(state):
+        return (state['user_id'], state['start_date'], state['end_date'], state['status'] in ACTIVE_STATUSES)
+
+    def _needs_overlap_check(self):
+        # Approve/reject/cancel never add an active period, so they skip the check
+        if self.status not in ACTIVE_STATUSES:
+            return False
+        loaded = getattr(self, '_loaded_state', None)
+        return self._state.adding or loaded is None or self._period(loaded) != self._period(self.tracked_state())
+
+    def _check_dates(self):
         if self.start_date and self.end_date and self.start_date > self.end_date:
             raise ValidationError(_("Дата начала не может быть позже даты окончания."))
 
-        if self.user and self.start_date and self.end_date:
-            overlapping_leaves = LeaveRecord.objects.filter(
-                user=self.user,
-                start_date__lte=self.end_date,
-                end_date__gte=self.start_date,
-                status__in=['REQUESTED', 'APPROVED']
-            ).exclude(pk=self.pk)
+    def clean(self):
+        # For model forms (admin); save() relies on the database constraint instead
+        self._check_dates()
+        if self.user_id and self.start_date and self.end_date and self.status in ACTIVE_STATUSES:
+            if overlapping_leaves(self).exists():
+                raise ValidationError(OVERLAP_MESSAGE)
+            if self._needs_overlap_check():
+                self._check_capacity_available()
 
-            if overlapping_leaves.exists():
-                raise ValidationError(_("Даты отсутствия пересекаются с существующей одобренной или запрошенной записью."))
+    def _check_capacity_available(self):
+        # The record's own current days (when it is moved) don't count against it
+        loaded = None
+        if not self._state.adding:
+            loaded = getattr(self, '_loaded_state', None) or \
+                type(self).objects.filter(pk=self.pk).values(*self.TRACKED_FIELDS).first()
+        own_groups = set()
+        if loaded and loaded['status'] in ACTIVE_STATUSES:
+            own_groups = set(user_groups(loaded['user_id']))
+        for limit, occupied in remaining_capacity(user_groups(self.user), self.start_date, self.end_date):
+            own = (limit.group_type, limit.group) in own_groups
+            for day, count in occupied.items():
+                if own and loaded['start_date'] <= day <= loaded['end_date']:
+                    count -= 1
+                if count >= limit.max_absent:
+                    raise ValidationError(_("Превышен лимит одновременно отсутствующих сотрудников в группе «%(group)s».") % {'group': limit.group})
 
     def save(self, *args, **kwargs):
-        self.clean()
+        self._check_dates()
         if self.status in ['APPROVED', 'REJECTED', 'CANCELLED'] and not self.processed_at:
              self.processed_at = timezone.now()
-        super().save(*args, **kwargs)
+        if not self._state.adding and getattr(self, '_loaded_state', None) is None:
+            # Loaded with deferred fields: fetch what the overlap/occupancy bookkeeping needs
+            self._loaded_state = type(self).objects.filter(pk=self.pk).values(*self.TRACKED_FIELDS).first()
+        old_state = None if self._state.adding else self._loaded_state
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            if self._needs_overlap_check():
+                save_without_overlap(self, super().save, *args, **kwargs)
+            else:
+                super().save(*args, **kwargs)
+            # Capacity limits: raises ValidationError (rolling the save back) when exceeded
+            update_occupancy(self, old_state)
+            update_balance(self, old_state)
+        self._loaded_state = self.tracked_state()
 
     @property
     def duration_days(self):
@@ -81,3 +145,106 @@ class LeaveRecord(models.Model):
          return 0
 
 
+class LeaveCapacityLimit(models.Model):
+    # Maximum number of employees of a department or shift absent on the same day
+    GROUP_TYPE_CHOICES = [
+        ('department', _('Подразделение')),
+        ('shift', _('Смена')),
+    ]
+
+    group_type = models.CharField(_("Тип группы"), max_length=20, choices=GROUP_TYPE_CHOICES)
+    group = models.CharField(_("Группа"), max_length=150, help_text=_("Название подразделения или смены, как в карточке сотрудника"))
+    max_absent = models.PositiveIntegerField(_("Максимум отсутствующих в день"))
+
+    class Meta:
+        verbose_name = _("Лимит одновременных отсутствий")
+        verbose_name_plural = _("Лимиты одновременных отсутствий")
+        ordering = ['group_type', 'group']
+        unique_together = ('group_type', 'group')
+
+    def __str__(self):
+        return f"{self.get_group_type_display()} {self.group}: {self.max_absent}"
+
+
+class LeaveOccupancy(models.Model):
+    # Requested + approved leaves per (group, day), maintained by apps.leaves.occupancy
+    group_type = models.CharField(_("Тип группы"), max_length=20)
+    group = models.CharField(_("Группа"), max_length=150)
+    day = models.DateField(_("День"))
+    count = models.IntegerField(_("Отсутствует сотрудников"), default=0)
+
+    class Meta:
+        verbose_name = _("Занятость по дням")
+        verbose_name_plural = _("Занятость по дням")
+        constraints = [
+            # Also the index for the (group, day range) lookups
+            models.UniqueConstraint(fields=['group_type', 'group', 'day'], name='leave_occupancy_group_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.group} {self.day}: {self.count}"
+
+
+class LeaveBalance(models.Model):
+    # Running totals of LeaveBalanceEntry per (employee, leave type, year), apps.leaves.balances
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, verbose_name=_("Сотрудник"),
+        on_delete=models.CASCADE, related_name='leave_balances'
+    )
+    leave_type = models.ForeignKey(LeaveType, verbose_name=_("Тип отсутствия"), on_delete=models.CASCADE)
+    year = models.PositiveSmallIntegerField(_("Год"))
+    accrued = models.DecimalField(_("Начислено дней"), max_digits=7, decimal_places=2, default=0)
+    used = models.DecimalField(_("Использовано дней"), max_digits=7, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = _("Баланс отсутствий")
+        verbose_name_plural = _("Балансы отсутствий")
+        ordering = ['-year', 'leave_type']
+        unique_together = ('user', 'leave_type', 'year')
+
+    def __str__(self):
+        return f"{self.user} - {self.leave_type} {self.year}: {self.remaining}"
+
+    @property
+    def remaining(self):
+        return self.accrued - self.used
+
+
+class LeaveBalanceEntry(models.Model):
+    class Kind(models.TextChoices):
+        ACCRUAL = 'ACCRUAL', _('Начисление')
+        USAGE = 'USAGE', _('Использование')
+        REVERSAL = 'REVERSAL', _('Возврат')
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, verbose_name=_("Сотрудник"),
+        on_delete=models.CASCADE, related_name='leave_balance_entries'
+    )
+    leave_type = models.ForeignKey(LeaveType, verbose_name=_("Тип отсутствия"), on_delete=models.CASCADE)
+    year = models.PositiveSmallIntegerField(_("Год"))
+    kind = models.CharField(_("Операция"), max_length=10, choices=Kind.choices)
+    days = models.DecimalField(_("Дней"), max_digits=7, decimal_places=2)
+    leave_record = models.ForeignKey(
+        LeaveRecord, verbose_name=_("Запись об отсутствии"),
+        on_delete=models.SET_NULL, null=True, blank=True, related_name='balance_entries'
+    )
+    note = models.CharField(_("Комментарий"), max_length=255, blank=True)
+    created_at = models.DateTimeField(_("Дата операции"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Операция по балансу отсутствий")
+        verbose_name_plural = _("Операции по балансу отсутствий")
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'leave_type', 'year'], name='leave_balance_entry_key_idx'),
+        ]
+        constraints = [
+            # The nightly accrual grants each year once
+            models.UniqueConstraint(
+                fields=['user', 'leave_type', 'year'], condition=models.Q(kind='ACCRUAL'),
+                name='leave_balance_one_accrual_per_year'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.days} ({self.user}, {self.leave_type}, {self.year})"
@@ -0,0 +1,146 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Q
+
+from .overlap import ACTIVE_STATUSES
+
+# Capacity limits on simultaneous absences per department or shift. LeaveOccupancy keeps
+# the number of requested/approved leaves of each (group, day); LeaveRecord.save() moves
+# a record's days in or out of it in the same transaction as the record itself, and a
+# new or moved period is checked with one range query per limited group. The counters
+# are incremented before the check, so concurrent requests for the same days wait on
+# each other's row locks (PostgreSQL) or on the single writer (SQLite) instead of both
+# passing. `rebuild_leave_occupancy` recomputes the table from the records.
+
+GROUP_FIELDS = ('department', 'shift')
+
+
+def user_groups(user):
+    # [(group_type, group)] of an employee (instance or id) that occupancy is kept for
+    if not hasattr(user, 'pk'):
+        user = get_user_model().objects.filter(pk=user).only(*GROUP_FIELDS).first()
+    if user is None:
+        return []
+    return [(field, getattr(user, field)) for field in GROUP_FIELDS if getattr(user, field)]
+
+
+def _days(start, end):
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def apply_occupancy(groups, start, end, delta):
+    from .models import LeaveOccupancy
+
+    for group_type, group in groups:
+        if delta > 0:
+            LeaveOccupancy.objects.bulk_create(
+                [LeaveOccupancy(group_type=group_type, group=group, day=day) for day in _days(start, end)],
+                ignore_conflicts=True
+            )
+        LeaveOccupancy.objects.filter(
+            group_type=group_type, group=group, day__gte=start, day__lte=end
+        ).update(count=F('count') + delta)
+
+
+def group_limits(groups):
+    from .models import LeaveCapacityLimit
+
+    if not groups:
+        return []
+    condition = Q()
+    for group_type, group in groups:
+        condition |= Q(group_type=group_type, group=group)
+    return list(LeaveCapacityLimit.objects.filter(condition).order_by('group_type'))
+
+
+def remaining_capacity(groups, start, end):
+    # [(limit, {day: occupied})] for the limited groups among `groups`
+    from .models import LeaveOccupancy
+
+    return [
+        (limit, dict(LeaveOccupancy.objects.filter(
+            group_type=limit.group_type, group=limit.group, day__gte=start, day__lte=end
+        ).values_list('day', 'count')))
+        for limit in group_limits(groups)
+    ]
+
+
+def check_capacity(groups, start, end):
+    # Called after this record's days have been added
+    from .models import LeaveOccupancy
+
+    for limit in group_limits(groups):
+        day = LeaveOccupancy.objects.filter(
+            group_type=limit.group_type, group=limit.group, day__gte=start, day__lte=end, count__gt=limit.max_absent
+        ).order_by('day').values_list('day', flat=True).first()
+        if day is not None:
+            raise ValidationError(
+                f"{day:%d.%m.%Y} в группе «{limit.group}» уже отсутствует максимально допустимое "
+                f"число сотрудников ({limit.max_absent})."
+            )
+
+
+def _period(state):
+    return (state['user_id'], state['start_date'], state['end_date'])
+
+
+def update_occupancy(record, old_state):
+    # old_state: LeaveRecord.tracked_state() before the save, None for a new record
+    new_state = record.tracked_state()
+    old_active = old_state is not None and old_state['status'] in ACTIVE_STATUSES
+    new_active = new_state['status'] in ACTIVE_STATUSES
+    if old_active and new_active and _period(old_state) == _period(new_state):
+        return # Approve: requested and approved days both count
+    if old_active:
+        old_user = record.user if old_state['user_id'] == record.user_id else old_state['user_id']
+        apply_occupancy(user_groups(old_user), old_state['start_date'], old_state['end_date'], -1)
+    if new_active:
+        groups = user_groups(record.user)
+        apply_occupancy(groups, record.start_date, record.end_date, 1)
+        check_capacity(groups, record.start_date, record.end_date)
+
+
+def release_records(records):
+    # records: [(user_id, start_date, end_date)] that left the active statuses via update()
+    users = get_user_model().objects.in_bulk({user_id for user_id, _, _ in records})
+    for user_id, start, end in records:
+        if user_id in users:
+            apply_occupancy(user_groups(users[user_id]), start, end, -1)
+
+
+def move_user_occupancy(user_id, old_groups, new_groups):
+    # An employee changed department/shift: their active leaves move with them
+    from .models import LeaveRecord
+
+    periods = LeaveRecord.objects.filter(user_id=user_id, status__in=ACTIVE_STATUSES).values_list('start_date', 'end_date')
+    removed = [group for group in old_groups if group not in new_groups]
+    added = [group for group in new_groups if group not in old_groups]
+    for start, end in periods:
+        apply_occupancy(removed, start, end, -1)
+        apply_occupancy(added, start, end, 1)
+
+
+def rebuild_occupancy(batch_size=5000):
+    from .models import LeaveOccupancy, LeaveRecord
+
+    counts = {}
+    records = LeaveRecord.objects.filter(status__in=ACTIVE_STATUSES).values_list(
+        'user__department', 'user__shift', 'start_date', 'end_date'
+    )
+    for department, shift, start, end in records.iterator(chunk_size=batch_size):
+        for group_type, group in (('department', department), ('shift', shift)):
+            if group:
+                for day in _days(start, end):
+                    key = (group_type, group, day)
+                    counts[key] = counts.get(key, 0) + 1
+    with transaction.atomic():
+        LeaveOccupancy.objects.all().delete()
+        LeaveOccupancy.objects.bulk_create(
+            [LeaveOccupancy(group_type=group_type, group=group, day=day, count=count)
+             for (group_type, group, day), count in counts.items()],
+            batch_size=batch_size
+        )
+    return len(counts)
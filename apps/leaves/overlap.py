@@ -0,0 +1,108 @@
+import logging
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connections, router, transaction
+from django.utils.translation import gettext_lazy as _
+
+logger = logging.getLogger(__name__)
+
+# Overlapping requested/approved leaves of one employee are rejected by the database:
+#   PostgreSQL: EXCLUDE USING gist (user_id WITH =, daterange(start, end, '[]') WITH &&)
+#   for active statuses (needs the btree_gist extension).
+#   SQLite: BEFORE INSERT/UPDATE triggers that RAISE(ABORT) on an overlap; SQLite has a
+#   single writer, so the check and the write can't interleave with another request.
+# Other backends (or a database where the constraint couldn't be installed) fall back
+# to a check under a row lock on the employee. Installed on post_migrate.
+
+TABLE = 'leaves_leaverecord'
+CONSTRAINT = f'{TABLE}_no_overlap'
+ACTIVE_STATUSES = ('REQUESTED', 'APPROVED')
+OVERLAP_MESSAGE = _("Даты отсутствия пересекаются с существующей одобренной или запрошенной записью.")
+
+_ACTIVE_SQL = ', '.join(f"'{status}'" for status in ACTIVE_STATUSES)
+_OVERLAPPING_SQL = (
+    f"SELECT 1 FROM {TABLE} WHERE user_id = NEW.user_id AND status IN ({_ACTIVE_SQL}) "
+    f"AND start_date <= NEW.end_date AND end_date >= NEW.start_date"
+)
+_enforced = {} # connection alias -> constraint/triggers are present
+
+
+def install_overlap_constraint(using='default'):
+    connection = connections[using]
+    _enforced.pop(using, None)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+            cursor.execute("SELECT 1 FROM pg_constraint WHERE conname = %s", [CONSTRAINT])
+            if cursor.fetchone() is None:
+                cursor.execute(
+                    f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{CONSTRAINT}" EXCLUDE USING gist '
+                    f"(user_id WITH =, daterange(start_date, end_date, '[]') WITH &&) "
+                    f"WHERE (status IN ({_ACTIVE_SQL}))"
+                )
+        return True
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {CONSTRAINT}_insert BEFORE INSERT ON {TABLE} "
+                f"WHEN NEW.status IN ({_ACTIVE_SQL}) BEGIN "
+                f"SELECT RAISE(ABORT, '{CONSTRAINT}') WHERE EXISTS ({_OVERLAPPING_SQL}); END"
+            )
+            # Status-only transitions between active statuses (approve) don't re-check
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {CONSTRAINT}_update "
+                f"BEFORE UPDATE OF user_id, start_date, end_date, status ON {TABLE} "
+                f"WHEN NEW.status IN ({_ACTIVE_SQL}) AND NOT (OLD.status IN ({_ACTIVE_SQL}) "
+                f"AND OLD.user_id = NEW.user_id AND OLD.start_date = NEW.start_date AND OLD.end_date = NEW.end_date) BEGIN "
+                f"SELECT RAISE(ABORT, '{CONSTRAINT}') WHERE EXISTS ({_OVERLAPPING_SQL} AND id != NEW.id); END"
+            )
+        return True
+    return False
+
+
+def database_enforces_overlap(using='default'):
+    if using not in _enforced:
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            sql = "SELECT 1 FROM pg_constraint WHERE conname = %s"
+        elif connection.vendor == 'sqlite':
+            sql = "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = %s"
+        else:
+            _enforced[using] = False
+            return False
+        name = CONSTRAINT if connection.vendor == 'postgresql' else f'{CONSTRAINT}_insert'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [name])
+            _enforced[using] = cursor.fetchone() is not None
+    return _enforced[using]
+
+
+def overlapping_leaves(record):
+    return type(record).objects.filter(
+        user_id=record.user_id,
+        start_date__lte=record.end_date,
+        end_date__gte=record.start_date,
+        status__in=ACTIVE_STATUSES,
+    ).exclude(pk=record.pk)
+
+
+def is_overlap_error(error):
+    return CONSTRAINT in str(error)
+
+
+def save_without_overlap(record, save, *args, **kwargs):
+    # Runs `save` (Model.save of `record`) so that an overlap surfaces as ValidationError.
+    using = kwargs.get('using') or router.db_for_write(type(record), instance=record)
+    try:
+        with transaction.atomic(using=using):
+            if not database_enforces_overlap(using):
+                # Serialize writers per employee, then check
+                list(get_user_model().objects.using(using).select_for_update().filter(pk=record.user_id).values_list('pk'))
+                if overlapping_leaves(record).using(using).exists():
+                    raise ValidationError(OVERLAP_MESSAGE)
+            save(*args, **kwargs)
+    except IntegrityError as e:
+        if is_overlap_error(e):
+            raise ValidationError(OVERLAP_MESSAGE)
+        raise
@@ -1,12 +1,26 @@
 from rest_framework import serializers
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.utils import timezone
-from .models import LeaveType, LeaveRecord
+from .models import LeaveType, LeaveRecord, LeaveCapacityLimit, LeaveBalance
 from apps.users.serializers import UserSummarySerializer
 
 class LeaveTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = LeaveType
-        fields = ['id', 'name', 'is_vacation', 'is_paid']
+        fields = ['id', 'name', 'is_vacation', 'is_paid', 'annual_days']
+
+class LeaveCapacityLimitSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LeaveCapacityLimit
+        fields = ['id', 'group_type', 'group', 'max_absent']
+
+class LeaveBalanceSerializer(serializers.ModelSerializer):
+    leave_type = LeaveTypeSerializer(read_only=True)
+    remaining = serializers.DecimalField(max_digits=8, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = LeaveBalance
+        fields = ['id', 'user', 'leave_type', 'year', 'accrued', 'used', 'remaining']
 
 class LeaveRecordSerializer(serializers.ModelSerializer):
     user = UserSummarySerializer(read_only=True)
@@ -46,10 +60,6 @@ class LeaveRecordSerializer(serializers.ModelSerializer):
         start = attrs.get('start_date', getattr(self.instance, 'start_date', None))
         end = attrs.get('end_date', getattr(self.instance, 'end_date', None))
 
-        # Determine the user context (for checking overlaps)
-        request = self.context.get('request')
-        user = request.user if not self.instance else self.instance.user
-
         if not start or not end:
             if not self.instance: # Required on create
                  raise serializers.ValidationError("Необходимо указать даты начала и окончания.")
@@ -57,23 +67,10 @@ class LeaveRecordSerializer(serializers.ModelSerializer):
             elif not (self.instance.start_date and self.instance.end_date):
                  raise serializers.ValidationError("Необходимо указать даты начала и окончания.")
 
-        if start and end:
-            if start > end:
-                raise serializers.ValidationError({"end_date": "Дата окончания не может быть раньше даты начала."})
-
-            # Check for overlaps
-            overlapping = LeaveRecord.objects.filter(
-                user=user,
-                start_date__lte=end,
-                end_date__gte=start,
-                status__in=['REQUESTED', 'APPROVED'] # Only check against active/pending leaves
-            )
-            if self.instance: # Exclude self if updating
-                overlapping = overlapping.exclude(pk=self.instance.pk)
-
-            if overlapping.exists():
-                 raise serializers.ValidationError("Даты отсутствия пересекаются с существующей одобренной или запрошенной записью.")
+        if start and end and start > end:
+            raise serializers.ValidationError({"end_date": "Дата окончания не может быть раньше даты начала."})
 
+        # Overlaps are rejected by the database on save (apps.leaves.overlap)
         return attrs
 
     def create(self, validated_data):
@@ -81,7 +78,16 @@ class LeaveRecordSerializer(serializers.ModelSerializer):
         validated_data['user'] = request.user
         validated_data['status'] = 'REQUESTED'
         validated_data['requested_at'] = timezone.now()
-        return super().create(validated_data)
+        try:
+            return super().create(validated_data)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+
+    def update(self, instance, validated_data):
+        try:
+            return super().update(instance, validated_data)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
 
 class LeaveRecordManageSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=['APPROVED', 'REJECTED', 'CANCELLED'])
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+import logging
+
+from .balances import BALANCE_STATUS, post_usage
+from .calendar import CALENDAR_STATUS, invalidate_calendar, invalidate_calendar_months, months_between
+from .models import LeaveRecord, LeaveType
+from .occupancy import GROUP_FIELDS, apply_occupancy, move_user_occupancy, user_groups
+from .overlap import ACTIVE_STATUSES, install_overlap_constraint
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+@receiver(post_migrate)
+def setup_leave_overlap_constraint(sender, using='default', **kwargs):
+    if sender.name != 'apps.leaves':
+        return
+    try:
+        install_overlap_constraint(using)
+    except Exception as e:
+        # E.g. existing overlapping records; writes fall back to the locked check
+        logger.error(f"Leaves: could not install the overlap constraint: {e}", exc_info=True)
+
+
+# Month calendar cache (apps.leaves.calendar). Versions are bumped after commit, so a
+# concurrent read can't re-cache the old rows under the new version.
+@receiver(post_save, sender=LeaveRecord)
+def invalidate_calendar_on_save(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_state', None)
+    current = instance.tracked_state()
+    if not created and loaded is None:
+        # Loaded with deferred fields: the previous months are unknown
+        transaction.on_commit(invalidate_calendar)
+        return
+    if loaded == current:
+        return # reason, processed_at etc. aren't part of the calendar
+    months = set()
+    for state in (loaded, current):
+        if state and state['status'] == CALENDAR_STATUS:
+            months |= months_between(state['start_date'], state['end_date'])
+    transaction.on_commit(lambda: invalidate_calendar_months(months))
+
+
+@receiver(post_delete, sender=LeaveRecord)
+def invalidate_calendar_on_delete(sender, instance, **kwargs):
+    if instance.status == CALENDAR_STATUS:
+        months = months_between(instance.start_date, instance.end_date)
+        transaction.on_commit(lambda: invalidate_calendar_months(months))
+
+
+CALENDAR_USER_FIELDS = {'first_name', 'last_name', 'patronymic', 'email', 'department', 'shift', 'position'}
+
+
+@receiver(post_save, sender=User)
+def invalidate_calendar_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return # No leave records yet
+    if update_fields is None or CALENDAR_USER_FIELDS & set(update_fields):
+        transaction.on_commit(invalidate_calendar)
+
+
+@receiver(post_save, sender=LeaveType)
+@receiver(post_delete, sender=LeaveType)
+def invalidate_calendar_on_leave_type_change(sender, **kwargs):
+    transaction.on_commit(invalidate_calendar)
+
+
+# Capacity occupancy (apps.leaves.occupancy); saves are handled in LeaveRecord.save()
+@receiver(post_delete, sender=LeaveRecord)
+def release_occupancy_on_delete(sender, instance, **kwargs):
+    if instance.status in ACTIVE_STATUSES:
+        apply_occupancy(user_groups(instance.user_id), instance.start_date, instance.end_date, -1)
+
+
+@receiver(pre_save, sender=User)
+def remember_user_groups(sender, instance, update_fields=None, **kwargs):
+    instance._occupancy_groups = None
+    if instance.pk is None or (update_fields is not None and not set(GROUP_FIELDS) & set(update_fields)):
+        return
+    previous = User.objects.filter(pk=instance.pk).values(*GROUP_FIELDS).first()
+    if previous is not None:
+        instance._occupancy_groups = [(field, previous[field]) for field in GROUP_FIELDS if previous[field]]
+
+
+@receiver(post_save, sender=User)
+def move_occupancy_on_user_change(sender, instance, created, **kwargs):
+    old_groups = getattr(instance, '_occupancy_groups', None)
+    if created or old_groups is None:
+        return
+    new_groups = user_groups(instance)
+    if old_groups != new_groups:
+        move_user_occupancy(instance.pk, old_groups, new_groups)
+
+
+# Balance ledger (apps.leaves.balances); saves are handled in LeaveRecord.save()
+@receiver(post_delete, sender=LeaveRecord)
+def reverse_balance_on_delete(sender, instance, origin=None, **kwargs):
+    if instance.status != BALANCE_STATUS:
+        return
+    if not isinstance(origin, LeaveRecord) and getattr(origin, 'model', None) is not LeaveRecord:
+        return # Cascade from deleting the employee or the leave type: their ledger goes too
+    post_usage([(None, instance.user_id, instance.leave_type_id, instance.start_date, instance.end_date)], reverse=True)
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .balances import accrue_balances
+
+
+@shared_task(name="accrue_leave_balances")
+def accrue_leave_balances():
+    created = accrue_balances()
+    return f"Начислено балансов отсутствий: {created}"
@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import LeaveTypeViewSet, LeaveRecordViewSet
+from .views import LeaveTypeViewSet, LeaveRecordViewSet, LeaveCapacityLimitViewSet
 
 router = DefaultRouter()
 router.register(r'types', LeaveTypeViewSet, basename='leave-type')
+router.register(r'capacity-limits', LeaveCapacityLimitViewSet, basename='leave-capacity-limit')
 router.register(r'', LeaveRecordViewSet, basename='leave-record')
 
 urlpatterns = [
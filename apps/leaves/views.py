@@ -1,13 +1,17 @@
-from rest_framework import viewsets, permissions, status
+from rest_framework import viewsets, permissions, serializers, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from django.utils import timezone
-from datetime import date
+from datetime import date, timedelta
+from django.contrib.auth import get_user_model
 
-from .models import LeaveType, LeaveRecord
-from .serializers import LeaveTypeSerializer, LeaveRecordSerializer, LeaveRecordManageSerializer
+from .calendar import GROUPINGS, cached_month_calendar
+from .coverage import GROUPINGS as COVERAGE_GROUPINGS, MAX_DAYS as COVERAGE_MAX_DAYS, coverage
+from .models import LeaveType, LeaveRecord, LeaveCapacityLimit, LeaveBalance
+from .occupancy import remaining_capacity, user_groups
+from .serializers import LeaveTypeSerializer, LeaveRecordSerializer, LeaveRecordManageSerializer, LeaveCapacityLimitSerializer, LeaveBalanceSerializer
 from apps.users.permissions import IsAdminUser, IsSelfOrAdmin
 
 class LeaveTypeViewSet(viewsets.ModelViewSet):
@@ -15,6 +19,13 @@ class LeaveTypeViewSet(viewsets.ModelViewSet):
     serializer_class = LeaveTypeSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminUser]
 
+class LeaveCapacityLimitViewSet(viewsets.ModelViewSet):
+    queryset = LeaveCapacityLimit.objects.all()
+    serializer_class = LeaveCapacityLimitSerializer
+    permission_classes = [permissions.IsAuthenticated, IsAdminUser]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['group_type', 'group']
+
 class LeaveRecordViewSet(viewsets.ModelViewSet):
     serializer_class = LeaveRecordSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -112,16 +123,24 @@ class LeaveRecordViewSet(viewsets.ModelViewSet):
          output_serializer = LeaveRecordSerializer(updated_instance, context=self.get_serializer_context())
          return Response(output_serializer.data)
 
+    def _set_status(self, request, new_status):
+         instance = self.get_object()
+         data = {'status': new_status}
+         if 'reason' in request.data:
+             data['reason'] = request.data['reason']
+         serializer = LeaveRecordManageSerializer(instance, data=data, partial=True, context={'request': request})
+         serializer.is_valid(raise_exception=True)
+         updated_instance = serializer.save()
+         output_serializer = LeaveRecordSerializer(updated_instance, context=self.get_serializer_context())
+         return Response(output_serializer.data)
+
     @action(detail=True, methods=['post'], url_path='approve')
     def approve(self, request, pk=None):
-         # Reuse manage_status logic for cleaner code
-         request.data.update({'status': 'APPROVED'})
-         return self.manage_status(request._request, pk=pk) # Pass the underlying HttpRequest
+         return self._set_status(request, 'APPROVED')
 
     @action(detail=True, methods=['post'], url_path='reject')
     def reject(self, request, pk=None):
-         request.data.update({'status': 'REJECTED'})
-         return self.manage_status(request._request, pk=pk)
+         return self._set_status(request, 'REJECTED')
 
     @action(detail=True, methods=['post'], url_path='cancel')
     def cancel(self, request, pk=None):
@@ -139,4 +158,102 @@ class LeaveRecordViewSet(viewsets.ModelViewSet):
          serializer = self.get_serializer(queryset, many=True)
          return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='calendar/month')
+    def month_calendar(self, request):
+         # Compact, cached alternative to `calendar`: day spans per employee with users and
+         # leave types side-loaded by id (apps.leaves.calendar).
+         params = request.query_params
+         try:
+             year, month = int(params.get('year')), int(params.get('month'))
+             date(year, month, 1)
+         except (TypeError, ValueError):
+             return Response({"detail": "Укажите корректные параметры year и month."}, status=status.HTTP_400_BAD_REQUEST)
+         group_by = params.get('group_by', 'department')
+         if group_by not in GROUPINGS:
+             return Response({"detail": f"Параметр group_by должен быть одним из: {', '.join(GROUPINGS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+         user = request.user
+         queryset = LeaveRecord.objects.all() if user.is_staff else LeaveRecord.objects.filter(user=user)
+         scope = 'all' if user.is_staff else f'user:{user.pk}'
+         try:
+             data = cached_month_calendar(queryset, year, month, params, group_by=group_by, scope=scope)
+         except ValueError:
+             return Response({"detail": "Некорректные параметры фильтра."}, status=status.HTTP_400_BAD_REQUEST)
+         return Response(data)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated, IsAdminUser], url_path='coverage')
+    def coverage_report(self, request):
+         # Absent employees per day and group (department/shift/role) over date_from..date_to,
+         # see apps.leaves.coverage. include_requested=true also counts pending requests.
+         params = request.query_params
+         try:
+             date_from = date.fromisoformat(params.get('date_from', ''))
+             date_to = date.fromisoformat(params.get('date_to', ''))
+         except ValueError:
+             return Response({"detail": "Укажите даты date_from и date_to в формате ГГГГ-ММ-ДД."}, status=status.HTTP_400_BAD_REQUEST)
+         if date_from > date_to or (date_to - date_from).days >= COVERAGE_MAX_DAYS:
+             return Response({"detail": f"Период должен быть не длиннее {COVERAGE_MAX_DAYS} дней."}, status=status.HTTP_400_BAD_REQUEST)
+         group_by = params.get('group_by', 'department')
+         if group_by not in COVERAGE_GROUPINGS:
+             return Response({"detail": f"Параметр group_by должен быть одним из: {', '.join(COVERAGE_GROUPINGS)}."}, status=status.HTTP_400_BAD_REQUEST)
+         leave_type = params.get('leave_type')
+         if leave_type and not leave_type.isdigit():
+             return Response({"detail": "Некорректный параметр leave_type."}, status=status.HTTP_400_BAD_REQUEST)
+
+         statuses = ('APPROVED', 'REQUESTED') if params.get('include_requested', '').lower() == 'true' else ('APPROVED',)
+         return Response(coverage(
+             date_from, date_to, group_by=group_by, statuses=statuses, leave_type=leave_type, group=params.get('group')
+         ))
+
+    @action(detail=False, methods=['get'], url_path='capacity')
+    def capacity(self, request):
+         # Remaining capacity of the employee's limited groups for start_date..end_date, for
+         # the request form (apps.leaves.occupancy). Staff may pass `user` to check someone else.
+         params = request.query_params
+         try:
+             start_date = date.fromisoformat(params.get('start_date', ''))
+             end_date = date.fromisoformat(params.get('end_date', ''))
+         except ValueError:
+             return Response({"detail": "Укажите даты start_date и end_date в формате ГГГГ-ММ-ДД."}, status=status.HTTP_400_BAD_REQUEST)
+         if start_date > end_date or (end_date - start_date).days >= COVERAGE_MAX_DAYS:
+             return Response({"detail": f"Период должен быть не длиннее {COVERAGE_MAX_DAYS} дней."}, status=status.HTTP_400_BAD_REQUEST)
+         user = request.user
+         if params.get('user') and request.user.is_staff:
+             user = get_user_model().objects.filter(pk=params['user']).first() if params['user'].isdigit() else None
+             if user is None:
+                 return Response({"detail": "Сотрудник не найден."}, status=status.HTTP_404_NOT_FOUND)
+
+         days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+         groups = []
+         for limit, occupied in remaining_capacity(user_groups(user), start_date, end_date):
+             groups.append({
+                 'group_type': limit.group_type,
+                 'group': limit.group,
+                 'max_absent': limit.max_absent,
+                 'days': [
+                     {'date': day.isoformat(), 'occupied': occupied.get(day, 0), 'remaining': max(limit.max_absent - occupied.get(day, 0), 0)}
+                     for day in days
+                 ],
+             })
+         return Response({
+             'start_date': start_date.isoformat(),
+             'end_date': end_date.isoformat(),
+             'available': all(day['remaining'] > 0 for group in groups for day in group['days']),
+             'groups': groups,
+         })
 
+    @action(detail=False, methods=['get'], url_path='balances')
+    def balances(self, request):
+         # Leave balances of the year (default: current) from the maintained ledger totals,
+         # apps.leaves.balances. Staff may pass `user`.
+         params = request.query_params
+         year = params.get('year', str(timezone.localdate().year))
+         if not year.isdigit():
+             return Response({"detail": "Некорректный параметр year."}, status=status.HTTP_400_BAD_REQUEST)
+         user_id = request.user.pk
+         if params.get('user') and request.user.is_staff:
+             if not params['user'].isdigit():
+                 return Response({"detail": "Некорректный параметр user."}, status=status.HTTP_400_BAD_REQUEST)
+             user_id = int(params['user'])
+         balances = LeaveBalance.objects.filter(user_id=user_id, year=int(year)).select_related('leave_type')
+         return Response(LeaveBalanceSerializer(balances, many=True).data)
@@ -1,7 +1,14 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from .models import Notification
+from aerocrm_project.generic_relations import get_generic_target, resolve_generic_targets
 from django.utils.translation import gettext_lazy as _
 
+class NotificationChangeList(ChangeList):
+    def get_results(self, request):
+        super().get_results(request)
+        resolve_generic_targets(self.result_list, 'related_object')
+
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ('recipient', 'level', 'title', 'is_read', 'created_at', 'get_related_object_link')
@@ -11,17 +18,21 @@ class NotificationAdmin(admin.ModelAdmin):
     list_select_related = ('recipient', 'content_type')
     autocomplete_fields = ['recipient']
 
+    def get_changelist(self, request, **kwargs):
+        return NotificationChangeList
+
     def get_related_object_link(self, obj):
         from django.urls import reverse
         from django.utils.html import format_html
-        if obj.related_object:
+        related_object = get_generic_target(obj, 'related_object')
+        if related_object:
             try:
                  app_label = obj.content_type.app_label
                  model_name = obj.content_type.model
                  admin_url = reverse(f'admin:{app_label}_{model_name}_change', args=[obj.object_id])
-                 return format_html('<a href="{}">{}</a>', admin_url, obj.related_object)
+                 return format_html('<a href="{}">{}</a>', admin_url, related_object)
             except Exception:
-                 return str(obj.related_object)
+                 return str(related_object)
         return "-"
     get_related_object_link.short_description = _("Связанный объект")
 
@@ -33,6 +33,9 @@ class Notification(models.Model):
         verbose_name = _("Уведомление")
         verbose_name_plural = _("Уведомления")
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'created_at', 'id'], name='notif_recipient_created_idx'),
+        ]
 
     def __str__(self):
         read_status = "Прочитано" if self.is_read else "Не прочитано"
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.contenttypes.models import ContentType
 from .models import Notification
+from aerocrm_project.generic_relations import get_generic_target
 
 class NotificationSerializer(serializers.ModelSerializer):
     recipient_name = serializers.CharField(source='recipient.get_full_name', read_only=True)
@@ -15,12 +16,13 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_related_object_info(self, obj):
-         if obj.related_object:
+         related_object = get_generic_target(obj, 'related_object') # Resolved per page by the view
+         if related_object:
              # Provide basic info: type and ID, maybe a string representation
              return {
                  'type': obj.content_type.model,
                  'id': obj.object_id,
-                 'str': str(obj.related_object)
+                 'str': str(related_object)
              }
          return None
 
@@ -5,13 +5,19 @@ from django.utils import timezone
 
 from .models import Notification
 from .serializers import NotificationSerializer
+from aerocrm_project.generic_relations import GenericTargetsMixin
+from aerocrm_project.pagination import KeysetOrPageNumberPagination
 
-class NotificationViewSet(mixins.ListModelMixin,
+class NotificationViewSet(GenericTargetsMixin,
+                          mixins.ListModelMixin,
                           mixins.RetrieveModelMixin,
                           mixins.DestroyModelMixin, # Allow user to delete their notifications
                           viewsets.GenericViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetOrPageNumberPagination
+    generic_target_fields = ['related_object']
+    ordering = ['-created_at']
 
     def get_queryset(self):
         user = self.request.user
@@ -6,4 +6,7 @@ class UsersConfig(AppConfig):
     name = 'apps.users'
     verbose_name = _('Пользователи и Роли')
 
+    def ready(self):
+         import apps.users.signals
+
 
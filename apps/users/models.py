@@ -51,6 +51,7 @@ class User(AbstractUser):
     profile_picture = models.ImageField(
         _("Фото профиля"), upload_to='profile_pics/', null=True, blank=True
     )
+    profile_picture_thumbnail = models.CharField(_("Миниатюра фото"), max_length=255, blank=True, editable=False)
     hire_date = models.DateField(_("Дата приема на работу"), null=True, blank=True)
     phone_number = models.CharField(_("Номер телефона"), max_length=25, blank=True)
     employee_id = models.CharField(
@@ -3,6 +3,8 @@ from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from .models import Role
+from aerocrm_project.thumbnails import thumbnail_url
+from apps.documents.fanout import schedule_assignment_sync
 from django.utils.translation import gettext_lazy as _
 
 User = get_user_model()
@@ -15,11 +17,12 @@ class RoleSerializer(serializers.ModelSerializer):
 class UserSummarySerializer(serializers.ModelSerializer):
     full_name = serializers.CharField(source='get_full_name', read_only=True)
     profile_picture_url = serializers.SerializerMethodField()
+    profile_picture_thumbnail_url = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ['id', 'email', 'full_name', 'profile_picture', 'profile_picture_url', 'position']
-        read_only_fields = ['profile_picture_url']
+        fields = ['id', 'email', 'full_name', 'profile_picture', 'profile_picture_url', 'profile_picture_thumbnail_url', 'position']
+        read_only_fields = ['profile_picture_url', 'profile_picture_thumbnail_url']
 
     def get_profile_picture_url(self, obj):
         request = self.context.get('request')
@@ -27,6 +30,9 @@ class UserSummarySerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.profile_picture.url)
         return None
 
+    def get_profile_picture_thumbnail_url(self, obj):
+        return thumbnail_url(self.context.get('request'), obj, 'profile_picture')
+
 class UserDetailSerializer(serializers.ModelSerializer):
     role = RoleSerializer(read_only=True)
     role_id = serializers.PrimaryKeyRelatedField(
@@ -34,16 +40,18 @@ class UserDetailSerializer(serializers.ModelSerializer):
     )
     full_name = serializers.CharField(source='get_full_name', read_only=True)
     profile_picture_url = serializers.SerializerMethodField()
+    profile_picture_thumbnail_url = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = [
             'id', 'email', 'first_name', 'last_name', 'patronymic', 'full_name',
-            'role', 'role_id', 'profile_picture', 'profile_picture_url', 'hire_date', 'phone_number',
+            'role', 'role_id', 'profile_picture', 'profile_picture_url', 'profile_picture_thumbnail_url',
+            'hire_date', 'phone_number',
             'employee_id', 'position', 'department', 'shift',
             'is_active', 'is_staff', 'last_login', 'date_joined'
         ]
-        read_only_fields = ('last_login', 'date_joined', 'is_superuser', 'profile_picture_url')
+        read_only_fields = ('last_login', 'date_joined', 'is_superuser', 'profile_picture_url', 'profile_picture_thumbnail_url')
         extra_kwargs = {
             'password': {'write_only': True, 'required': False},
             'profile_picture': {'write_only': True, 'required': False, 'allow_null': True}
@@ -55,13 +63,12 @@ class UserDetailSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.profile_picture.url)
         return None
 
-    def update(self, instance, validated_data):
-        role_id_data = validated_data.pop('role_id', None) # Check if role_id was passed
-        if 'role' in validated_data and role_id_data is None: # if role_id was not passed, but source='role' picked it up
-            validated_data.pop('role') # remove the role object if only role_id should be used
+    def get_profile_picture_thumbnail_url(self, obj):
+        return thumbnail_url(self.context.get('request'), obj, 'profile_picture')
 
-        if role_id_data is not None:
-            instance.role = role_id_data
+    def update(self, instance, validated_data):
+        old_role_id, was_active = instance.role_id, instance.is_active
+        # role_id (source='role') arrives in validated_data as 'role' and is saved by super().update
 
         password = validated_data.pop('password', None)
         if password:
@@ -73,7 +80,11 @@ class UserDetailSerializer(serializers.ModelSerializer):
         if profile_picture is not None: # Allow clearing the picture
             instance.profile_picture = profile_picture
 
-        return super().update(instance, validated_data)
+        instance = super().update(instance, validated_data)
+        # Role-based document assignments follow the user's role and active status
+        if (instance.role_id, instance.is_active) != (old_role_id, was_active):
+            schedule_assignment_sync([instance.pk])
+        return instance
 
 class UserCreateSerializer(serializers.ModelSerializer):
     role_id = serializers.PrimaryKeyRelatedField(
@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save
+from django.dispatch import receiver
+from .models import User
+from aerocrm_project.thumbnails import delete_thumbnail, schedule_thumbnail
+
+
+@receiver(pre_save, sender=User)
+def remember_profile_picture(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'profile_picture' not in update_fields:
+        return # e.g. last_login on every sign-in
+    instance._stored_picture_name = (
+        User.objects.filter(pk=instance.pk).values_list('profile_picture', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=User)
+def queue_profile_picture_thumbnail(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'profile_picture' not in update_fields:
+        return
+    name = instance.profile_picture.name
+    old_name = getattr(instance, '_stored_picture_name', None)
+    if name and name != old_name:
+        schedule_thumbnail(instance, 'profile_picture')
+    if old_name and name != old_name:
+        storage = instance.profile_picture.storage
+        transaction.on_commit(lambda: delete_thumbnail(storage, old_name))
+    instance._stored_picture_name = name
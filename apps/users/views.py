@@ -12,6 +12,7 @@ from .serializers import (
     ProfileSerializer, ChangePasswordSerializer
 )
 from .permissions import IsAdminUser, IsAdminOrReadOnly, IsSelfOrAdmin
+from apps.documents.fanout import schedule_assignment_sync
 
 User = get_user_model()
 
@@ -49,6 +50,7 @@ class UserViewSet(viewsets.ModelViewSet):
              return Response({"detail": "Запрещено деактивировать суперпользователя."}, status=status.HTTP_403_FORBIDDEN)
         instance.is_active = False
         instance.save()
+        schedule_assignment_sync([instance.pk])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsAdminUser])
@@ -58,6 +60,7 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({"detail": "Статус суперпользователя нельзя изменить."}, status=status.HTTP_403_FORBIDDEN)
         user.is_active = True
         user.save()
+        schedule_assignment_sync([user.pk])
         serializer = self.get_serializer(user)
         return Response(serializer.data)
 
@@ -23,10 +23,18 @@ const DocDetailPage = () => {
         () => documentService.getGeneralDocumentDetail(id)
     );
 
+    // The assignee list is loaded separately (staff only), the detail payload carries only the counters
+    const { data: assignments = [] } = useQuery(
+        ['documentAcknowledgments', id],
+        () => documentService.getDocumentAcknowledgments(id),
+        { enabled: !!currentUser?.is_staff }
+    );
+
     const acknowledgeMutation = useMutation(() => documentService.acknowledgeDocument(id), {
         onSuccess: () => {
             toast.success('Ознакомление подтверждено!');
             queryClient.invalidateQueries(['generalDocumentDetail', id]);
+            queryClient.invalidateQueries(['documentAcknowledgments', id]);
             queryClient.invalidateQueries('generalDocuments'); // Invalidate list view as well
         },
         onError: (error) => {
@@ -43,7 +51,6 @@ const DocDetailPage = () => {
     if (!document) return <Container><Typography>Документ не найден.</Typography></Container>;
 
     const myAssignment = document.my_assignment; // Already included in detail serializer logic
-    const assignments = document.assignees_summary || [];
     const stats = document.acknowledgment_stats || { total: 0, acknowledged: 0 };
 
     return (